@@ -5,11 +5,15 @@ Utils to initiate a pipeline
 from typing import List
 
 from ..caching import cache
-from ..models.asset import Asset
+from ..models.asset import Asset, SimCoreUniswapLPPosition
 from ..models.chain import Chain
 from ..entities.chain import ethereum, base
 from ..models.time import SimulationTime
-from ..pricing.historical_pricing import historical_get_price
+from ..pricing.historical_pricing import (
+    historical_get_price,
+    historical_get_lp_value_series,
+    bulk_defillama_price_feed,
+)
 from ..gas.gas import get_gas_owlracle_usd, get_gas_owlracle_eth
 import requests
 
@@ -21,25 +25,51 @@ def create_market_price_feed(
     start_timestamp: int,
     end_timestamp: int,
     timestep: int = 3600,
+    bulk: bool = True,
 ):
     """
     Creates a cached price feed to prevent multiple network calls
     TODO: sleep param to not exhaust the coingecko api, could be an optional field
+
+    With `bulk` the defillama priced assets are fetched range-wise first and
+    only the remaining (asset, timestamp) pairs go through historical_get_price.
     """
+    timestamps = list(filter(
+        lambda x: x <= end_timestamp,
+        range(start_timestamp, end_timestamp + timestep, timestep),
+    ))
+    lp_assets = [i for i in assets if isinstance(i, SimCoreUniswapLPPosition)]
+    token_assets = [i for i in assets if not isinstance(i, SimCoreUniswapLPPosition)]
+    underlying_assets = [t for lp in lp_assets for t in (lp.token0, lp.token1)]
+
+    bulk_prices = {}
+    if bulk:
+        bulk_prices = bulk_defillama_price_feed(
+            token_assets + underlying_assets, numeraire, start_timestamp, end_timestamp, timestep
+        )
+
+    def price_series(asset: Asset) -> List[float]:
+        series = []
+        for current_timestamp in timestamps:
+            price = bulk_prices.get(asset, {}).get(current_timestamp)
+            if price is None:
+                price = historical_get_price(
+                    asset,
+                    numeraire,
+                    target_timestamp=current_timestamp,
+                )
+            series.append(price)
+        return series
+
     context = {}
     for i in assets:
         context[i] = {}
-    current_timestamp = start_timestamp
-    for current_timestamp in filter(
-        lambda x: x <= end_timestamp,
-        range(start_timestamp, end_timestamp + timestep, timestep),
-    ):
-        for i in assets:
-            context[i][current_timestamp] = historical_get_price(
-                i,
-                numeraire,
-                target_timestamp=current_timestamp,
-            )
+    for i in token_assets:
+        context[i] = dict(zip(timestamps, price_series(i)))
+    # LP positions are valued over the whole series at once from their token prices
+    for i in lp_assets:
+        values = historical_get_lp_value_series(i, price_series(i.token0), price_series(i.token1))
+        context[i] = dict(zip(timestamps, values))
     return context
 
 
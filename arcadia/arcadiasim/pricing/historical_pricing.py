@@ -1,8 +1,10 @@
 from ..caching import cache
 from ..models.asset import Asset, ConcentratedLiquidityAsset, SimCoreUniswapLPPosition
 from ..exceptions import HistoricalSpotPriceNotFoundError
-from ..univ3.utils import initiate_liquidity_position, get_value_of_lp
+from ..univ3.utils import initiate_liquidity_position, get_value_of_lp, get_value_of_lp_series
+from core.pricing.defillama import DEFILLAMA_CHAIN_NAMES, defillama_coin_key, defillama_price_feed
 from time import sleep
+from typing import List
 import requests
 from dotenv import load_dotenv
 import os
@@ -201,3 +203,67 @@ def historical_get_price(
                 # asset.token1, numeraire, target_timestamp=target_timestamp
             # ),
         # )
+
+
+def historical_get_lp_value_series(
+    asset: SimCoreUniswapLPPosition,
+    token0_prices: List[float],
+    token1_prices: List[float],
+) -> List[float]:
+    """
+    Values an LP position over aligned token0/token1 price series in one pass,
+    same conventions as the SimCoreUniswapLPPosition branch of historical_get_price.
+    """
+    if int(asset.liquidity) == 0 or (asset.tickLower.startswith("-") or asset.tickLower.startswith("-")):
+        return [0] * len(token0_prices)
+    return get_value_of_lp_series(
+        int(asset.liquidity),
+        1.001**float(asset.tickLower),
+        1.001**float(asset.tickUpper),
+        token0_prices,
+        token1_prices,
+    ).tolist()
+
+
+def _uses_defillama(asset: Asset | str) -> bool:
+    if isinstance(asset, str) or isinstance(asset, SimCoreUniswapLPPosition):
+        return False
+    strategy = asset.pricing_metadata.strategy if asset.pricing_metadata is not None else None
+    return strategy in (None, "defillama_strategy") and asset.chain.chain_id in DEFILLAMA_CHAIN_NAMES
+
+
+def bulk_defillama_price_feed(
+    assets: List[Asset],
+    numeraire: Asset | str,
+    start_timestamp: int,
+    end_timestamp: int,
+    timestep: int = 3600,
+):
+    """
+    Prices every defillama priced asset over the whole range with a few
+    /chart and /batchHistorical requests instead of one request per timestep.
+    Assets (or timestamps) that can't be priced this way are left out, callers
+    fall back to historical_get_price for them.
+    """
+    coins = {i: defillama_coin_key(i.chain.chain_id, i.contract_address) for i in assets if _uses_defillama(i)}
+    if numeraire == "usd":
+        numeraire_coin = None
+    elif _uses_defillama(numeraire):
+        numeraire_coin = defillama_coin_key(numeraire.chain.chain_id, numeraire.contract_address)
+    else:
+        return {}
+    if not coins:
+        return {}
+    requested = list(set(coins.values()) | ({numeraire_coin} if numeraire_coin else set()))
+    feed, _ = defillama_price_feed(requested, start_timestamp, end_timestamp, timestep)
+
+    prices = {}
+    for asset, coin in coins.items():
+        if numeraire_coin is None:
+            prices[asset] = feed[coin]
+        else:
+            numeraire_prices = feed[numeraire_coin]
+            prices[asset] = {
+                t: p / numeraire_prices[t] for t, p in feed[coin].items() if t in numeraire_prices
+            }
+    return prices
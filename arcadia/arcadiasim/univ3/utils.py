@@ -1,5 +1,12 @@
 import math
 
+# vectorized valuation and the liquidity solver are shared with the core pricing module
+from core.pricing.univ3 import (
+    find_matching_liquidity,
+    get_value_of_lp_series,
+    solve_liquidity_for_value,
+)
+
 
 def mul_div(a, b, denominator):
     """Replicate Solidity's mulDiv for full precision multiplication and division."""
@@ -184,7 +191,7 @@ def get_amounts_from_liquidity(currentPrice, lowerPrice, upperPrice, liquidity):
     return amount0, amount1
 
 
-def find_matching_liquidity(
+def find_matching_liquidity_iterative(
     total_value,
     upper_price,
     current_price,
@@ -196,6 +203,10 @@ def find_matching_liquidity(
     tolerance=0.00001,
     max_iterations=10000,
 ):
+    """
+    Original fixed point search for the liquidity matching total_value, kept
+    to cross check find_matching_liquidity.
+    """
     token0_amount = 100000000 * 10**token0_decimals_
     token1_amount = 100000000 * 10**token1_decimals_
 
@@ -1,14 +1,14 @@
 from typing import Optional, Dict
 from web3 import Web3
-from sim_core.utils import parquet_files_to_process, update_timestamp
+from sim_core.utils import update_timestamp
 from .models import Borrow, AuctionStarted, AuctionFinished, Repay, AccountAssets, MetricSnapshot, SimSnapshot, OracleSnapshot
-from core.models import CryoLogsMetadata, ERC20, UniswapLPPosition, Chain
+from core.models import ERC20, UniswapLPPosition, Chain
+from core.providers import get_web3
+from core.event_loader import HEX, INT, TEXT, ingest_event_files
+from core.tasks import task_web3py_logs_tail
 from core.utils import get_or_create_erc20, get_or_create_uniswap_lp, get_oracle_lastround_price, price_defillama
 from celery import shared_task
-import os
-from django.conf import settings
 from django.db import transaction
-import pandas as pd
 from .utils import get_account_value, call_generate_asset_data, update_all_data, update_amounts, usdc_address, \
     weth_address, erc20_to_pydantic, get_total_supply, get_total_liquidity, usdc_lending_pool_address, weth_lending_pool_address
 from django.db.models import Sum, F, FloatField, Q, Max, JSONField, Func
@@ -34,145 +34,101 @@ from collections import defaultdict
 from datetime import datetime
 from django.core.cache import cache
 
-# Hex cleaner function
-def hex_cleaner(param):
-    if isinstance(param, bytes):
-        return "0x" + str(param.hex()).lower()
-    elif isinstance(param, str):
-        return param.lower()
-
-
 # Arcadia events ingestion tasks:
-@shared_task(name="task__arcadia__borrow_events")
-def task__arcadia__borrow(label: str, pool_address: str):
-    metadata = CryoLogsMetadata.objects.get(label=label)
-    files, after_ingestion = parquet_files_to_process(metadata.ingested, label)
-
-    with transaction.atomic():
-        borrow_events = []
-        for i in files:
-            file_path = os.path.join(settings.MEDIA_ROOT, f"logs__{label}", i)
-            df = pd.read_parquet(file_path)
-            for index, row in df.iterrows():
-                borrow_event = Borrow(
-                    pool_address=pool_address,
-                    account=hex_cleaner(row["event__account"]),
-                    by=hex_cleaner(row["event__by"]),
-                    to=hex_cleaner(row["event__to"]),
-                    amount=str(row["event__amount_string"]),
-                    fee=int(row["event__fee_string"]),
-                    referrer=hex_cleaner(row["event__referrer"]),
-                    transaction_hash=hex_cleaner(row["transaction_hash"]),
-                    transaction_index=row["transaction_index"],
-                    log_index=row["log_index"],
-                    chain=metadata.chain,
-                    block_number=row["block_number"]
-                )
-                borrow_events.append(borrow_event)
+BORROW_FIELDS = {
+    "account": ("event__account", HEX),
+    "by": ("event__by", HEX),
+    "to": ("event__to", HEX),
+    "amount": ("event__amount_string", TEXT),
+    "fee": ("event__fee_string", INT),
+    "referrer": ("event__referrer", HEX),
+}
+
+AUCTION_STARTED_FIELDS = {
+    "account": ("event__account", HEX),
+    "creditor": ("event__creditor", TEXT),
+    "open_debt": ("event__openDebt_string", TEXT),
+}
+
+AUCTION_FINISHED_FIELDS = {
+    "account": ("event__account", HEX),
+    "creditor": ("event__creditor", TEXT),
+    "start_debt": ("event__startDebt_string", TEXT),
+    "initiation_reward": ("event__initiationReward_string", TEXT),
+    "termination_reward": ("event__terminationReward_string", TEXT),
+    "penalty": ("event__penalty_string", TEXT),
+    "bad_debt": ("event__badDebt_string", TEXT),
+    "surplus": ("event__surplus_string", TEXT),
+}
+
+REPAY_FIELDS = {
+    "account": ("event__account", HEX),
+    "from_address": ("event__from", TEXT),
+    "amount": ("event__amount_string", TEXT),
+}
 
-        Borrow.objects.bulk_create(borrow_events, ignore_conflicts=True)
-        metadata.ingested = after_ingestion
-        metadata.save()
 
+@shared_task(name="task__arcadia__borrow_events")
+def task__arcadia__borrow(label: str, pool_address: str, stream: bool = False):
+    metadata = ingest_event_files(label, Borrow, BORROW_FIELDS, stream=stream, pool_address=pool_address)
     update_timestamp(metadata.chain, Borrow.objects.filter(timestamp=None), Borrow)
 
 
 @shared_task(name="task__arcadia__auction_started_events")
-def task__arcadia__auction_started(label: str, pool_address: str):
-    metadata = CryoLogsMetadata.objects.get(label=label)
-    files, after_ingestion = parquet_files_to_process(metadata.ingested, label)
-
-    with transaction.atomic():
-        auction_started_events = []
-        for i in files:
-            file_path = os.path.join(settings.MEDIA_ROOT, f"logs__{label}", i)
-            df = pd.read_parquet(file_path)
-            for index, row in df.iterrows():
-                auction_started_event = AuctionStarted(
-                    pool_address=pool_address,
-                    account=hex_cleaner(row["event__account"]),
-                    creditor=str(row["event__creditor"]),
-                    open_debt=str(row["event__openDebt_string"]),
-                    transaction_hash=hex_cleaner(row["transaction_hash"]),
-                    transaction_index=row["transaction_index"],
-                    log_index=row["log_index"],
-                    chain=metadata.chain,
-                    block_number=row["block_number"]
-                )
-                auction_started_events.append(auction_started_event)
-
-        AuctionStarted.objects.bulk_create(auction_started_events, ignore_conflicts=True)
-        metadata.ingested = after_ingestion
-        metadata.save()
-
+def task__arcadia__auction_started(label: str, pool_address: str, stream: bool = False):
+    metadata = ingest_event_files(label, AuctionStarted, AUCTION_STARTED_FIELDS, stream=stream, pool_address=pool_address)
     update_timestamp(metadata.chain, AuctionStarted.objects.filter(timestamp=None), AuctionStarted)
 
 
 @shared_task(name="task__arcadia__auction_finished_events")
-def task__arcadia__auction_finished(label: str, pool_address: str):
-    metadata = CryoLogsMetadata.objects.get(label=label)
-    files, after_ingestion = parquet_files_to_process(metadata.ingested, label)
-
-    with transaction.atomic():
-        auction_finished_events = []
-        for i in files:
-            file_path = os.path.join(settings.MEDIA_ROOT, f"logs__{label}", i)
-            df = pd.read_parquet(file_path)
-            for index, row in df.iterrows():
-                auction_finished_event = AuctionFinished(
-                    pool_address=pool_address,
-                    account=hex_cleaner(row["event__account"]),
-                    creditor=str(row["event__creditor"]),
-                    start_debt=str(row["event__start_debt"]),
-                    initiation_reward=str(row["event__initiation_reward"]),
-                    termination_reward=str(row["event__termination_reward"]),
-                    penalty=str(row["event__penalty"]),
-                    bad_debt=str(row["event__bad_debt"]),
-                    surplus=str(row["event__surplus"]),
-                    transaction_hash=hex_cleaner(row["transaction_hash"]),
-                    transaction_index=row["transaction_index"],
-                    log_index=row["log_index"],
-                    chain=metadata.chain,
-                    block_number=row["block_number"]
-                )
-                auction_finished_events.append(auction_finished_event)
-
-        AuctionFinished.objects.bulk_create(auction_finished_events, ignore_conflicts=True)
-        metadata.ingested = after_ingestion
-        metadata.save()
-
+def task__arcadia__auction_finished(label: str, pool_address: str, stream: bool = False):
+    metadata = ingest_event_files(label, AuctionFinished, AUCTION_FINISHED_FIELDS, stream=stream, pool_address=pool_address)
     update_timestamp(metadata.chain, AuctionFinished.objects.filter(timestamp=None), AuctionFinished)
 
 
 @shared_task(name="task__arcadia__repay_events")
-def task__arcadia__repay(label: str, pool_address: str):
-    metadata = CryoLogsMetadata.objects.get(label=label)
-    files, after_ingestion = parquet_files_to_process(metadata.ingested, label)
-
-    with transaction.atomic():
-        repay_events = []
-        for i in files:
-            file_path = os.path.join(settings.MEDIA_ROOT, f"logs__{label}", i)
-            df = pd.read_parquet(file_path)
-            for index, row in df.iterrows():
-                repay_event = Repay(
-                    pool_address=pool_address,
-                    account=hex_cleaner(row["event__account"]),
-                    from_address=str(row["event__from"]),
-                    amount=str(row["event__amount"]),
-                    transaction_hash=hex_cleaner(row["transaction_hash"]),
-                    transaction_index=row["transaction_index"],
-                    log_index=row["log_index"],
-                    chain=metadata.chain,
-                    block_number=row["block_number"]
-                )
-                repay_events.append(repay_event)
+def task__arcadia__repay(label: str, pool_address: str, stream: bool = False):
+    metadata = ingest_event_files(label, Repay, REPAY_FIELDS, stream=stream, pool_address=pool_address)
+    update_timestamp(metadata.chain, Repay.objects.filter(timestamp=None), Repay)
 
-        Repay.objects.bulk_create(repay_events, ignore_conflicts=True)
-        metadata.ingested = after_ingestion
-        metadata.save()
 
-    update_timestamp(metadata.chain, Repay.objects.filter(timestamp=None), Repay)
+# event -> (model, ingestion task) of a lending pool's event labels
+ARCADIA_EVENTS = {
+    "borrow": (Borrow, task__arcadia__borrow),
+    "auction_started": (AuctionStarted, task__arcadia__auction_started),
+    "auction_finished": (AuctionFinished, task__arcadia__auction_finished),
+    "repay": (Repay, task__arcadia__repay),
+}
+
+
+@shared_task(name="task__arcadia__events_tail")
+def task__arcadia__events_tail(
+    event: str,
+    label: str,
+    pool_address: str,
+    event_signature: str,
+    start_block: int,
+    chain_id: int,
+    contract_address: Optional[str] = None,
+    stream: bool = False,
+    **kwargs
+):
+    """
+    Follows the head for one event of a lending pool: after a reorg the
+    pool's rows of the event model are rolled back with the label, then the
+    new files are ingested. contract_address defaults to the pool.
+    """
+    model, ingest = ARCADIA_EVENTS[event]
+    task_web3py_logs_tail(
+        contract_address or pool_address,
+        event_signature,
+        label,
+        start_block,
+        chain_id,
+        rollback_models={model._meta.label: {"pool_address__iexact": pool_address}},
+        **kwargs
+    )
+    ingest(label, pool_address, stream=stream)
 
 
 @shared_task
@@ -313,9 +269,9 @@ def sim(
         ~Q(debt_usd=0),
         numeraire__iexact=numeraire_address,
     )
-    numeraire = ERC20.objects.get(contract_address__iexact=numeraire_address, chain__chain_name__iexact="base")
+    numeraire = ERC20.objects.get(contract_address_lower=numeraire_address.lower(), chain__chain_name__iexact="base")
     base = numeraire.chain
-    w3 = Web3(Web3.HTTPProvider(base.rpc))
+    w3 = get_web3(base)
     numeraire = erc20_to_pydantic(numeraire)
 
     sim_accounts = []
@@ -506,9 +462,9 @@ def get_pool_risk_params(
         numeraire__iexact=numeraire_address,
     )
 
-    numeraire = ERC20.objects.get(contract_address__iexact=numeraire_address, chain__chain_name__iexact="base")
+    numeraire = ERC20.objects.get(contract_address_lower=numeraire_address.lower(), chain__chain_name__iexact="base")
     base = numeraire.chain
-    w3 = Web3(Web3.HTTPProvider(base.rpc))
+    w3 = get_web3(base)
     numeraire = erc20_to_pydantic(numeraire)
 
     liquidation_factors_dict = dict()
@@ -554,7 +510,7 @@ def get_pool_risk_params(
     result = dict()
     for address in collateral_factors_dict.keys():
         asset = ERC20.objects.filter(
-            contract_address__iexact=address,
+            contract_address_lower=address.lower(),
             chain=base
         ).first()
         
@@ -634,7 +590,7 @@ def task__arcadia__oracle_snapshot():
 
     base_chain = Chain.objects.get(chain_name__iexact='base')
 
-    w3 = Web3(Web3.HTTPProvider(base_chain.rpc))
+    w3 = get_web3(base_chain)
     
     all_assets = ERC20.objects.filter(uniswaplpposition__isnull=True)
 
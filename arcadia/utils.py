@@ -1,5 +1,7 @@
 from web3 import Web3
 from core.models import Chain, ERC20, UniswapLPPosition
+from core.multicall import batch_call_dict
+from core.providers import get_web3 as shared_web3
 from arcadia.models import AccountAssets
 import requests
 from django.core.cache import cache
@@ -118,7 +120,7 @@ lending_pool_abi = [
 
 
 def get_web3(chain_name):
-    return Web3(Web3.HTTPProvider(Chain.objects.get(chain_name__iexact=chain_name).rpc))
+    return shared_web3(Chain.objects.get(chain_name__iexact=chain_name))
 
 
 # ABI and contract address configuration
@@ -365,21 +367,46 @@ def update_amounts(account: str, asset_record: AccountAssets):
     )
 
 
+def get_account_state(account, w3=None):
+    """
+    Reads the account getters used by update_all_data in a single multicall.
+    """
+    w3 = get_web3("Base") if w3 is None else w3
+    contract = w3.eth.contract(address=Web3.to_checksum_address(account), abi=minimal_abi)
+    return batch_call_dict(
+        w3,
+        {
+            "usdc_value": (contract, "getAccountValue", [usdc_address]),
+            # only meaningful for accounts holding value, tolerate reverts on empty ones
+            "weth_value": (contract, "getAccountValue", [weth_address], True),
+            "asset_data": (contract, "generateAssetData", []),
+            "numeraire": (contract, "numeraire", []),
+            "liquidation_value": (contract, "getLiquidationValue", []),
+            "used_margin": (contract, "getUsedMargin", []),
+            "unhealthy": (contract, "isAccountUnhealthy", []),
+        },
+    )
+
+
 def update_all_data(account):
-    usdc_value = get_account_value(account, usdc_address)
+    w3 = get_web3("Base")
+    state = get_account_state(account, w3=w3)
+    usdc_value = state["usdc_value"]
     if usdc_value == 0:
         weth_value = 0
     else:
-        weth_value = get_account_value(account, weth_address)
-    asset_data = call_generate_asset_data(account)
+        weth_value = state["weth_value"]
+        if weth_value is None:
+            weth_value = get_account_value(account, weth_address)
+    asset_data = state["asset_data"]
     # collateral_value = get_collateral_value(account)
 
-    position_distribution = get_arcadia_account_nft_position(asset_data, w3=get_web3("Base"))
+    position_distribution = get_arcadia_account_nft_position(asset_data, w3=w3)
 
-    numeraire = get_numeraire_address(account)
-    liquidation_value = get_liquidation_value(account)
-    used_margin = get_used_margin_value(account)
-    healthy = get_health_status(account)
+    numeraire = state["numeraire"]
+    liquidation_value = state["liquidation_value"]
+    used_margin = state["used_margin"]
+    healthy = not state["unhealthy"]
 
     labels = list(set(asset_data[0]))
     prices = get_price_defillama([f"base:{i}" for i in labels])
@@ -0,0 +1,179 @@
+"""
+Column-wise decoding of raw logs of events with only static ABI types.
+
+web3's contract event processing decodes every log on its own in Python. For
+events whose inputs are all static (address, bool, intN, uintN, bytesN) every
+log has the same layout: one 32 byte topic per indexed input and one 32 byte
+data word per other input. The raw eth_getLogs results are stacked into a
+(logs x 32) byte matrix per input and each input is decoded for all logs at
+once with numpy into an Arrow array.
+
+The output has the columns task_web3py_logs writes for the web3 path:
+event__{name} for addresses (checksummed) and bytesN, event__{name}_string for
+integers and bools (decimal / "True" strings), transaction_hash, log_index,
+transaction_index and block_number.
+"""
+import re
+
+import numpy as np
+import pyarrow as pa
+from eth_utils import event_abi_to_log_topic, to_checksum_address
+
+STATIC_TYPE = re.compile(r"^(address|bool|u?int(8|16|24|32|40|48|56|64|72|80|88|96|104|112|120|128|136|144|152|160|168|176|184|192|200|208|216|224|232|240|248|256)?|bytes([1-9]|[12][0-9]|3[0-2]))$")
+
+_HEX_DIGITS = np.array([b"%02x" % i for i in range(256)], dtype="S2")
+_CHUNK = 10 ** 9
+_POWERS = np.array([10 ** k for k in range(8, -1, -1)], dtype=np.uint64)
+
+
+def is_static_event(event_abi: dict) -> bool:
+    return not event_abi.get("anonymous") and all(STATIC_TYPE.match(i["type"]) for i in event_abi["inputs"])
+
+
+def _hex_matrix(hex_strings, width):
+    """ (n, width) uint8 matrix of equally sized 0x prefixed hex strings. """
+    if not hex_strings:
+        return np.zeros((0, width), dtype=np.uint8)
+    return np.frombuffer(bytes.fromhex("".join(h[2:] for h in hex_strings)), dtype=np.uint8).reshape(-1, width)
+
+
+def _hex_rows(words):
+    n, width = words.shape
+    return _HEX_DIGITS[words].view(f"S{2 * width}").ravel().astype(str)
+
+
+def _hex_quantities(hex_strings):
+    """ int64 array of 0x prefixed JSON-RPC quantities ("0x1a"). """
+    if not hex_strings:
+        return np.zeros(0, dtype=np.int64)
+    padded = np.char.zfill(np.char.lstrip(np.array(hex_strings, dtype=str), "0x"), 16)
+    return np.frombuffer(bytes.fromhex("".join(padded.tolist())), dtype=">u8").astype(np.int64)
+
+
+def _decimal_strings(words, negative=None) -> pa.Array:
+    """
+    Decimal strings of 256 bit big endian magnitudes (negative rows get a
+    "-"), built as one Arrow string buffer.
+    """
+    n = len(words)
+    limbs = words.reshape(n, 8, 4).astype(np.uint64)
+    limbs = (limbs[:, :, 0] << 24) | (limbs[:, :, 1] << 16) | (limbs[:, :, 2] << 8) | limbs[:, :, 3]
+    # long division of all rows at once, 9 decimal digits per pass
+    chunks = []
+    for _ in range(9):
+        remainder = np.zeros(n, dtype=np.uint64)
+        for i in range(8):
+            current = (remainder << np.uint64(32)) | limbs[:, i]
+            limbs[:, i] = current // np.uint64(_CHUNK)
+            remainder = current % np.uint64(_CHUNK)
+        chunks.append(remainder)
+    chunks = np.stack(chunks[::-1], axis=1)
+    digits = (chunks[:, :, None] // _POWERS % np.uint64(10)).astype(np.uint8).reshape(n, 81)
+
+    # keep everything from the first non zero digit on, at least the last digit
+    nonzero = digits != 0
+    first = np.where(nonzero.any(axis=1), nonzero.argmax(axis=1), digits.shape[1] - 1)
+    keep = np.arange(digits.shape[1]) >= first[:, None]
+    text = digits + ord("0")
+    if negative is not None:
+        text = np.concatenate([np.full((n, 1), ord("-"), dtype=np.uint8), text], axis=1)
+        keep = np.concatenate([negative[:, None], keep], axis=1)
+    offsets = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(keep.sum(axis=1), out=offsets[1:])
+    return pa.StringArray.from_buffers(n, pa.py_buffer(offsets.tobytes()), pa.py_buffer(text[keep].tobytes()))
+
+
+def _signed_decimal_strings(words) -> pa.Array:
+    negative = words[:, 0] >= 0x80
+    magnitude = words.copy()
+    if negative.any():
+        # two's complement: invert and add one, carrying from the last byte
+        neg = ~magnitude[negative]
+        carry = np.ones(len(neg), dtype=np.uint16)
+        for i in range(31, -1, -1):
+            total = neg[:, i].astype(np.uint16) + carry
+            neg[:, i] = (total & 0xFF).astype(np.uint8)
+            carry = total >> 8
+        magnitude[negative] = neg
+    return _decimal_strings(magnitude, negative)
+
+
+def _decode_column(abi_type, words):
+    if abi_type == "address":
+        hexed = _hex_rows(words[:, 12:])
+        unique, inverse = np.unique(hexed, return_inverse=True)
+        checksummed = np.array([to_checksum_address("0x" + h) for h in unique], dtype=object)
+        return pa.array(checksummed[inverse], type=pa.string())
+    if abi_type == "bool":
+        return pa.array(np.where(words.any(axis=1), "True", "False"), type=pa.string())
+    if abi_type.startswith("bytes"):
+        size = int(abi_type[5:])
+        data = np.ascontiguousarray(words[:, :size])
+        array = pa.FixedSizeBinaryArray.from_buffers(pa.binary(size), len(words), [None, pa.py_buffer(data.tobytes())])
+        return array.cast(pa.binary())
+    if abi_type.startswith("int"):
+        return _signed_decimal_strings(words)
+    return _decimal_strings(words)
+
+
+def _column_name(event_input):
+    if event_input["type"].startswith(("int", "uint", "bool")):
+        return f"event__{event_input['name']}_string"
+    return f"event__{event_input['name']}"
+
+
+def decode_raw_logs(event_abi: dict, raw_logs: list) -> pa.Table:
+    """
+    Decodes raw eth_getLogs results (JSON dicts) of a static event, logs
+    that do not have the event's layout are dropped.
+    """
+    indexed = [i for i in event_abi["inputs"] if i["indexed"]]
+    data_inputs = [i for i in event_abi["inputs"] if not i["indexed"]]
+    data_width = 32 * len(data_inputs)
+    data_hex_length = 2 + 2 * data_width
+
+    logs = [
+        log for log in raw_logs
+        if len(log["topics"]) == 1 + len(indexed) and len(log["data"]) == data_hex_length
+    ]
+    if len(logs) != len(raw_logs):
+        print(f"Dropped {len(raw_logs) - len(logs)} logs not matching the layout of {event_abi['name']}")
+
+    columns = {}
+    for position, event_input in enumerate(indexed):
+        words = _hex_matrix([log["topics"][position + 1] for log in logs], 32)
+        columns[_column_name(event_input)] = _decode_column(event_input["type"], words)
+    data = _hex_matrix([log["data"] for log in logs], data_width)
+    for position, event_input in enumerate(data_inputs):
+        words = data[:, 32 * position:32 * (position + 1)]
+        columns[_column_name(event_input)] = _decode_column(event_input["type"], words)
+
+    hashes = _hex_matrix([log["transactionHash"] for log in logs], 32)
+    columns["transaction_hash"] = pa.FixedSizeBinaryArray.from_buffers(
+        pa.binary(32), len(logs), [None, pa.py_buffer(hashes.tobytes())]
+    ).cast(pa.binary())
+    for column, key in (("log_index", "logIndex"), ("transaction_index", "transactionIndex"), ("block_number", "blockNumber")):
+        columns[column] = pa.array(_hex_quantities([log[key] for log in logs]), type=pa.int64())
+
+    # order of the inputs in the signature, as the web3 path writes them
+    names = [_column_name(i) for i in event_abi["inputs"]] + ["transaction_hash", "log_index", "transaction_index", "block_number"]
+    return pa.table({name: columns[name] for name in names})
+
+
+def fetch_raw_logs(w3, contract_address: str, event_abi: dict, start_block: int, end_block: int) -> list:
+    """
+    Raw eth_getLogs results, without web3's per log result formatting.
+    Provider errors are raised as ValueError(error) like web3 does.
+    """
+    response = w3.provider.make_request(
+        "eth_getLogs",
+        [{
+            "address": contract_address,
+            "topics": ["0x" + event_abi_to_log_topic(event_abi).hex()],
+            "fromBlock": hex(start_block),
+            "toBlock": hex(end_block),
+        }],
+    )
+    if "error" in response:
+        raise ValueError(response["error"])
+    return response["result"]
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Chain, CryoLogsMetadata, Transaction, ERC20, UniswapLPPosition, DexQuote, DexQuotePair
+from .models import Chain, CryoLogsMetadata, Transaction, ERC20, UniswapLPPosition, DexQuote, DexQuotePair, DexQuoteRollup
 
 # Custom admin class for DexQuote
 class DexQuoteAdmin(admin.ModelAdmin):
@@ -7,6 +7,11 @@ class DexQuoteAdmin(admin.ModelAdmin):
     search_fields = ('dex_aggregator', 'src', 'dst')
     raw_id_fields = ('pair',)  # Use raw_id_fields to remove the dropdown for ForeignKey
 
+# Custom admin class for DexQuoteRollup
+class DexQuoteRollupAdmin(admin.ModelAdmin):
+    list_display = ('dex_aggregator', 'network', 'src_lower', 'dst_lower', 'hour', 'size_bucket', 'quotes')
+    search_fields = ('dex_aggregator', 'src_lower', 'dst_lower')
+
 # Custom admin class for DexQuotePair
 class DexQuotePairAdmin(admin.ModelAdmin):
     # list_display = ('src_asset', 'dst_asset', 'ingest')
@@ -34,4 +39,5 @@ admin.site.register(CryoLogsMetadata)
 admin.site.register(ERC20, ERC20Admin)
 admin.site.register(UniswapLPPosition)
 admin.site.register(DexQuote, DexQuoteAdmin)
-admin.site.register(DexQuotePair, DexQuotePairAdmin)
\ No newline at end of file
+admin.site.register(DexQuotePair, DexQuotePairAdmin)
+admin.site.register(DexQuoteRollup, DexQuoteRollupAdmin)
\ No newline at end of file
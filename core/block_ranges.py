@@ -0,0 +1,100 @@
+"""
+Ingested block coverage kept as sorted, merged, inclusive [start, end] intervals.
+
+Coverage of a label is stored on CryoLogsMetadata.block_ranges so a backfill
+works out its gaps from a handful of intervals instead of sets of every
+ingested block number.
+"""
+import os
+from typing import Iterable, List, Tuple
+
+from django.db import transaction
+
+from .models import CryoLogsMetadata
+
+
+def merge_ranges(ranges: Iterable[Iterable[int]]) -> List[List[int]]:
+    """
+    Sorts and merges overlapping or adjacent inclusive ranges.
+    """
+    merged = []
+    for start, end in sorted((int(s), int(e)) for s, e in ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def add_range(ranges: List[List[int]], start: int, end: int) -> List[List[int]]:
+    return merge_ranges(list(ranges) + [[start, end]])
+
+
+def missing_ranges(ranges: List[List[int]], start: int, end: int) -> List[Tuple[int, int]]:
+    """
+    Inclusive sub ranges of [start, end] not covered by the merged ranges.
+    """
+    gaps = []
+    current = start
+    for range_start, range_end in ranges:
+        if range_end < current:
+            continue
+        if range_start > end:
+            break
+        if range_start > current:
+            gaps.append((current, range_start - 1))
+        current = max(current, range_end + 1)
+        if current > end:
+            break
+    if current <= end:
+        gaps.append((current, end))
+    return gaps
+
+
+def split_range(start: int, end: int, size: int) -> List[Tuple[int, int]]:
+    return [(s, min(s + size - 1, end)) for s in range(start, end + 1, size)]
+
+
+def ranges_from_filenames(filenames: Iterable[str]) -> List[List[int]]:
+    """
+    Coverage of the "{chain}__logs__{label}__{start}_to_{end}.parquet" files
+    written by task_web3py_logs.
+    """
+    ranges = []
+    for file_name in filenames:
+        parts = file_name.replace(".parquet", "").split("__")[-1].split("_to_")
+        if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
+            ranges.append([int(parts[0]), int(parts[1])])
+    return merge_ranges(ranges)
+
+
+def get_block_ranges(metadata: CryoLogsMetadata, directory: str) -> List[List[int]]:
+    """
+    Stored coverage of a label, seeded once from the files already in its
+    directory for labels ingested before coverage was tracked.
+    """
+    if metadata.block_ranges:
+        return merge_ranges(metadata.block_ranges)
+    if not os.path.exists(directory):
+        return []
+    ranges = ranges_from_filenames(os.listdir(directory))
+    if ranges:
+        with transaction.atomic():
+            locked = CryoLogsMetadata.objects.select_for_update().get(pk=metadata.pk)
+            locked.block_ranges = merge_ranges((locked.block_ranges or []) + ranges)
+            locked.save(update_fields=["block_ranges"])
+        metadata.block_ranges = locked.block_ranges
+    return merge_ranges(metadata.block_ranges or [])
+
+
+def record_ingested_range(metadata: CryoLogsMetadata, start: int, end: int) -> List[List[int]]:
+    """
+    Adds [start, end] to the stored coverage, row locked so concurrent runs of
+    the same label do not overwrite each other.
+    """
+    with transaction.atomic():
+        locked = CryoLogsMetadata.objects.select_for_update().get(pk=metadata.pk)
+        locked.block_ranges = add_range(locked.block_ranges or [], start, end)
+        locked.save(update_fields=["block_ranges"])
+    metadata.block_ranges = locked.block_ranges
+    return metadata.block_ranges
@@ -0,0 +1,122 @@
+"""
+Persistent block <-> timestamp index per chain (core.models.BlockTimestamp).
+
+Headers are fetched once per distinct block, in JSON-RPC batches, and kept.
+Timestamp -> block lookups interpolate between the stored headers around the
+timestamp and refine with a few probes, which are stored as new anchors.
+"""
+from typing import Dict, Iterable
+
+from django.conf import settings
+
+from .models import BlockTimestamp, Chain
+from .providers import PooledHTTPProvider, get_web3
+
+WEB3_BATCH_SIZE = getattr(settings, "WEB3_BATCH_SIZE", 100)
+MAX_PROBES = 64
+
+
+def _fetch_headers(w3, block_numbers, batch_size):
+    """ {block number: (timestamp, hash)} for the given blocks. """
+    headers = {}
+    if isinstance(w3.provider, PooledHTTPProvider):
+        for i in range(0, len(block_numbers), batch_size):
+            chunk = block_numbers[i:i + batch_size]
+            responses = w3.provider.make_batch_request(
+                [("eth_getBlockByNumber", [hex(n), False]) for n in chunk]
+            )
+            for block_number, response in zip(chunk, responses):
+                block = response.get("result")
+                if block is None:
+                    raise ValueError(f"Block {block_number} not available: {response.get('error')}")
+                headers[block_number] = (int(block["timestamp"], 16), block["hash"])
+    else:
+        for block_number in block_numbers:
+            block = w3.eth.get_block(block_number)
+            headers[block_number] = (block["timestamp"], block["hash"].hex())
+    return headers
+
+
+def store_block_headers(chain: Chain, block_numbers: Iterable[int], w3=None, batch_size=None) -> Dict[int, int]:
+    """
+    Fetches and stores the headers of the given blocks that are not stored
+    yet, returns {block number: timestamp} for the fetched ones.
+    """
+    block_numbers = sorted(set(int(n) for n in block_numbers))
+    if not block_numbers:
+        return {}
+    w3 = get_web3(chain) if w3 is None else w3
+    headers = _fetch_headers(w3, block_numbers, WEB3_BATCH_SIZE if batch_size is None else batch_size)
+    BlockTimestamp.objects.bulk_create(
+        [
+            BlockTimestamp(chain=chain, block_number=n, timestamp=ts, block_hash=block_hash)
+            for n, (ts, block_hash) in headers.items()
+        ],
+        ignore_conflicts=True,
+        batch_size=5000,
+    )
+    return {n: ts for n, (ts, _) in headers.items()}
+
+
+def get_block_timestamps(chain: Chain, block_numbers: Iterable[int], w3=None) -> Dict[int, int]:
+    """
+    {block number: timestamp} for every distinct block, headers not stored
+    yet are fetched in batches.
+    """
+    wanted = set(int(n) for n in block_numbers)
+    timestamps = {}
+    wanted_list = sorted(wanted)
+    # bounded IN lists
+    for i in range(0, len(wanted_list), 10_000):
+        timestamps.update(
+            BlockTimestamp.objects.filter(chain=chain, block_number__in=wanted_list[i:i + 10_000])
+            .values_list("block_number", "timestamp")
+        )
+    missing = wanted - timestamps.keys()
+    if missing:
+        timestamps.update(store_block_headers(chain, missing, w3=w3))
+    return timestamps
+
+
+def _anchor(chain, block_number, w3):
+    stored = get_block_timestamps(chain, [block_number], w3=w3)
+    return block_number, stored[block_number]
+
+
+def block_for_timestamp(chain: Chain, timestamp: int, w3=None) -> int:
+    """
+    Last block with a timestamp <= timestamp (0 if the chain starts later).
+    """
+    w3 = get_web3(chain) if w3 is None else w3
+    timestamp = int(timestamp)
+    stored = BlockTimestamp.objects.filter(chain=chain)
+
+    below = stored.filter(timestamp__lte=timestamp).order_by("-timestamp", "-block_number").first()
+    above = stored.filter(timestamp__gt=timestamp).order_by("timestamp", "block_number").first()
+    lo = (below.block_number, below.timestamp) if below else _anchor(chain, 0, w3)
+    if lo[1] > timestamp:
+        return 0
+    if above:
+        hi = (above.block_number, above.timestamp)
+    else:
+        hi = _anchor(chain, w3.eth.block_number, w3)
+        if hi[1] <= timestamp:
+            return hi[0]
+
+    # invariant: lo timestamp <= timestamp < hi timestamp
+    bisect = False
+    for _ in range(MAX_PROBES):
+        width = hi[0] - lo[0]
+        if width <= 1:
+            return lo[0]
+        guess = lo[0] + int((timestamp - lo[1]) * width / max(hi[1] - lo[1], 1))
+        if bisect or guess <= lo[0] or guess >= hi[0]:
+            guess = (lo[0] + hi[0]) // 2
+        probe = _anchor(chain, guess, w3)
+        if probe[1] <= timestamp:
+            lo = probe
+        else:
+            hi = probe
+        # fall back to bisection for a step when interpolation barely helped
+        bisect = hi[0] - lo[0] > width // 2
+    raise Exception(f"Could not resolve block for timestamp {timestamp} on {chain}")
@@ -0,0 +1,162 @@
+"""
+COPY based bulk loading for high volume append-only tables.
+
+bulk_create renders every batch as one big parameterised INSERT that
+PostgreSQL has to parse and plan. copy_bulk_create streams the rows as CSV
+through COPY FROM STDIN instead. With ignore_conflicts / update_conflicts the
+rows are copied into a temporary staging table and merged with
+INSERT ... SELECT ... ON CONFLICT, since COPY itself cannot skip conflicts.
+On other backends (sqlite in development) it falls back to bulk_create with
+the same arguments. `python manage.py benchmark_bulk_load` times it against
+bulk_create on the configured database.
+"""
+import csv
+import io
+import json
+import uuid
+from itertools import islice
+from typing import Iterable, List
+
+from django.conf import settings
+from django.db import connections, models, router, transaction
+
+COPY_BATCH_SIZE = getattr(settings, "COPY_BATCH_SIZE", 50_000)
+# NULL marker of the CSV stream, empty strings stay empty strings
+COPY_NULL = "\\N"
+
+
+def _chunks(objs, size):
+    objs = iter(objs)
+    while True:
+        chunk = list(islice(objs, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _copy_fields(model) -> List[models.Field]:
+    # generated columns and serial keys are filled by the database
+    return [f for f in model._meta.concrete_fields if not f.generated and f is not model._meta.auto_field]
+
+
+def _native_types(field):
+    # python types COPY parses as is for the column, other values go through get_db_prep_save
+    if isinstance(field, models.ForeignKey):
+        field = field.target_field
+    if isinstance(field, (models.CharField, models.TextField)):
+        return (str,)
+    if isinstance(field, models.IntegerField):
+        return (int,)
+    if isinstance(field, models.FloatField):
+        return (float, int)
+    if isinstance(field, models.UUIDField):
+        return (uuid.UUID,)
+    return ()
+
+
+def _value_getter(field, connection):
+    attname = field.attname
+    plain = type(field).pre_save is models.Field.pre_save
+    native = _native_types(field)
+
+    def get(obj):
+        value = getattr(obj, attname) if plain else field.pre_save(obj, add=True)
+        if value is None:
+            return COPY_NULL
+        if type(value) in native:
+            return value
+        if isinstance(field, models.JSONField):
+            return json.dumps(value, cls=field.encoder)
+        value = field.get_db_prep_save(value, connection)
+        return COPY_NULL if value is None else value
+
+    return get
+
+
+def _copy(cursor, connection, table, fields, objs):
+    getters = [_value_getter(f, connection) for f in fields]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([get(obj) for get in getters] for obj in objs)
+    buffer.seek(0)
+    columns = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+    cursor.copy_expert(
+        f"COPY {connection.ops.quote_name(table)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+        buffer,
+    )
+    return cursor.rowcount
+
+
+def _merge(cursor, connection, model, stage, fields, update_conflicts, update_fields, unique_fields):
+    qn = connection.ops.quote_name
+    columns = ", ".join(qn(f.column) for f in fields)
+    if update_conflicts:
+        unique_columns = ", ".join(qn(model._meta.get_field(name).column) for name in unique_fields)
+        updates = ", ".join(
+            f"{qn(model._meta.get_field(name).column)} = EXCLUDED.{qn(model._meta.get_field(name).column)}"
+            for name in update_fields
+        )
+        # one row per key, ON CONFLICT DO UPDATE cannot touch a row twice
+        select = f"SELECT DISTINCT ON ({unique_columns}) {columns} FROM {qn(stage)}"
+        conflict = f"ON CONFLICT ({unique_columns}) DO UPDATE SET {updates}"
+    else:
+        select = f"SELECT {columns} FROM {qn(stage)}"
+        conflict = "ON CONFLICT DO NOTHING"
+    cursor.execute(f"INSERT INTO {qn(model._meta.db_table)} ({columns}) {select} {conflict}")
+    return cursor.rowcount
+
+
+def copy_bulk_create(
+    model,
+    objs: Iterable[models.Model],
+    batch_size: int = None,
+    ignore_conflicts: bool = False,
+    update_conflicts: bool = False,
+    update_fields: List[str] = None,
+    unique_fields: List[str] = None,
+) -> int:
+    """
+    Same arguments as bulk_create, objs may be any iterable (a generator keeps
+    only one batch in memory). Returns the number of rows written. Unlike
+    bulk_create, serial primary keys are neither copied nor set on objs.
+    """
+    batch_size = COPY_BATCH_SIZE if batch_size is None else batch_size
+    using = router.db_for_write(model)
+    connection = connections[using]
+
+    if connection.vendor != "postgresql":
+        written = 0
+        for chunk in _chunks(objs, batch_size):
+            model.objects.using(using).bulk_create(
+                chunk,
+                ignore_conflicts=ignore_conflicts,
+                update_conflicts=update_conflicts,
+                update_fields=update_fields,
+                unique_fields=unique_fields,
+            )
+            written += len(chunk)
+        return written
+
+    if update_conflicts and not (update_fields and unique_fields):
+        raise ValueError("update_conflicts needs update_fields and unique_fields")
+    fields = _copy_fields(model)
+    table = model._meta.db_table
+    staged = ignore_conflicts or update_conflicts
+    written = 0
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        if staged:
+            stage = f"stage_{table}_{uuid.uuid4().hex[:8]}"
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {connection.ops.quote_name(stage)} "
+                f"(LIKE {connection.ops.quote_name(table)} INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+        for chunk in _chunks(objs, batch_size):
+            if not staged:
+                written += _copy(cursor, connection, table, fields, chunk)
+                continue
+            _copy(cursor, connection, stage, fields, chunk)
+            written += _merge(cursor, connection, model, stage, fields, update_conflicts, update_fields, unique_fields)
+            cursor.execute(f"TRUNCATE {connection.ops.quote_name(stage)}")
+        if staged:
+            cursor.execute(f"DROP TABLE {connection.ops.quote_name(stage)}")
+    return written
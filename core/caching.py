@@ -1,8 +1,14 @@
 import hashlib
 import json
 import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
 from functools import lru_cache
-from typing import TextIO
+from typing import Optional, TextIO
+import numpy as np
 import requests
 from django.conf import settings
 
@@ -14,6 +20,407 @@ def filter_dict_in_range(data: dict, start: int, end: int) -> dict:
     return {k: v for k, v in data.items() if start <= int(k) <= end}
 
 
+class MemoryTier:
+    """
+    Bounded, thread safe LRU kept in process memory in front of the disk store.
+
+    Values are kept decoded, so a hit is a dictionary lookup, and are shared
+    between callers, which must not mutate them. The tier is bounded by the
+    number of entries and by the JSON encoded size of the values, measured
+    when they are set. Values larger than max_bytes are not kept.
+    """
+
+    def __init__(self, max_entries: int = 100_000, max_bytes: int = 256 * 1024**2):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            try:
+                value, _ = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value) -> None:
+        if self.max_entries <= 0 or self.max_bytes <= 0:
+            return
+        size = len(json.dumps(value))
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+class CacheStore:
+    """
+    On-disk key/value store for cached API responses.
+
+    Values are written to hash-sharded files (objects/ab/cd/<sha256>.json) and
+    indexed in an embedded SQLite database running in WAL mode, so an insert is
+    a single row upsert instead of a rewrite of a global mapping file, and
+    concurrent writers (celery workers, threads) are serialized by SQLite.
+
+    Entries can carry a TTL and the store is bounded by `max_bytes`; when the
+    bound is exceeded the least recently accessed entries are evicted until the
+    store is back under `low_watermark * max_bytes`.
+
+    Files indexed in place with register_file (legacy layout, script generated
+    data) are pinned: they never expire, are never evicted or removed by the
+    store and don't count against `max_bytes`, since they may not be fetchable
+    again.
+    """
+
+    INDEX_FILE = "index.sqlite3"
+    OBJECTS_DIR = "objects"
+    # accessed_at is only refreshed when older than this, to keep reads cheap
+    TOUCH_GRANULARITY = 60
+
+    def __init__(
+        self,
+        base_path: str,
+        max_bytes: Optional[int] = None,
+        default_ttl: Optional[int] = None,
+        low_watermark: float = 0.9,
+    ):
+        self.base_path = base_path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.low_watermark = low_watermark
+        self._local = threading.local()
+        os.makedirs(os.path.join(self.base_path, self.OBJECTS_DIR), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    source TEXT,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    expires_at REAL,
+                    pinned INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+            if "pinned" not in columns:
+                # indexes created before pinning existed
+                conn.execute("ALTER TABLE entries ADD COLUMN pinned INTEGER NOT NULL DEFAULT 0")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed_at_idx ON entries (accessed_at)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_expires_at_idx ON entries (expires_at)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO meta (name, value) VALUES ('total_bytes', 0)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite connections can't be shared between threads, keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(
+                os.path.join(self.base_path, self.INDEX_FILE),
+                timeout=30,
+                isolation_level=None,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _object_path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.OBJECTS_DIR, digest[:2], digest[2:4], f"{digest}.json")
+
+    def _delete_rows(self, conn: sqlite3.Connection, rows) -> None:
+        freed = 0
+        for key, path, size, pinned in rows:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            if pinned:
+                # not owned by the store, only the index row goes
+                continue
+            freed += size
+            try:
+                os.remove(os.path.join(self.base_path, path))
+            except FileNotFoundError:
+                pass
+        if freed:
+            conn.execute(
+                "UPDATE meta SET value = value - ? WHERE name = 'total_bytes'", (freed,)
+            )
+
+    def get(self, key: str):
+        return self.get_entry(key)[0]
+
+    def get_entry(self, key: str):
+        """
+        Returns (value, expires_at) for a key, or (None, None) on a miss.
+        """
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT path, size, accessed_at, expires_at, pinned FROM entries WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None, None
+        path, size, accessed_at, expires_at, pinned = row
+        now = time.time()
+        if expires_at is not None and expires_at <= now:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_rows(conn, [(key, path, size, pinned)])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return None, None
+        try:
+            with open(os.path.join(self.base_path, path), "r") as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None, None
+        if now - accessed_at > self.TOUCH_GRANULARITY:
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return value, expires_at
+
+    def _register(
+        self, key: str, path: str, size: int, source: Optional[str], ttl: Optional[int], pinned: bool = False
+    ) -> None:
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = now + ttl if ttl and not pinned else None
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            previous = conn.execute(
+                "SELECT size, pinned FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO entries (key, path, source, size, created_at, accessed_at, expires_at, pinned)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, path, source, size, now, now, expires_at, int(pinned)),
+            )
+            # pinned files don't count against max_bytes
+            delta = (0 if pinned else size) - (previous[0] if previous and not previous[1] else 0)
+            conn.execute(
+                "UPDATE meta SET value = value + ? WHERE name = 'total_bytes'", (delta,)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if self.max_bytes is not None and self.total_bytes() > self.max_bytes:
+            self.evict()
+
+    def set(self, key: str, value, source: Optional[str] = None, ttl: Optional[int] = None) -> None:
+        path = self._object_path(key)
+        full_path = os.path.join(self.base_path, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # write to a temp file in the same shard and rename, so readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(full_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, full_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._register(key, path, size, source, ttl)
+
+    def register_file(self, key: str, path: str, source: Optional[str] = None) -> None:
+        """
+        Index a file that already exists under base_path (e.g. legacy cache layout)
+        without copying it. The file is pinned, it never expires and is never
+        evicted or removed by the store.
+        """
+        size = os.path.getsize(os.path.join(self.base_path, path))
+        self._register(key, path, size, source, None, pinned=True)
+
+    def delete(self, key: str) -> None:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT key, path, size, pinned FROM entries WHERE key = ?", (key,)
+            ).fetchall()
+            self._delete_rows(conn, rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def total_bytes(self) -> int:
+        row = self._connection().execute(
+            "SELECT value FROM meta WHERE name = 'total_bytes'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def evict(self, batch_size: int = 500) -> None:
+        """
+        Drop expired entries, then least recently accessed entries until the
+        store is below the low watermark.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = conn.execute(
+                "SELECT key, path, size, pinned FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (time.time(),),
+            ).fetchall()
+            self._delete_rows(conn, expired)
+            if self.max_bytes is not None:
+                target = int(self.max_bytes * self.low_watermark)
+                total = conn.execute(
+                    "SELECT value FROM meta WHERE name = 'total_bytes'"
+                ).fetchone()[0]
+                while total > target:
+                    rows = conn.execute(
+                        "SELECT key, path, size, pinned FROM entries WHERE pinned = 0 ORDER BY accessed_at ASC LIMIT ?",
+                        (batch_size,),
+                    ).fetchall()
+                    if not rows:
+                        break
+                    victims = []
+                    for row in rows:
+                        victims.append(row)
+                        total -= row[2]
+                        if total <= target:
+                            break
+                    self._delete_rows(conn, victims)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class SeriesStore:
+    """
+    Columnar store for sorted time series (chainlink rounds, price feeds).
+
+    Each series is kept as two aligned .npy files, `<key>.ts.npy` (int64
+    timestamps, ascending) and `<key>.values.npy` (float64), which are memory
+    mapped on read. A range lookup is a binary search on the timestamp column
+    followed by a slice, so the cost no longer depends on the series length.
+    """
+
+    def __init__(self, base_path: str):
+        self.base_path = base_path
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, key: str):
+        base = os.path.join(self.base_path, *key.strip("/").split("/"))
+        return f"{base}.ts.npy", f"{base}.values.npy"
+
+    def exists(self, key: str) -> bool:
+        return all(os.path.exists(path) for path in self._paths(key))
+
+    def mtime(self, key: str) -> Optional[float]:
+        if not self.exists(key):
+            return None
+        return min(os.path.getmtime(path) for path in self._paths(key))
+
+    def save(self, key: str, timestamps, values) -> None:
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if timestamps.shape != values.shape:
+            raise ValueError("timestamps and values must have the same shape")
+        order = np.argsort(timestamps, kind="stable")
+        ts_path, values_path = self._paths(key)
+        os.makedirs(os.path.dirname(ts_path), exist_ok=True)
+        for path, array in ((ts_path, timestamps[order]), (values_path, values[order])):
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+        with self._lock:
+            self._loaded.pop(key, None)
+
+    def load(self, key: str):
+        """
+        Returns the (timestamps, values) memory mapped arrays of a series,
+        or None if the series isn't stored.
+        """
+        mtime = self.mtime(key)
+        if mtime is None:
+            return None
+        with self._lock:
+            loaded = self._loaded.get(key)
+            if loaded is not None and loaded[0] == mtime:
+                return loaded[1], loaded[2]
+        ts_path, values_path = self._paths(key)
+        timestamps = np.load(ts_path, mmap_mode="r")
+        values = np.load(values_path, mmap_mode="r")
+        with self._lock:
+            self._loaded[key] = (mtime, timestamps, values)
+        return timestamps, values
+
+    def get_range(self, key: str, start: int, end: int):
+        """
+        Returns the slices of the series with start <= timestamp <= end.
+        """
+        series = self.load(key)
+        if series is None:
+            return None
+        timestamps, values = series
+        lo = np.searchsorted(timestamps, start, side="left")
+        hi = np.searchsorted(timestamps, end, side="right")
+        return timestamps[lo:hi], values[lo:hi]
+
+
 @lru_cache(maxsize=None)
 class Caching:
     def __init__(self):
@@ -24,21 +431,22 @@ class Caching:
         project_root = settings.MEDIA_ROOT
         # Construct the base path for caching
         self.base_path = os.path.join(project_root, ".cache")
-        self.file_mappings = {}
         # Ensure the cache directory exists
         if not os.path.exists(self.base_path):
             os.makedirs(self.base_path)
         # Create or open the .gitignore file to ignore cache files
         with open(os.path.join(self.base_path, ".gitignore"), "w") as f:
             f.write("*")
-        # Load or initialize the file mappings
-        mapping_file_path = os.path.join(self.base_path, "file_mappings.json")
-        if os.path.exists(mapping_file_path):
-            with open(mapping_file_path, "r") as f:
-                self.file_mappings = json.load(f)
-        else:
-            with open(mapping_file_path, "w") as f:
-                f.write("{}")
+        self.store = CacheStore(
+            self.base_path,
+            max_bytes=getattr(settings, "RESPONSE_CACHE_MAX_BYTES", None),
+            default_ttl=getattr(settings, "RESPONSE_CACHE_TTL", None),
+        )
+        self.series = SeriesStore(os.path.join(self.base_path, "series"))
+        self.memory = MemoryTier(
+            getattr(settings, "RESPONSE_CACHE_MEMORY_ENTRIES", 100_000),
+            getattr(settings, "RESPONSE_CACHE_MEMORY_BYTES", 256 * 1024**2),
+        )
 
     def _path(self, path: str) -> str:
         # Normalize the path for the current operating system
@@ -52,9 +460,8 @@ class Caching:
             raise FileNotFoundError(f"File {file_path} not found")
 
     def add_to_mapping(self, path: str, file_path: str):
-        self.file_mappings[path] = file_path
-        with open(os.path.join(self.base_path, "file_mappings.json"), "w") as f:
-            json.dump(self.file_mappings, f)
+        # kept for compatibility, the source url is recorded by the store index on write
+        pass
 
     def open_write_file(self, path: str) -> TextIO:
         file_path = self._path(path)
@@ -62,20 +469,61 @@ class Caching:
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         return open(file_path, "w")
 
-    def save_json_file(self, path: str, data: dict) -> None:
-        with self.open_write_file(path) as f:
-            json.dump(data, f)
+    def save_json_file(self, path: str, data: dict, source: Optional[str] = None, ttl: Optional[int] = None) -> None:
+        key = path.strip("/")
+        self.store.set(key, data, source=source, ttl=ttl)
+        if ttl is None and self.store.default_ttl is None:
+            self.memory.set(key, data)
+        else:
+            # expiring entries are only served by the disk store which checks the ttl
+            self.memory.delete(key)
 
     def update_json_file(self, path: str, data: dict) -> None:
-        os.remove(self._path(path))
         self.save_json_file(path, data)
 
     def get_cached_response(self, path: str):
+        key = path.strip("/")
+        response = self.memory.get(key)
+        if response is not None:
+            return response
+        response, expires_at = self.store.get_entry(key)
+        if response is not None:
+            if expires_at is None:
+                self.memory.set(key, response)
+            return response
+        # fall back to files written by the previous flat layout (or generated by scripts)
+        # and index them in place so the next lookup goes through the store
         try:
             with self.open_read_file(path) as f:
-                return json.load(f)
+                response = json.load(f)
         except FileNotFoundError:
             return None
+        self.store.register_file(key, os.path.relpath(self._path(path), self.base_path))
+        # pinned, so it never expires
+        self.memory.set(key, response)
+        return response
+
+    def _build_chainlink_series(self, path: str, key: str) -> bool:
+        """
+        Converts the generated chainlink json (round timestamp -> raw answer) into
+        a columnar series of prices already scaled by the feed decimals.
+        """
+        legacy_path = self._path(path)
+        series_mtime = self.series.mtime(key)
+        if series_mtime is not None and (
+            not os.path.exists(legacy_path) or os.path.getmtime(legacy_path) <= series_mtime
+        ):
+            return True
+        response = self.get_cached_response(path)
+        if response is None:
+            return False
+        denom = 10 ** int(response["decimals"])
+        data = response["data"]
+        timestamps = [int(k) for k in data]
+        # scale with python ints to keep full precision of large answers
+        values = [round(int(v) / denom, 6) for v in data.values()]
+        self.series.save(key, timestamps, values)
+        return True
 
     def get_cached_chainlink(
         self,
@@ -85,31 +533,24 @@ class Caching:
         start_timestamp: int,
         end_timestamp: int,
     ):
-        try:
-            response = self.get_cached_response(
-                f"chainlink/{chain.name.lower()}/{asset}_{numeraire}.json"
-            )
-        except FileNotFoundError as e:
-            print(e)
+        path = f"chainlink/{chain.name.lower()}/{asset}_{numeraire}.json"
+        key = f"chainlink/{chain.name.lower()}/{asset}_{numeraire}"
+        if not self._build_chainlink_series(path, key):
+            print(f"File {self._path(path)} not found")
             print(
                 "Be sure to run `python scripts/chainlink/main.py oracle` and `python scripts/chainlink/main.py generate`"
             )
             quit(1)
         if start_timestamp > end_timestamp:
             raise ValueError("Start timestamp is greater than end timestamp")
-        response["data"] = {int(k): int(v) for k, v in response["data"].items()}
-        keys = list(response["data"].keys())
-        if start_timestamp < keys[0] or end_timestamp > keys[-1]:
+        timestamps, _ = self.series.load(key)
+        if len(timestamps) == 0 or start_timestamp < timestamps[0] or end_timestamp > timestamps[-1]:
             raise ValueError("Timestamps not in range")
 
-        filtered_data = filter_dict_in_range(
-            response["data"], start_timestamp, end_timestamp
-        )
-        denom = 10 ** int(response["decimals"])
-        resp = {key: round(filtered_data[key] / denom, 6) for key in filtered_data}
-        return resp
+        timestamps, values = self.series.get_range(key, start_timestamp, end_timestamp)
+        return dict(zip(timestamps.tolist(), values.tolist()))
 
-    def cached_request_get(self, url: str, **kwargs):
+    def cached_request_get(self, url: str, ttl: Optional[int] = None, **kwargs):
         # Sanitize the URL to create a valid directory name
         folder = url.split("://")[1].split("/")[0].replace(".", "_")
         # Use a hash of the entire URL to ensure uniqueness
@@ -119,20 +560,18 @@ class Caching:
             kwargs_str = json.dumps(kwargs)
         name = hashlib.sha256((url + kwargs_str).encode("utf-8")).hexdigest()[:10]
         # Construct the full path with folder and name
-        full_path = os.path.join(folder, name)
+        full_path = f"{folder}/{name}"
         response = self.get_cached_response(full_path)
         if response is not None:
-            response["is_internally_cached"] = True
-            return response
+            # cached values are shared, never written into
+            return {**response, "is_internally_cached": True}
 
         # Fetch and cache if not found
         response = requests.get(url, **kwargs)
         if response.status_code == 200:
-            self.save_json_file(full_path, response.json())
-            self.add_to_mapping(full_path, url)
-            response = response.json()
-            response["is_internally_cached"] = False
-            return response
+            data = response.json()
+            self.save_json_file(full_path, data, source=url, ttl=ttl)
+            return {**data, "is_internally_cached": False}
         else:
             print(
                 f"Failed to retrieve data from the API. Status code: {response.status_code} : {url}\nTried to query {url}"
@@ -0,0 +1,163 @@
+"""
+Compaction of the raw log parquet files of a label.
+
+task_web3py_logs and cryo write one small file per block window under
+MEDIA_ROOT/logs__{label}. compact_logs merges runs of contiguous small files
+that fall in the same block partition into a single zstd compressed file with
+bounded row groups and column statistics, named after the merged range with
+the same "{chain}__logs__{label}__{start}_to_{end}.parquet" convention so the
+block coverage parsing and the consumers keep working.
+
+Groups are planned from the ingestion ledger (core.ledger), which is updated
+in the same transaction the compacted file is put in place: only pending or
+done files are merged, never with files of the other state, and the merged
+group is registered under its new name with the state of its sources.
+"""
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db import transaction
+
+from .block_ranges import ranges_from_filenames
+from .ledger import label_directory, register_file, sync_ledger
+from .models import CryoLogsMetadata, LogFile
+
+# files below this size are merged
+COMPACTION_SMALL_FILE_BYTES = getattr(settings, "LOGS_COMPACTION_SMALL_FILE_BYTES", 16 * 1024**2)
+# compacted files never span a multiple of this many blocks
+COMPACTION_PARTITION_BLOCKS = getattr(settings, "LOGS_COMPACTION_PARTITION_BLOCKS", 1_000_000)
+COMPACTION_ROW_GROUP_SIZE = getattr(settings, "LOGS_COMPACTION_ROW_GROUP_SIZE", 128 * 1024)
+COMPACTION_MAX_ROWS = getattr(settings, "LOGS_COMPACTION_MAX_ROWS", 5_000_000)
+
+
+def plan_compaction(log_files, small_file_bytes=None, partition_blocks=None):
+    """
+    Groups of file names to merge from the label's LogFile entries:
+    contiguous block ranges, each file smaller than small_file_bytes, same
+    block partition, same ingestion state (pending or done, files being
+    processed or failed are left alone).
+    """
+    small_file_bytes = COMPACTION_SMALL_FILE_BYTES if small_file_bytes is None else small_file_bytes
+    partition_blocks = COMPACTION_PARTITION_BLOCKS if partition_blocks is None else partition_blocks
+
+    files = sorted(
+        ((f.start_block, f.end_block), f.file_name, f.size or 0, f.state)
+        for f in log_files
+        if f.start_block is not None and f.state in (LogFile.PENDING, LogFile.DONE)
+    )
+
+    groups = []
+    current = []
+    for (start, end), file_name, size, state in files:
+        if current:
+            (prev_start, prev_end), prev_name, _, prev_state = current[-1]
+            same_group = (
+                size < small_file_bytes
+                and start == prev_end + 1
+                and start // partition_blocks == current[0][0][0] // partition_blocks
+                and end // partition_blocks == start // partition_blocks
+                and state == prev_state
+            )
+            if not same_group:
+                groups.append(current)
+                current = []
+        if size < small_file_bytes:
+            current.append(((start, end), file_name, size, state))
+    if current:
+        groups.append(current)
+    return [[file_name for _, file_name, _, _ in group] for group in groups if len(group) > 1]
+
+
+def _read_group(directory, file_names):
+    tables = []
+    for file_name in file_names:
+        table = pq.read_table(os.path.join(directory, file_name))
+        if table.num_rows:
+            # pandas index metadata describes the source file only
+            tables.append(table.replace_schema_metadata(None))
+    if not tables:
+        return pa.table({})
+    table = pa.concat_tables(tables, promote_options="default")
+    sort_keys = [(c, "ascending") for c in ("block_number", "log_index") if c in table.column_names]
+    if sort_keys:
+        table = table.sort_by(sort_keys)
+    return table
+
+
+def compact_group(metadata, directory, file_names, tmp_directory):
+    """
+    Merges one planned group, swaps it in and updates the ledger atomically.
+    Returns the compacted file name, None if the group changed state meanwhile.
+    """
+    start = ranges_from_filenames([file_names[0]])[0][0]
+    end = ranges_from_filenames([file_names[-1]])[0][1]
+    prefix = file_names[0].rsplit("__", 1)[0]
+    target_name = f"{prefix}__{start}_to_{end}.parquet"
+
+    table = _read_group(directory, file_names)
+    tmp_path = os.path.join(tmp_directory, target_name)
+    pq.write_table(
+        table,
+        tmp_path,
+        compression="zstd",
+        row_group_size=COMPACTION_ROW_GROUP_SIZE,
+        write_statistics=True,
+    )
+
+    def remove_sources():
+        for file_name in file_names:
+            os.remove(os.path.join(directory, file_name))
+
+    with transaction.atomic():
+        sources = list(
+            LogFile.objects.select_for_update().filter(metadata=metadata, file_name__in=file_names)
+        )
+        states = {f.state for f in sources}
+        if len(sources) != len(file_names) or len(states) != 1 or states - {LogFile.PENDING, LogFile.DONE}:
+            # a consumer claimed part of the group since it was planned
+            os.remove(tmp_path)
+            return None
+        os.replace(tmp_path, os.path.join(directory, target_name))
+        LogFile.objects.filter(pk__in=[f.pk for f in sources]).delete()
+        register_file(metadata, target_name, state=states.pop())
+        # sources go only once the ledger change is committed
+        transaction.on_commit(remove_sources)
+    return target_name
+
+
+def compact_logs(label, small_file_bytes=None, partition_blocks=None, max_rows=None):
+    """
+    Compacts the small files of a label, returns the compacted file names.
+    """
+    max_rows = COMPACTION_MAX_ROWS if max_rows is None else max_rows
+    metadata = CryoLogsMetadata.objects.get(label=label)
+    directory = label_directory(label)
+    if not os.path.exists(directory):
+        return []
+    # same filesystem as the label directory so the final move is atomic
+    tmp_directory = os.path.join(settings.MEDIA_ROOT, ".compaction_tmp")
+    os.makedirs(tmp_directory, exist_ok=True)
+
+    sync_ledger(metadata)
+    log_files = list(LogFile.objects.filter(metadata=metadata))
+    rows_by_name = {f.file_name: f.row_count or 0 for f in log_files}
+    groups = plan_compaction(log_files, small_file_bytes, partition_blocks)
+    compacted = []
+    for group in groups:
+        # keep single outputs bounded, split groups holding too many rows
+        batch = []
+        rows = 0
+        for file_name in group:
+            file_rows = rows_by_name[file_name]
+            if batch and rows + file_rows > max_rows:
+                if len(batch) > 1:
+                    compacted.append(compact_group(metadata, directory, batch, tmp_directory))
+                batch, rows = [], 0
+            batch.append(file_name)
+            rows += file_rows
+        if len(batch) > 1:
+            compacted.append(compact_group(metadata, directory, batch, tmp_directory))
+        print(f"Compacted {len(group)} files of {label}")
+    return [file_name for file_name in compacted if file_name is not None]
@@ -0,0 +1,140 @@
+"""
+Venue adapters of the quote pipeline (core.dex_quotes.pipeline).
+
+An adapter turns (pair, USD amount) into a call of its venue's quote_requests
+module, with prices taken from the run's MarketContext. A new venue only
+needs a quote_requests module and an adapter registered in ADAPTERS, the
+pipeline gives it concurrency, rate limiting and batched writes.
+"""
+from typing import Any, Dict, List
+
+from core.models import DexQuotePair
+from .market_context import MarketContext
+from .quote_requests import cowswap, kyperswap, okx, paraswap
+
+
+def missing_price(token) -> Dict[str, Any]:
+    return {"error": "MissingPrice", "message": f"no price for {token.contract_address}"}
+
+
+class VenueAdapter:
+    """
+    Base adapter. name is the venue's dex_aggregator and the key of its
+    rate limit in DEX_QUOTE_RATE_LIMITS.
+    """
+
+    name = None
+
+    def prepare(self, pairs: List[DexQuotePair], context: MarketContext) -> None:
+        """
+        Called once per run before any quote, for per run lookups. Runs
+        within the venue's rate limit and is retried after a
+        RateLimitExceededException.
+        """
+
+    def quote(self, pair: DexQuotePair, amount: float, context: MarketContext) -> Dict[str, Any]:
+        """Row of the quote of selling amount USD of the pair, or an {"error": ...} dict."""
+        raise NotImplementedError
+
+
+class KyperswapAdapter(VenueAdapter):
+    name = "kyperswap"
+
+    def quote(self, pair, amount, context):
+        sell_token = pair.src_asset
+        buy_token = pair.dst_asset
+        market_price = context.price(sell_token)
+        if market_price is None:
+            return missing_price(sell_token)
+        return kyperswap.get_quote(
+            src_token=sell_token.contract_address,
+            src_decimals=sell_token.decimals,
+            dest_token=buy_token.contract_address,
+            dest_decimals=buy_token.decimals,
+            usd_amount=amount,
+            market_price=market_price,
+            network_id=sell_token.chain.chain_id,
+        )
+
+
+class ParaswapAdapter(VenueAdapter):
+    name = "paraswap"
+
+    def quote(self, pair, amount, context):
+        sell_token = pair.src_asset
+        buy_token = pair.dst_asset
+        market_price = context.price(sell_token)
+        if market_price is None:
+            return missing_price(sell_token)
+        return paraswap.get_quote(
+            src_token=sell_token.contract_address,
+            src_decimals=sell_token.decimals,
+            dest_token=buy_token.contract_address,
+            dest_decimals=buy_token.decimals,
+            usd_amount=amount,
+            market_price=market_price,
+            network_id=sell_token.chain.chain_id,
+        )
+
+
+class CowswapAdapter(VenueAdapter):
+    name = "cowswap"
+
+    def quote(self, pair, amount, context):
+        sell_token = pair.src_asset
+        buy_token = pair.dst_asset
+        src_price = context.price(sell_token)
+        dst_price = context.price(buy_token)
+        if src_price is None or dst_price is None:
+            return missing_price(sell_token if src_price is None else buy_token)
+        return cowswap.get_quote(
+            src_token=sell_token.contract_address,
+            src_decimals=sell_token.decimals,
+            dst_token=buy_token.contract_address,
+            dst_decimals=buy_token.decimals,
+            src_usd_amount=amount,
+            src_price=src_price,
+            dst_price=dst_price,
+            network_id=sell_token.chain.chain_id,
+        )
+
+
+class OkxAdapter(VenueAdapter):
+    name = "okx"
+
+    def __init__(self, okx_project_id: str, okx_api_key: str, okx_passphrase: str, okx_secret: str):
+        self.credentials = {
+            "okx_project_id": okx_project_id,
+            "okx_api_key": okx_api_key,
+            "okx_passphrase": okx_passphrase,
+            "okx_secret": okx_secret,
+        }
+        self.dex_ids = None
+
+    def prepare(self, pairs, context):
+        if pairs:
+            # need to get all dex ids because default dex IDs are limited
+            self.dex_ids = okx.get_dex_ids(**self.credentials, network_id=pairs[0].src_asset.chain.chain_id)
+
+    def quote(self, pair, amount, context):
+        return okx.get_quote(
+            **self.credentials,
+            src_token=pair.src_asset.contract_address,
+            dst_token=pair.dst_asset.contract_address,
+            src_amount=amount,
+            network_id=pair.src_asset.chain.chain_id,
+            dex_ids=self.dex_ids,
+        )
+
+
+ADAPTERS = {
+    adapter.name: adapter
+    for adapter in (KyperswapAdapter, ParaswapAdapter, CowswapAdapter, OkxAdapter)
+}
+
+
+def get_adapter(venue: str, **kwargs) -> VenueAdapter:
+    """Adapter instance of a registered venue, kwargs go to its constructor."""
+    if venue not in ADAPTERS:
+        raise ValueError(f"Unknown venue {venue}, known venues: {', '.join(ADAPTERS)}")
+    return ADAPTERS[venue](**kwargs)
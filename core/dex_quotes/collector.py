@@ -0,0 +1,175 @@
+"""
+Concurrent quote collection across DEX aggregators.
+
+A sweep is the series of quotes of one pair on one venue, for the trade sizes
+its sampler (core.dex_quotes.sampling) picks. Sweeps of all venues and pairs
+run at once on a thread pool, the quotes of a sweep stay sequential so the
+sampler can choose each size from the quotes before it. Every request first
+takes a token from its venue's bucket (DEX_QUOTE_RATE_LIMITS, requests per
+second and burst), so each venue is used up to its budget and no further. A
+RateLimitExceededException (HTTP 429) pauses the whole venue for the
+Retry-After of the response, or an exponential backoff without one, and the
+quote is retried. call_with_retries gives other venue requests (adapter
+lookups) the same treatment.
+
+Completed sweeps are handed to the caller on the calling thread, so the
+workers do no database work.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Union
+
+from django.conf import settings
+
+from .price_fetcher import RateLimitExceededException
+from .sampling import AdaptiveSampler, FixedSampler
+
+DEX_QUOTE_RATE_LIMITS = getattr(settings, "DEX_QUOTE_RATE_LIMITS", {})
+DEX_QUOTE_MAX_WORKERS = getattr(settings, "DEX_QUOTE_MAX_WORKERS", 8)
+DEX_QUOTE_MAX_RETRIES = getattr(settings, "DEX_QUOTE_MAX_RETRIES", 5)
+DEX_QUOTE_RETRY_BACKOFF = getattr(settings, "DEX_QUOTE_RETRY_BACKOFF", 2.0)
+# (requests per second, burst) of venues without a configured limit, the pace of the old serial jobs
+DEFAULT_RATE_LIMIT = (1 / 1.1, 1)
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket, refilled at `rate` tokens per second up to
+    `capacity`. pause() empties it and stops the refill for a while.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Blocks until a token is available and takes it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self.lock:
+            until = time.monotonic() + seconds
+            if until > self.paused_until:
+                self.paused_until = until
+                self.tokens = 0
+                self.updated = until
+
+
+@dataclass
+class Sweep:
+    """
+    Quotes of one pair on one venue, quote(amount) returns the row of a
+    quote or an {"error": ...} dict.
+    """
+
+    venue: str
+    pair: Any
+    sampler: Union[AdaptiveSampler, FixedSampler]
+    quote: Callable[[float], Dict[str, Any]]
+
+
+def make_buckets(venues, rate_limits: Dict[str, tuple] = None) -> Dict[str, TokenBucket]:
+    rate_limits = DEX_QUOTE_RATE_LIMITS if rate_limits is None else rate_limits
+    return {venue: TokenBucket(*rate_limits.get(venue, DEFAULT_RATE_LIMIT)) for venue in set(venues)}
+
+
+def call_with_retries(bucket: TokenBucket, call: Callable[[], Any], max_retries: int = None, retry_backoff: float = None):
+    """
+    call() within the venue's rate limit, retried after rate limit
+    responses. Raises the last RateLimitExceededException once out of retries.
+    """
+    max_retries = DEX_QUOTE_MAX_RETRIES if max_retries is None else max_retries
+    retry_backoff = DEX_QUOTE_RETRY_BACKOFF if retry_backoff is None else retry_backoff
+    for attempt in range(max_retries + 1):
+        bucket.acquire()
+        try:
+            return call()
+        except RateLimitExceededException as e:
+            if attempt == max_retries:
+                raise
+            delay = e.retry_after if e.retry_after is not None else retry_backoff * 2 ** attempt
+            print(f"{e} Pausing for {delay:.1f}s")
+            bucket.pause(delay)
+
+
+def request_quote(bucket: TokenBucket, quote, amount, max_retries: int = None, retry_backoff: float = None):
+    """quote(amount) through call_with_retries."""
+    return call_with_retries(bucket, lambda: quote(amount), max_retries, retry_backoff)
+
+
+def run_sweep(sweep: Sweep, bucket: TokenBucket, max_retries: int = None, retry_backoff: float = None) -> List[Dict[str, Any]]:
+    """
+    Quotes of the amounts the sweep's sampler asks for, until it is done.
+    Failed quotes are reported to the sampler and skipped.
+    """
+    rows = []
+    while True:
+        amount = sweep.sampler.next_amount()
+        if amount is None:
+            break
+        try:
+            row = request_quote(bucket, sweep.quote, amount, max_retries, retry_backoff)
+        except RateLimitExceededException as e:
+            print(f"Giving up {sweep.venue} quotes of {sweep.pair}: {e}")
+            break
+        except Exception as e:
+            row = {"error": "UnexpectedError", "message": str(e)}
+        if not row or "error" in row:
+            print(f"Failed to get {sweep.venue} quote of {sweep.pair} for {amount}: {row}")
+            sweep.sampler.add(amount, None)
+            continue
+        rows.append(row)
+        sweep.sampler.add(amount, row.get("price_impact", 0))
+    return rows
+
+
+def run_sweeps(
+    sweeps: List[Sweep],
+    on_sweep: Callable[[Sweep, List[Dict[str, Any]]], None],
+    max_workers: int = None,
+    rate_limits: Dict[str, tuple] = None,
+    max_retries: int = None,
+    retry_backoff: float = None,
+    buckets: Dict[str, TokenBucket] = None,
+) -> int:
+    """
+    Runs the sweeps concurrently, on_sweep(sweep, rows) is called from the
+    calling thread as sweeps complete. buckets are the venues' buckets when
+    the caller already made requests through them. Returns the number of
+    quotes collected.
+    """
+    if not sweeps:
+        return 0
+    max_workers = DEX_QUOTE_MAX_WORKERS if max_workers is None else max_workers
+    buckets = buckets or {}
+    venues = {sweep.venue for sweep in sweeps} - set(buckets)
+    buckets = {**buckets, **make_buckets(venues, rate_limits)}
+    collected = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sweeps)))) as executor:
+        futures = {
+            executor.submit(run_sweep, sweep, buckets[sweep.venue], max_retries, retry_backoff): sweep
+            for sweep in sweeps
+        }
+        for future in as_completed(futures):
+            rows = future.result()
+            on_sweep(futures[future], rows)
+            collected += len(rows)
+    return collected
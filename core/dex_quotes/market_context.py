@@ -0,0 +1,106 @@
+"""
+Run scoped prices and total supplies of the tokens of a quote job.
+
+The quote jobs need the USD price of the tokens of every pair (to size the
+trades and as market price of every quote) and their total supply (TVL, for
+the range of trade sizes). MarketContext fetches all prices with one batched
+DefiLlama call and all supplies with one Multicall3 batch per chain when the
+run starts, so the per quote path only does dictionary lookups. With a ttl
+(DEX_QUOTE_CONTEXT_TTL) the snapshot is refetched once it is older than ttl
+seconds, checked on access, for runs long enough for prices to move. A
+failed price request raises instead of leaving the snapshot without prices.
+"""
+import threading
+import time
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from django.conf import settings
+from web3 import Web3
+
+from core.models import ERC20
+from core.multicall import batch_call
+from core.providers import get_web3
+from core.utils import price_defillama_batch
+from .utils import TOTAL_SUPPLY_ABI
+
+DEX_QUOTE_CONTEXT_TTL = getattr(settings, "DEX_QUOTE_CONTEXT_TTL", None)
+
+
+def coin_key(token: ERC20) -> str:
+    """DefiLlama "chain:address" key of the token, as get_current_price builds it."""
+    return f"{token.chain.chain_name.lower()}:{token.contract_address}"
+
+
+class MarketContext:
+    """
+    Prices and supplies (in whole tokens) of a fixed set of tokens, None
+    for tokens that could not be priced or read.
+    """
+
+    def __init__(self, tokens: Iterable[ERC20], ttl: Optional[float] = None):
+        self.tokens = {token.pk: token for token in tokens}
+        self.ttl = DEX_QUOTE_CONTEXT_TTL if ttl is None else ttl
+        self.prices = {}
+        self.supplies = {}
+        self.fetched_at = None
+        self.lock = threading.Lock()
+        self.refresh()
+
+    @classmethod
+    def for_pairs(cls, pairs, ttl: Optional[float] = None) -> "MarketContext":
+        tokens = []
+        for pair in pairs:
+            tokens += [pair.src_asset, pair.dst_asset]
+        return cls(tokens, ttl=ttl)
+
+    def refresh(self) -> None:
+        tokens = list(self.tokens.values())
+
+        found, missing = price_defillama_batch([coin_key(token) for token in tokens])
+        if missing:
+            print(f"No price for {missing}")
+        prices = {token.pk: found[coin_key(token)] for token in tokens if coin_key(token) in found}
+
+        by_chain = defaultdict(list)
+        for token in tokens:
+            by_chain[token.chain_id].append(token)
+        supplies = {}
+        for chain_tokens in by_chain.values():
+            w3 = get_web3(chain_tokens[0].chain)
+            calls = [
+                (w3.eth.contract(address=Web3.to_checksum_address(token.contract_address), abi=TOTAL_SUPPLY_ABI), "totalSupply", [], True)
+                for token in chain_tokens
+            ]
+            for token, supply in zip(chain_tokens, batch_call(w3, calls)):
+                if supply is None:
+                    print(f"Could not read the supply of {token.contract_address}")
+                else:
+                    supplies[token.pk] = supply / pow(10, token.decimals)
+
+        self.prices = prices
+        self.supplies = supplies
+        self.fetched_at = time.monotonic()
+
+    def _refresh_if_stale(self) -> None:
+        if not self.ttl or time.monotonic() - self.fetched_at <= self.ttl:
+            return
+        with self.lock:
+            # another thread may have refreshed while we waited
+            if time.monotonic() - self.fetched_at > self.ttl:
+                self.refresh()
+
+    def price(self, token: ERC20) -> Optional[float]:
+        self._refresh_if_stale()
+        return self.prices.get(token.pk)
+
+    def supply(self, token: ERC20) -> Optional[float]:
+        self._refresh_if_stale()
+        return self.supplies.get(token.pk)
+
+    def tvl(self, token: ERC20) -> Optional[float]:
+        price = self.price(token)
+        supply = self.supply(token)
+        if price is None or supply is None:
+            return None
+        return supply * price
@@ -0,0 +1,146 @@
+"""
+Quote pipeline shared by every venue.
+
+run_quote_pipeline snapshots the market (MarketContext), computes the range
+of trade sizes of every ingested pair of the network, runs one sweep per pair
+and venue adapter through the concurrent collector and hands the rows to a
+QuoteWriter. Sweeps sample the range adaptively (core.dex_quotes.sampling),
+num_samples being the most quotes a sweep may take, or with adaptive=False
+the fixed noisy geometric grid of compute_sampling_points. The writer buffers
+DexQuote rows and writes them with one COPY (core.bulk_load) once
+DEX_QUOTE_FLUSH_ROWS rows are buffered or the oldest buffered row is
+DEX_QUOTE_FLUSH_SECONDS old, and at the end of the run, so database writes
+cost one round trip per batch instead of one per quote. The monthly partitions
+of a batch are created before it is written (core.dex_quotes.storage).
+"""
+import time
+from typing import Any, Dict, List
+
+from django.conf import settings
+from django.db import transaction
+
+from core.bulk_load import copy_bulk_create
+from core.models import DexQuote, DexQuotePair
+from .adapters import VenueAdapter
+from .collector import Sweep, call_with_retries, make_buckets, run_sweeps
+from .market_context import MarketContext
+from .price_fetcher import RateLimitExceededException
+from .sampling import AdaptiveSampler, FixedSampler
+from .storage import ensure_partitions
+from .utils import compute_sampling_points, compute_sampling_range
+
+DEX_QUOTE_FLUSH_ROWS = getattr(settings, "DEX_QUOTE_FLUSH_ROWS", 500)
+DEX_QUOTE_FLUSH_SECONDS = getattr(settings, "DEX_QUOTE_FLUSH_SECONDS", 60)
+
+
+class QuoteWriter:
+    """
+    Buffered DexQuote writes. add() is not thread safe, the collector calls
+    it from the calling thread only.
+    """
+
+    def __init__(self, flush_rows: int = None, flush_seconds: float = None):
+        self.flush_rows = DEX_QUOTE_FLUSH_ROWS if flush_rows is None else flush_rows
+        self.flush_seconds = DEX_QUOTE_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self.buffer = []
+        self.buffered_since = None
+        self.written = 0
+
+    def add(self, pair: DexQuotePair, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            try:
+                self.buffer.append(DexQuote(pair=pair, **row))
+            except Exception as e:
+                print(f"Failed to save entry to DB: {e}")
+        if self.buffered_since is None and self.buffer:
+            self.buffered_since = time.monotonic()
+        if len(self.buffer) >= self.flush_rows or (
+            self.buffer and time.monotonic() - self.buffered_since >= self.flush_seconds
+        ):
+            self.flush()
+
+    def flush(self) -> int:
+        quotes, self.buffer, self.buffered_since = self.buffer, [], None
+        if not quotes:
+            return 0
+        try:
+            timestamps = [quote.timestamp for quote in quotes]
+            ensure_partitions(min(timestamps), max(timestamps))
+            with transaction.atomic():
+                written = copy_bulk_create(DexQuote, quotes)
+        except Exception as e:
+            # one bad row should not cost the batch
+            print(f"Batch of {len(quotes)} quotes failed ({e}), saving one by one")
+            written = 0
+            for quote in quotes:
+                try:
+                    quote.save()
+                    written += 1
+                except Exception as e:
+                    print(f"Failed to save entry to DB: {e}")
+        self.written += written
+        return written
+
+
+def run_quote_pipeline(
+    network: str,
+    adapters: List[VenueAdapter],
+    num_samples: int = 30,
+    max_workers: int = None,
+    context_ttl: float = None,
+    writer: QuoteWriter = None,
+    adaptive: bool = True,
+    tolerance: float = None,
+) -> int:
+    """
+    Quotes every ingested pair of the network on every adapter's venue and
+    writes them. tolerance is the price impact error AdaptiveSampler
+    refines down to. Returns the number of quotes written.
+    """
+    asset_permutations = list(
+        DexQuotePair.objects.filter(src_asset__chain__chain_name__iexact=network, ingest=True)
+        .select_related("src_asset__chain", "dst_asset__chain")
+    )
+    if len(asset_permutations) == 0:
+        return 0
+
+    context = MarketContext.for_pairs(asset_permutations, ttl=context_ttl)
+    buckets = make_buckets([adapter.name for adapter in adapters])
+    prepared = []
+    for adapter in adapters:
+        try:
+            call_with_retries(buckets[adapter.name], lambda adapter=adapter: adapter.prepare(asset_permutations, context))
+        except RateLimitExceededException as e:
+            print(f"Skipping {adapter.name}, rate limited while preparing: {e}")
+            continue
+        prepared.append(adapter)
+    adapters = prepared
+
+    sweeps = []
+    for permutation in asset_permutations:
+        if adaptive:
+            sampling_range = compute_sampling_range(permutation.src_asset, permutation.dst_asset, context)
+            if sampling_range is None:
+                continue
+        else:
+            # the same trade sizes on every venue
+            amounts = compute_sampling_points(permutation.src_asset, permutation.dst_asset, num_samples, context)
+        for adapter in adapters:
+            if adaptive:
+                sampler = AdaptiveSampler(*sampling_range, max_samples=num_samples, tolerance=tolerance)
+            else:
+                sampler = FixedSampler(amounts)
+            sweeps.append(Sweep(
+                venue=adapter.name,
+                pair=permutation,
+                sampler=sampler,
+                quote=lambda amount, adapter=adapter, permutation=permutation: adapter.quote(permutation, amount, context),
+            ))
+
+    writer = QuoteWriter() if writer is None else writer
+    try:
+        run_sweeps(sweeps, lambda sweep, rows: writer.add(sweep.pair, rows), max_workers=max_workers, buckets=buckets)
+    finally:
+        writer.flush()
+    print(f"Wrote {writer.written} quotes of {len(asset_permutations)} pairs on {', '.join(a.name for a in adapters)}")
+    return writer.written
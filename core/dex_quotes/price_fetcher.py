@@ -1,6 +1,8 @@
 import requests
 from requests.exceptions import ConnectionError, Timeout, RequestException, HTTPError
 from typing import Dict, Any, Optional
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
 class RateLimitExceededException(Exception):
     """Exception raised for rate limit exceeded (429 Too Many Requests)."""
@@ -8,6 +10,28 @@ class RateLimitExceededException(Exception):
         super().__init__(message)
         self.retry_after = retry_after
 
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds to wait from a Retry-After header, which is either a number of
+    seconds or an HTTP date. None if missing or unreadable.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def raise_for_rate_limit(response: requests.Response) -> None:
+    """Raises RateLimitExceededException if the response is a 429."""
+    if response.status_code == 429:
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        raise RateLimitExceededException(f"Rate limit exceeded ({response.url.split('?')[0]}).", retry_after=retry_after)
+
 def get_current_price(token_address: str, network: str) -> Optional[float]:
     """
     Fetches the current price of a token from the Coin Llama API and extracts the price.
@@ -25,9 +49,7 @@ def get_current_price(token_address: str, network: str) -> Optional[float]:
     print(url)
     
     response = requests.get(url)
-    if response.status_code == 429:
-            retry_after = response.headers.get('Retry-After')
-            raise RateLimitExceededException("Rate limit exceeded.", retry_after=int(retry_after) if retry_after else None)
+    raise_for_rate_limit(response)
     response.raise_for_status()  # Raise an exception for HTTP errors
 
     data = response.json()
@@ -2,6 +2,9 @@ import requests
 from requests.exceptions import ConnectionError, Timeout, RequestException
 from typing import Dict, Any
 from datetime import datetime, timedelta
+from ..price_fetcher import RateLimitExceededException, raise_for_rate_limit
+
+API_URL = "https://api.cow.fi"
 
 def get_quote(
     src_token: str, 
@@ -57,7 +60,8 @@ def get_quote(
     }
 
     try:
-        response = requests.post(f'https://api.cow.fi/{network}/api/v1/quote', json=body)
+        response = requests.post(f'{API_URL}/{network}/api/v1/quote', json=body)
+        raise_for_rate_limit(response)
         response.raise_for_status()
         data = response.json()['quote']
 
@@ -79,6 +83,8 @@ def get_quote(
             "timestamp": round((datetime.now() + timedelta(minutes=30)).replace(minute=0, second=0, microsecond=0).timestamp())
         }
 
+    except RateLimitExceededException:
+        raise
     except ConnectionError as ce:
         print(f"Connection error: {ce}")
         return {"error": "ConnectionError", "message": str(ce)}
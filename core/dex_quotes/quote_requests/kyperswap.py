@@ -3,6 +3,9 @@ from requests.exceptions import ConnectionError, Timeout, RequestException
 from typing import Dict, Any
 from datetime import datetime, timedelta
 from ..DTO import network_mapping
+from ..price_fetcher import RateLimitExceededException, raise_for_rate_limit
+
+API_URL = "https://aggregator-api.kyberswap.com"
 
 def get_quote(
     src_token: str, 
@@ -30,7 +33,7 @@ def get_quote(
     """
 
     network = network_mapping[network_id].network.lower()
-    api_url = f"https://aggregator-api.kyberswap.com/{network}/api/v1/routes"
+    api_url = f"{API_URL}/{network}/api/v1/routes"
 
     # Calculate the amount of the source token to swap
 
@@ -50,14 +53,15 @@ def get_quote(
     try:
         # Make the API request
         response = requests.get(api_url, headers=headers, params=params)
+        raise_for_rate_limit(response)
         response.raise_for_status()  # Raise an exception for HTTP errors
 
         if response.status_code == 200:
             quote_raw = response.json()
 
             # extract
-            src_amount = float(quote_raw['data']['routeSummary']['amountIn'])
-            dest_amount = float(quote_raw['data']['routeSummary']['amountOut'])
+            src_amount = int(quote_raw['data']['routeSummary']['amountIn'])
+            dest_amount = int(quote_raw['data']['routeSummary']['amountOut'])
             src_usd = float(quote_raw['data']['routeSummary']['amountInUsd']) 
             dest_usd = float(quote_raw['data']['routeSummary']['amountOutUsd']) 
             aggregator = str('kyperswap')
@@ -83,6 +87,8 @@ def get_quote(
 
             return row
 
+    except RateLimitExceededException:
+        raise
     except ConnectionError as ce:
         print(f"Connection error: {ce}")
         return {"error": "ConnectionError", "message": str(ce)}
@@ -7,6 +7,9 @@ import hashlib
 import base64
 import hmac
 import json
+from ..price_fetcher import RateLimitExceededException, raise_for_rate_limit
+
+API_URL = "https://www.okx.com"
 
 def get_okx_auth_signature(now, method, url, params, okx_secret):
     input_string = f'{now}{method}{url}?{urllib.parse.urlencode(params)}'
@@ -37,7 +40,8 @@ def get_dex_ids(
         'OK-ACCESS-SIGN': get_okx_auth_signature(now, 'GET', urlPath, params, okx_secret)}
 
     try:
-        response = requests.get("https://www.okx.com" + urlPath, params=params, headers=headers)
+        response = requests.get(API_URL + urlPath, params=params, headers=headers)
+        raise_for_rate_limit(response)
         response.raise_for_status()
 
         dex_ids = []
@@ -105,7 +109,8 @@ def get_quote(
     }
 
     try:
-        response = requests.get('https://www.okx.com' + urlPath, params=params, headers=headers)
+        response = requests.get(API_URL + urlPath, params=params, headers=headers)
+        raise_for_rate_limit(response)
         response.raise_for_status()
         data = response.json()['data'][0]
 
@@ -131,6 +136,8 @@ def get_quote(
             "timestamp": round((datetime.now() + timedelta(minutes=30)).replace(minute=0, second=0, microsecond=0).timestamp())
         }
 
+    except RateLimitExceededException:
+        raise
     except ConnectionError as ce:
         print(f"Connection error: {ce}")
         return {"error": "ConnectionError", "message": str(ce)}
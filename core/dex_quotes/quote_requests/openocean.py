@@ -60,8 +60,8 @@ def get_quote(
             quote_raw = response.json()
 
             # extract
-            src_amount = float(quote_raw['data']['inAmount'])
-            dest_amount = float(quote_raw['data']['outAmount'])
+            src_amount = int(quote_raw['data']['inAmount'])
+            dest_amount = int(quote_raw['data']['outAmount'])
             src_usd = float(quote_raw['data']['inToken']['volume'])
             dest_usd = float(quote_raw['data']['outToken']['volume'])
             aggregator = str('openocean')
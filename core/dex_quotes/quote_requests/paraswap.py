@@ -2,7 +2,9 @@ import requests
 from requests.exceptions import ConnectionError, Timeout, RequestException
 from typing import Dict, Any
 from datetime import datetime, timedelta
+from ..price_fetcher import RateLimitExceededException, raise_for_rate_limit
 
+API_URL = "https://api.paraswap.io"
 
 def get_quote(
     src_token: str, 
@@ -29,7 +31,7 @@ def get_quote(
 
     For more details refer to: https://developers.paraswap.network/api/get-rate-for-a-token-pair-1
     """
-    api_url = "https://api.paraswap.io/swap"
+    api_url = f"{API_URL}/swap"
 
     # Construct the request parameters
     params = {
@@ -48,6 +50,7 @@ def get_quote(
     try:
         # Make the API request
         response = requests.get(api_url, params=params)
+        raise_for_rate_limit(response)
         response.raise_for_status()  # Raise an exception for HTTP errors
 
         if 'priceRoute' in response.json():
@@ -55,8 +58,8 @@ def get_quote(
             quote_raw = response.json()['priceRoute']
 
             # extract
-            src_amount = float(quote_raw['srcAmount'])
-            dest_amount = float(quote_raw['destAmount'])
+            src_amount = int(quote_raw['srcAmount'])
+            dest_amount = int(quote_raw['destAmount'])
             src_usd = float(quote_raw['srcUSD'])
             dest_usd = float(quote_raw['destUSD'])
             aggregator = str('paraswap')
@@ -83,6 +86,8 @@ def get_quote(
 
             return row
 
+    except RateLimitExceededException:
+        raise
     except ConnectionError as ce:
         print(f"Connection error: {ce}")
         return {"error": "ConnectionError", "message": str(ce)}
@@ -0,0 +1,145 @@
+"""
+Trade sizes of a quote sweep (core.dex_quotes.collector).
+
+A sampler hands out the next USD amount to quote and is told the price impact
+of each quote (None if it failed), so it can pick the following amount from
+what it has seen. FixedSampler walks a precomputed list. AdaptiveSampler
+quotes a coarse geometric grid first and then only refines where the
+price impact curve is poorly known:
+
+- the impact halfway (in log amount) between two quoted sizes is estimated
+  with the quadratics (in log amount) through the interval and its
+  neighbouring quotes, the distance to the straight line between the two
+  quotes (in amount, how ExternalMarket's fit interpolates) is the
+  curvature error of the interval
+- the curve is monotone (what ExternalMarket's isotonic fit assumes), so the
+  impact inside an interval lies between its end points: the curvature
+  error is capped at their difference, and a share of that difference (the
+  band the isotonic model is uncertain in) is added, so steep intervals get
+  refined even where the curve looks straight
+
+The interval with the largest error is split at its geometric midpoint until
+every interval is within the tolerance or the sample budget is spent. Both
+samplers stop at the first quote above MAXIMUM_PRICE_IMPACT, larger sizes
+are never requested.
+"""
+import math
+from typing import List, Optional
+
+import numpy as np
+from django.conf import settings
+
+MAXIMUM_PRICE_IMPACT = 0.99  # stop requesting quotes above this amount
+# price impact error an interval may keep
+DEX_QUOTE_SAMPLING_TOLERANCE = getattr(settings, "DEX_QUOTE_SAMPLING_TOLERANCE", 0.01)
+# quotes of the initial grid of AdaptiveSampler
+DEX_QUOTE_SAMPLING_COARSE = getattr(settings, "DEX_QUOTE_SAMPLING_COARSE", 6)
+# share of an interval's impact difference counted as error
+UNCERTAINTY_WEIGHT = 0.1
+
+
+class FixedSampler:
+    """The given amounts in increasing order."""
+
+    def __init__(self, amounts: List[float]):
+        self.pending = sorted(amounts)
+        self.stopped = False
+
+    def next_amount(self) -> Optional[float]:
+        if self.stopped or not self.pending:
+            return None
+        return self.pending.pop(0)
+
+    def add(self, amount: float, price_impact: Optional[float]) -> None:
+        if price_impact is not None and price_impact > MAXIMUM_PRICE_IMPACT:
+            self.stopped = True
+
+
+def _quadratic(xs, ys, x):
+    """Value at x of the quadratic through three points (Lagrange form)."""
+    (x0, x1, x2), (y0, y1, y2) = xs, ys
+    return (
+        y0 * (x - x1) * (x - x2) / ((x0 - x1) * (x0 - x2))
+        + y1 * (x - x0) * (x - x2) / ((x1 - x0) * (x1 - x2))
+        + y2 * (x - x0) * (x - x1) / ((x2 - x0) * (x2 - x1))
+    )
+
+
+def interval_errors(amounts: List[float], impacts: List[float]) -> List[float]:
+    """
+    Estimated error of linear interpolation inside each interval between
+    consecutive quoted amounts, see the module docstring.
+    """
+    log_amounts = [math.log(a) for a in amounts]
+    errors = []
+    for i in range(len(amounts) - 1):
+        x = (log_amounts[i] + log_amounts[i + 1]) / 2
+        share = (math.exp(x) - amounts[i]) / (amounts[i + 1] - amounts[i])
+        line = impacts[i] + share * (impacts[i + 1] - impacts[i])
+        curvature = 0.0
+        for j in (i - 1, i):
+            # quadratics through the interval and the quote before / after it
+            if j >= 0 and j + 2 < len(amounts):
+                curvature = max(curvature, abs(_quadratic(log_amounts[j:j + 3], impacts[j:j + 3], x) - line))
+        band = abs(impacts[i + 1] - impacts[i])
+        errors.append(min(curvature, band) + UNCERTAINTY_WEIGHT * band)
+    return errors
+
+
+class AdaptiveSampler:
+    """
+    Coarse grid between start and end, then refinement down to tolerance,
+    at most max_samples amounts in total.
+    """
+
+    def __init__(
+        self,
+        start: float,
+        end: float,
+        max_samples: int = 30,
+        tolerance: float = None,
+        coarse_samples: int = None,
+        jitter: bool = True,
+    ):
+        self.tolerance = DEX_QUOTE_SAMPLING_TOLERANCE if tolerance is None else tolerance
+        coarse_samples = DEX_QUOTE_SAMPLING_COARSE if coarse_samples is None else coarse_samples
+        self.max_samples = max_samples
+        grid = np.geomspace(start, end, num=max(2, min(coarse_samples, max_samples)))
+        if jitter and len(grid) > 2:
+            # shift the inner grid points by up to a quarter step so runs cover different sizes
+            step = math.log(grid[1] / grid[0])
+            grid[1:-1] *= np.exp(np.random.uniform(-0.25, 0.25, len(grid) - 2) * step)
+        self.pending = sorted(set(int(a) for a in grid if int(a) > 0))
+        self.impacts = {}
+        self.failed = set()
+        self.requested = 0
+        self.stop = None
+
+    def add(self, amount: float, price_impact: Optional[float]) -> None:
+        if price_impact is None:
+            self.failed.add(amount)
+            return
+        self.impacts[amount] = price_impact
+        if price_impact > MAXIMUM_PRICE_IMPACT and (self.stop is None or amount < self.stop):
+            self.stop = amount
+            self.pending = [a for a in self.pending if a < amount]
+
+    def next_amount(self) -> Optional[float]:
+        if self.requested >= self.max_samples:
+            return None
+        amount = self.pending.pop(0) if self.pending else self._refine()
+        if amount is not None:
+            self.requested += 1
+        return amount
+
+    def _refine(self) -> Optional[int]:
+        amounts = sorted(a for a in self.impacts if self.stop is None or a <= self.stop)
+        if len(amounts) < 2:
+            return None
+        impacts = [self.impacts[a] for a in amounts]
+        best, best_error = None, self.tolerance
+        for i, error in enumerate(interval_errors(amounts, impacts)):
+            midpoint = int(math.sqrt(amounts[i] * amounts[i + 1]))
+            if error > best_error and amounts[i] < midpoint < amounts[i + 1] and midpoint not in self.failed:
+                best, best_error = midpoint, error
+        return best
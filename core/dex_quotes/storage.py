@@ -0,0 +1,272 @@
+"""
+DexQuote storage upkeep.
+
+In PostgreSQL core_dexquote is range partitioned by month of its unix
+timestamp (migration 0022): partitions are named core_dexquote_pYYYY_MM and
+rows outside them land in core_dexquote_default. Queries filtering on a
+timestamp window only scan the partitions of the window, and the BRIN index
+on timestamp keeps range scans inside a partition small.
+
+- ensure_partitions creates the monthly partitions of a timestamp range
+  before rows are written to it, QuoteWriter calls it for every batch
+- rollup_dex_quotes aggregates quotes per network, venue, pair, hour and
+  trade size bucket into DexQuoteRollup, the curves survive the raw quotes
+- drop_expired_partitions drops the monthly partitions older than
+  DEX_QUOTE_RETENTION_DAYS once they are rolled up, unset keeps raw quotes
+
+maintain_dex_quotes runs all three (task_maintain_dex_quotes). On other
+backends the table is not partitioned, the partition helpers do nothing and
+retention deletes rows.
+"""
+import math
+import time
+from datetime import datetime, timezone
+from typing import List
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Avg, Count, F, Max, Min
+from django.db.models.functions import Floor, Log
+
+from core.bulk_load import copy_bulk_create
+from core.models import DexQuote, DexQuoteRollup
+
+# months of partitions kept ahead of the current one
+DEX_QUOTE_PARTITIONS_AHEAD = getattr(settings, "DEX_QUOTE_PARTITIONS_AHEAD", 3)
+# days of raw quotes kept, None keeps them all
+DEX_QUOTE_RETENTION_DAYS = getattr(settings, "DEX_QUOTE_RETENTION_DAYS", None)
+# size buckets per factor of 10 of in_amount_usd
+SIZE_BUCKETS_PER_DECADE = 4
+HOUR = 60 * 60
+
+PARTITION_PREFIX = f"{DexQuote._meta.db_table}_p"
+DEFAULT_PARTITION = f"{DexQuote._meta.db_table}_default"
+ROLLUP_KEY = ["network", "dex_aggregator", "src_lower", "dst_lower", "hour", "size_bucket"]
+ROLLUP_VALUES = [
+    "quotes", "in_amount_usd", "price", "market_price", "price_impact", "price_impact_min", "price_impact_max",
+    "updated_at",
+]
+
+# months whose partition is known to exist, saves a catalog lookup per write
+_known_partitions = set()
+
+
+def month_start(timestamp: int) -> datetime:
+    day = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    return datetime(day.year, day.month, 1, tzinfo=timezone.utc)
+
+
+def next_month(month: datetime) -> datetime:
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y_%m}"
+
+
+def _connection():
+    return connections[router.db_for_write(DexQuote)]
+
+
+def _columns() -> str:
+    return ", ".join(f'"{f.column}"' for f in DexQuote._meta.concrete_fields if not f.generated)
+
+
+def _partitions(cursor) -> dict:
+    """{month: partition name} of the existing monthly partitions, {} if the table is not partitioned."""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = %s::regclass",
+        [DexQuote._meta.db_table],
+    )
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        if name.startswith(PARTITION_PREFIX):
+            month = datetime.strptime(name[len(PARTITION_PREFIX):], "%Y_%m").replace(tzinfo=timezone.utc)
+            partitions[month] = name
+    return partitions
+
+
+def _create_partition(cursor, month: datetime) -> None:
+    table = DexQuote._meta.db_table
+    name = partition_name(month)
+    lower, upper = int(month.timestamp()), int(next_month(month).timestamp())
+    # a partition cannot be attached while the default partition holds rows of its range
+    cursor.execute(
+        f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE "timestamp" >= %s AND "timestamp" < %s)',
+        [lower, upper],
+    )
+    stranded = cursor.fetchone()[0]
+    columns = _columns()
+    if stranded:
+        stage = f"stage_{name}"
+        cursor.execute(f'CREATE TEMPORARY TABLE "{stage}" (LIKE "{DEFAULT_PARTITION}") ON COMMIT DROP')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE "timestamp" >= %s AND "timestamp" < %s '
+            f"RETURNING {columns}) INSERT INTO \"{stage}\" ({columns}) SELECT {columns} FROM moved",
+            [lower, upper],
+        )
+    cursor.execute(f'CREATE TABLE "{name}" PARTITION OF "{table}" FOR VALUES FROM ({lower}) TO ({upper})')
+    if stranded:
+        cursor.execute(f'INSERT INTO "{table}" ({columns}) SELECT {columns} FROM "{stage}"')
+        cursor.execute(f'DROP TABLE "{stage}"')
+    print(f"Created partition {name}")
+
+
+def ensure_partitions(start: int, end: int = None) -> List[str]:
+    """
+    Creates the missing monthly partitions of the timestamps start to end,
+    moving rows of their months out of the default partition. Returns the
+    names of the created partitions.
+    """
+    end = start if end is None else end
+    months = []
+    month = month_start(start)
+    while month.timestamp() <= end:
+        if month not in _known_partitions:
+            months.append(month)
+        month = next_month(month)
+    connection = _connection()
+    if not months or connection.vendor != "postgresql":
+        return []
+
+    created = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        # serialises partition changes of concurrent writers
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [DexQuote._meta.db_table])
+        existing = _partitions(cursor)
+        if not existing:
+            # not partitioned (migration 0022 always creates monthly partitions)
+            return []
+        for month in months:
+            if month not in existing:
+                _create_partition(cursor, month)
+                created.append(partition_name(month))
+    _known_partitions.update(months)
+    return created
+
+
+def ensure_future_partitions(months_ahead: int = None) -> List[str]:
+    """Partitions of the current month and the months_ahead after it."""
+    months_ahead = DEX_QUOTE_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    now = int(time.time())
+    last = month_start(now)
+    for _ in range(months_ahead):
+        last = next_month(last)
+    return ensure_partitions(now, int(last.timestamp()))
+
+
+def rolled_up_until() -> int:
+    """Timestamp up to which quotes are rolled up, None before the first rollup."""
+    last_hour = DexQuoteRollup.objects.aggregate(Max("hour"))["hour__max"]
+    return None if last_hour is None else last_hour + HOUR
+
+
+def rollup_dex_quotes(start: int = None, end: int = None) -> int:
+    """
+    Upserts the DexQuoteRollup rows of the quotes with timestamps from start
+    to end (exclusive), hour aligned. Defaults to the hours after the last
+    rollup up to the hour before the current one, venues round quote
+    timestamps to the hour so the last hour may still receive quotes.
+    Returns the number of rollup rows written.
+    """
+    if end is None:
+        end = int(time.time()) // HOUR * HOUR - HOUR
+    if start is None:
+        start = rolled_up_until()
+    if start is None:
+        first = DexQuote.objects.aggregate(Min("timestamp"))["timestamp__min"]
+        if first is None:
+            return 0
+        start = first // HOUR * HOUR
+    written = 0
+    # one month per query, so every query scans a single partition
+    while start < end:
+        stop = min(end, int(next_month(month_start(start)).timestamp()))
+        groups = (
+            DexQuote.objects.filter(timestamp__gte=start, timestamp__lt=stop, in_amount_usd__gt=0)
+            .annotate(
+                hour=F("timestamp") - F("timestamp") % HOUR,
+                size_bucket=Floor(Log(10, "in_amount_usd") * SIZE_BUCKETS_PER_DECADE),
+            )
+            .values(*ROLLUP_KEY)
+            .annotate(
+                count=Count("id"),
+                avg_in_amount_usd=Avg("in_amount_usd"),
+                avg_price=Avg("price"),
+                avg_market_price=Avg("market_price"),
+                avg_price_impact=Avg("price_impact"),
+                min_price_impact=Min("price_impact"),
+                max_price_impact=Max("price_impact"),
+            )
+            .order_by()
+        )
+        rollups = (
+            DexQuoteRollup(
+                network=group["network"],
+                dex_aggregator=group["dex_aggregator"],
+                src_lower=group["src_lower"],
+                dst_lower=group["dst_lower"],
+                hour=group["hour"],
+                size_bucket=math.floor(group["size_bucket"]),
+                quotes=group["count"],
+                in_amount_usd=group["avg_in_amount_usd"],
+                price=group["avg_price"],
+                market_price=group["avg_market_price"],
+                price_impact=group["avg_price_impact"],
+                price_impact_min=group["min_price_impact"],
+                price_impact_max=group["max_price_impact"],
+            )
+            for group in groups.iterator()
+        )
+        with transaction.atomic():
+            written += copy_bulk_create(
+                DexQuoteRollup, rollups, update_conflicts=True, unique_fields=ROLLUP_KEY, update_fields=ROLLUP_VALUES,
+            )
+        start = stop
+    return written
+
+
+def drop_expired_partitions(retention_days: int = None) -> List[str]:
+    """
+    Drops the monthly partitions whose quotes are all older than
+    retention_days and rolled up, and deletes such quotes from the default
+    partition (other backends: from the table). Returns the dropped partitions.
+    """
+    retention_days = DEX_QUOTE_RETENTION_DAYS if retention_days is None else retention_days
+    if retention_days is None:
+        return []
+    rollup_dex_quotes()
+    rolled_until = rolled_up_until()
+    if rolled_until is None:
+        return []
+    cutoff = min(int(time.time()) - int(retention_days * 24 * HOUR), rolled_until)
+
+    connection = _connection()
+    if connection.vendor != "postgresql":
+        deleted, _ = DexQuote.objects.filter(timestamp__lt=cutoff).delete()
+        print(f"Deleted {deleted} quotes older than {cutoff}")
+        return []
+
+    dropped = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [DexQuote._meta.db_table])
+        partitions = _partitions(cursor)
+        if not partitions:
+            return []
+        for month, name in sorted(partitions.items()):
+            if next_month(month).timestamp() <= cutoff:
+                cursor.execute(f'DROP TABLE "{name}"')
+                _known_partitions.discard(month)
+                dropped.append(name)
+        cursor.execute(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE "timestamp" < %s', [cutoff])
+    if dropped:
+        print(f"Dropped partitions {', '.join(dropped)}")
+    return dropped
+
+
+def maintain_dex_quotes() -> None:
+    created = ensure_future_partitions()
+    rolled_up = rollup_dex_quotes()
+    dropped = drop_expired_partitions()
+    print(f"Created {len(created)} partitions, wrote {rolled_up} rollups, dropped {len(dropped)} partitions")
@@ -1,9 +1,19 @@
 from core.dex_quotes.DTO import TokenDTO
 from web3 import Web3
+from core.providers import get_web3
 from core.models import Chain, ERC20
 from .price_fetcher import get_current_price
 import numpy as np
 
+TOTAL_SUPPLY_ABI = [
+    {
+        "stateMutability": "view",
+        "type": "function",
+        "name": "totalSupply",
+        "inputs": [],
+        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}]
+    }
+]
 
 def query_token_supply(dto: ERC20, *args, block_number=None):
     """
@@ -19,20 +29,11 @@ def query_token_supply(dto: ERC20, *args, block_number=None):
     """
     contract_address = dto.contract_address
     
-    w3 = Web3(Web3.HTTPProvider(dto.chain.rpc))
-    abi = [
-            {
-            "stateMutability": "view",
-            "type": "function",
-            "name": "totalSupply",
-            "inputs": [],
-            "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}]
-        }
-    ]
+    w3 = get_web3(dto.chain)
     
     try:
         # Create contract instance
-        contract = w3.eth.contract(address=Web3.to_checksum_address(contract_address), abi=abi)
+        contract = w3.eth.contract(address=Web3.to_checksum_address(contract_address), abi=TOTAL_SUPPLY_ABI)
         
         # Get the contract function
         contract_function = getattr(contract.functions, "totalSupply")
@@ -48,19 +49,36 @@ def query_token_supply(dto: ERC20, *args, block_number=None):
     except Exception as e:
         return f'Error querying smart contract: {e}'
 
-def compute_tvl(token: ERC20):
+def compute_tvl(token: ERC20, context=None):
+    if context is not None:
+        # run snapshot (core.dex_quotes.market_context), no I/O
+        return context.tvl(token)
     supply = query_token_supply(token)/pow(10, token.decimals)
     price = get_current_price(token.contract_address, token.chain.chain_name.lower())
     tvl = supply * price
     return tvl
     
-def compute_sampling_points(sell_token: ERC20, buy_token: ERC20, num_samples: int):
-    
-    sell_token_tvl = compute_tvl(sell_token)
-    buy_token_tvl = compute_tvl(buy_token)
-    
+def compute_sampling_range(sell_token: ERC20, buy_token: ERC20, context=None):
+    """
+    (smallest, largest) USD trade size to quote for the pair, None if a TVL
+    is not known.
+    """
+    sell_token_tvl = compute_tvl(sell_token, context)
+    buy_token_tvl = compute_tvl(buy_token, context)
+    if sell_token_tvl is None or buy_token_tvl is None:
+        print(f"No TVL for {sell_token.contract_address} or {buy_token.contract_address}, skipping")
+        return None
+
     start_amount = min(sell_token_tvl, buy_token_tvl) * 0.001 # 0.1% of the smaller token's TVL
     end_amount = min(sell_token_tvl, buy_token_tvl) * 0.75 # 75% of the smaller token's TVL
+    return start_amount, end_amount
+
+def compute_sampling_points(sell_token: ERC20, buy_token: ERC20, num_samples: int, context=None):
+    
+    sampling_range = compute_sampling_range(sell_token, buy_token, context)
+    if sampling_range is None:
+        return []
+    start_amount, end_amount = sampling_range
     
     amounts = np.geomspace(start_amount, end_amount, num=num_samples).astype(int).tolist()
 
@@ -0,0 +1,235 @@
+"""
+Declarative loading of decoded event parquet files into Transaction models.
+
+A mapping {model field: (parquet column, kind)} describes an event, columns are
+converted whole with pandas / numpy / pyarrow and the model instances are built
+from the converted column lists, so there is no per-row pandas work:
+
+    BORROW_FIELDS = {
+        "account": ("event__account", HEX),
+        "fee": ("event__fee_string", INT),
+    }
+    ingest_event_files(label, Borrow, BORROW_FIELDS, pool_address=pool_address)
+
+The Transaction columns (hash, indexes, block number) are always mapped.
+
+Pending files are claimed from the ingestion ledger (core.ledger), so several
+workers can ingest a label at once.
+
+With stream=True files are read row group by row group in record batches
+(pyarrow iter_batches, never more than one batch in memory), each batch is written in its own
+transaction together with a checkpoint in the file's LogFile.checkpoint,
+so a run resumes at the batch it stopped at and a bad row only costs its
+own batch a row by row retry. A file with more skipped rows than
+LOGS_INGEST_MAX_SKIPPED_ROWS is marked failed and read again from the start
+on its next claim, up to LEDGER_MAX_ATTEMPTS claims.
+"""
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db import transaction
+
+from .bulk_load import copy_bulk_create
+from .ledger import claim_files, label_directory, mark_done, mark_failed
+from .models import CryoLogsMetadata, LogFile
+
+LOGS_INGEST_BATCH_SIZE = getattr(settings, "LOGS_INGEST_BATCH_SIZE", 10_000)
+# a streamed file with more rejected rows than this is marked failed, not done
+LOGS_INGEST_MAX_SKIPPED_ROWS = getattr(settings, "LOGS_INGEST_MAX_SKIPPED_ROWS", 0)
+
+# column kinds
+HEX = "hex"  # bytes or str -> lowercase 0x prefixed str
+TEXT = "text"  # str(value)
+INT = "int"  # python int
+
+TRANSACTION_FIELDS = {
+    "transaction_hash": ("transaction_hash", HEX),
+    "transaction_index": ("transaction_index", INT),
+    "log_index": ("log_index", INT),
+    "block_number": ("block_number", INT),
+}
+
+_HEX_DIGITS = np.array([b"%02x" % i for i in range(256)], dtype="S2")
+
+
+def _hex_value(value):
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + value.hex().lower()
+    elif isinstance(value, str):
+        return value.lower()
+
+
+def _hex_fixed_width(values: pd.Series):
+    """
+    Hex of a column of equally sized byte strings through a lookup table,
+    None if the column is anything else.
+    """
+    try:
+        array = pa.array(values, type=pa.binary())
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+    lengths = pc.binary_length(array)
+    width = pc.max(lengths).as_py()
+    if array.null_count or not width or pc.min(lengths).as_py() != width:
+        return None
+    raw = np.frombuffer(b"".join(values.tolist()), dtype=np.uint8).reshape(-1, width)
+    hexed = _HEX_DIGITS[raw].view(f"S{2 * width}").ravel()
+    return np.char.add(b"0x", hexed).astype(str).tolist()
+
+
+def to_hex(values: pd.Series) -> List[str]:
+    if values.empty:
+        return []
+    if isinstance(values.iloc[0], (bytes, bytearray)):
+        hexed = _hex_fixed_width(values)
+        if hexed is not None:
+            return hexed
+    else:
+        try:
+            return pc.utf8_lower(pa.array(values, type=pa.string())).to_pylist()
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+    # mixed columns
+    return values.map(_hex_value).tolist()
+
+
+def to_text(values: pd.Series) -> List[str]:
+    return values.astype(str).tolist()
+
+
+def to_int(values: pd.Series) -> List[int]:
+    if values.dtype == object:
+        # decimal strings (the "_string" columns) may not fit in int64
+        try:
+            return values.astype("int64").tolist()
+        except OverflowError:
+            return [int(v) for v in values.tolist()]
+    return values.astype("int64").tolist()
+
+
+CONVERTERS = {
+    HEX: to_hex,
+    TEXT: to_text,
+    INT: to_int,
+}
+
+
+def frame_to_instances(df: pd.DataFrame, model, fields: Dict[str, Tuple[str, str]], **constants) -> list:
+    """
+    Model instances of every row of df, fields maps model fields to
+    (column, kind) and constants are set on every instance.
+    """
+    if df.empty:
+        return []
+    fields = {**TRANSACTION_FIELDS, **fields}
+    missing = [column for column, _ in fields.values() if column not in df.columns]
+    if missing:
+        raise Exception(f"Columns {missing} missing for {model.__name__}")
+    names = list(fields)
+    columns = [CONVERTERS[kind](df[column]) for column, kind in fields.values()]
+    return [model(**constants, **dict(zip(names, values))) for values in zip(*columns)]
+
+
+def _write_batch(df, model, fields, constants):
+    """
+    COPY of one batch, row by row (each in its own savepoint) if the
+    batch fails so a bad row does not take the others with it. Returns the
+    number of rows skipped.
+    """
+    try:
+        with transaction.atomic():
+            copy_bulk_create(model, frame_to_instances(df, model, fields, **constants), ignore_conflicts=True)
+        return 0
+    except Exception as e:
+        print(f"Batch of {len(df)} {model.__name__} rows failed ({e}), retrying row by row")
+    skipped = 0
+    for i in range(len(df)):
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    frame_to_instances(df.iloc[i:i + 1], model, fields, **constants), ignore_conflicts=True
+                )
+        except Exception as e:
+            skipped += 1
+            print(f"Skipping {model.__name__} row {df.iloc[i].to_dict()}: {e}")
+    return skipped
+
+
+def _stream_file(log_file, directory, model, fields, constants, batch_size):
+    checkpoint = log_file.checkpoint or {}
+    resume = checkpoint.get("batch_size") == batch_size
+    position = (checkpoint["row_group"], checkpoint["batch"]) if resume else (0, 0)
+    if position != (0, 0):
+        print(f"Resuming {log_file.file_name} at row group {position[0]}, batch {position[1]}")
+
+    parquet = pq.ParquetFile(os.path.join(directory, log_file.file_name))
+    skipped = 0
+    for row_group in range(position[0], parquet.num_row_groups):
+        batches = parquet.iter_batches(batch_size=batch_size, row_groups=[row_group])
+        for n, batch in enumerate(batches):
+            if (row_group, n) < position:
+                continue
+            with transaction.atomic():
+                skipped += _write_batch(batch.to_pandas(), model, fields, constants)
+                LogFile.objects.filter(pk=log_file.pk).update(
+                    checkpoint={"row_group": row_group, "batch": n + 1, "batch_size": batch_size}
+                )
+    return skipped
+
+
+def stream_event_files(label: str, model, fields: Dict[str, Tuple[str, str]], batch_size: int = None, **constants) -> CryoLogsMetadata:
+    """
+    Streaming variant of ingest_event_files, see the module docstring.
+    """
+    batch_size = LOGS_INGEST_BATCH_SIZE if batch_size is None else batch_size
+    metadata = CryoLogsMetadata.objects.get(label=label)
+    directory = label_directory(label)
+    constants = {"chain": metadata.chain, **constants}
+
+    for log_file in claim_files(metadata):
+        try:
+            skipped = _stream_file(log_file, directory, model, fields, constants, batch_size)
+        except Exception as e:
+            mark_failed([log_file], e)
+            raise
+        if skipped > LOGS_INGEST_MAX_SKIPPED_ROWS:
+            # read again from the start, the written rows are ignored as conflicts
+            LogFile.objects.filter(pk=log_file.pk).update(checkpoint={})
+            mark_failed([log_file], f"{skipped} rows skipped")
+            print(f"Failed {log_file.file_name}: {skipped} {model.__name__} rows skipped")
+            continue
+        mark_done([log_file])
+        print(f"Ingested {log_file.file_name} into {model.__name__} ({skipped} rows skipped)")
+    return metadata
+
+
+def ingest_event_files(label: str, model, fields: Dict[str, Tuple[str, str]], stream: bool = False, **constants) -> CryoLogsMetadata:
+    """
+    Loads the label's pending parquet files into model and marks them
+    ingested, in one transaction. Returns the label's metadata.
+    """
+    if stream:
+        return stream_event_files(label, model, fields, **constants)
+    metadata = CryoLogsMetadata.objects.get(label=label)
+    directory = label_directory(label)
+    log_files = claim_files(metadata)
+
+    try:
+        with transaction.atomic():
+            instances = []
+            for log_file in log_files:
+                df = pd.read_parquet(os.path.join(directory, log_file.file_name))
+                instances += frame_to_instances(df, model, fields, chain=metadata.chain, **constants)
+
+            copy_bulk_create(model, instances, ignore_conflicts=True)
+            mark_done(log_files)
+    except Exception as e:
+        mark_failed(log_files, e)
+        raise
+    return metadata
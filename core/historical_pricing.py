@@ -1,7 +1,9 @@
 from .models import ERC20, UniswapLPPosition, Chain
 from time import sleep
 from .caching import cache
-from .pricing.univ3 import get_value_of_lp, get_positions_details
+from .providers import get_web3
+from .pricing.univ3 import get_value_of_lp, get_value_of_lp_series, get_positions_details
+from .pricing.defillama import DEFILLAMA_CHAIN_NAMES, defillama_coin_key, defillama_price_feed
 from typing import List
 from web3 import Web3
 from arcadia.utils import erc20_to_pydantic
@@ -139,6 +141,26 @@ class HistoricalPriceStrategyMethods:
         # timestamp = datetime.fromtimestamp(timestamp).replace(tzinfo=timezone.utc)
 
 
+def load_lp_position(asset: UniswapLPPosition) -> UniswapLPPosition:
+    """
+    Fills in liquidity, ticks and tokens of a position from chain if missing
+    """
+    if asset.liquidity is None:
+        w3 = get_web3(asset.chain)
+        position_details = get_positions_details(
+            asset.contract_address,
+            w3,
+            int(asset.token_id)
+        )
+        asset.liquidity = str(position_details["liquidity"])
+        asset.tickLower = str(position_details["tickLower"])
+        asset.tickUpper = str(position_details["tickUpper"])
+        asset.token1 = ERC20.objects.get(contract_address_lower=position_details["token1"].lower())
+        asset.token0 = ERC20.objects.get(contract_address_lower=position_details["token0"].lower())
+        asset.save()
+    return asset
+
+
 def historical_get_price(
     asset: ERC20 | UniswapLPPosition,
     numeraire: ERC20 | str | UniswapLPPosition,
@@ -159,19 +181,7 @@ def historical_get_price(
             **kwargs,
         )
     else:
-        if asset.liquidity is None:
-            w3 = Web3(Web3.HTTPProvider(asset.chain.rpc))
-            position_details = get_positions_details(
-                asset.contract_address,
-                w3,
-                int(asset.token_id)
-            )
-            asset.liquidity = str(position_details["liquidity"])
-            asset.tickLower = str(position_details["tickLower"])
-            asset.tickUpper = str(position_details["tickUpper"])
-            asset.token1 = ERC20.objects.get(contract_address__iexact=position_details["token1"])
-            asset.token0 = ERC20.objects.get(contract_address__iexact=position_details["token0"])
-            asset.save()
+        load_lp_position(asset)
 
         # getting price
         return get_value_of_lp(
@@ -186,6 +196,50 @@ def historical_get_price(
             ),
         )
 
+def _uses_defillama(asset: ERC20 | UniswapLPPosition | str) -> bool:
+    if isinstance(asset, str) or isinstance(asset, UniswapLPPosition):
+        return False
+    strategy = (asset.pricing_metadata or {}).get("strategy", "defillama_strategy")
+    return strategy == "defillama_strategy" and asset.chain.chain_id in DEFILLAMA_CHAIN_NAMES
+
+
+def bulk_defillama_price_feed(
+    assets: List[ERC20],
+    numeraire: ERC20 | str,
+    start_timestamp: int,
+    end_timestamp: int,
+    timestep: int = 3600,
+):
+    """
+    Prices every defillama priced asset over the whole range with a few
+    /chart and /batchHistorical requests instead of one request per timestep.
+    Assets (or timestamps) that can't be priced this way are left out, callers
+    fall back to historical_get_price for them.
+    """
+    coins = {i: defillama_coin_key(i.chain.chain_id, i.contract_address) for i in assets if _uses_defillama(i)}
+    if numeraire == "usd":
+        numeraire_coin = None
+    elif _uses_defillama(numeraire):
+        numeraire_coin = defillama_coin_key(numeraire.chain.chain_id, numeraire.contract_address)
+    else:
+        return {}
+    if not coins:
+        return {}
+    requested = list(set(coins.values()) | ({numeraire_coin} if numeraire_coin else set()))
+    feed, _ = defillama_price_feed(requested, start_timestamp, end_timestamp, timestep)
+
+    prices = {}
+    for asset, coin in coins.items():
+        if numeraire_coin is None:
+            prices[asset] = feed[coin]
+        else:
+            numeraire_prices = feed[numeraire_coin]
+            prices[asset] = {
+                t: p / numeraire_prices[t] for t, p in feed[coin].items() if t in numeraire_prices
+            }
+    return prices
+
+
 def create_market_price_feed(
     assets: List[ERC20],
     numeraire: ERC20 | str,
@@ -193,25 +247,55 @@ def create_market_price_feed(
     start_timestamp: int,
     end_timestamp: int,
     timestep: int = 3600,
+    bulk: bool = True,
 ):
     """
     Creates a cached price feed to prevent multiple network calls
-    TODO: sleep param to not exhaust the coingecko api, could be an optional field
+
+    With `bulk` the defillama priced assets are fetched range-wise first and
+    only the remaining (asset, timestamp) pairs go through historical_get_price.
     """
-    context = {}
-    for i in assets:
-        context[i] = {}
-    current_timestamp = start_timestamp
-    for current_timestamp in filter(
+    timestamps = list(filter(
         lambda x: x <= end_timestamp,
         range(start_timestamp, end_timestamp + timestep, timestep),
-    ):
-        for i in assets:
-            i_pydantic = erc20_to_pydantic(i)
-            context[i_pydantic][current_timestamp] = historical_get_price(
-                i,
-                numeraire,
-                target_timestamp=current_timestamp,
-            )
-    return context
+    ))
+    lp_assets = [load_lp_position(i) for i in assets if isinstance(i, UniswapLPPosition)]
+    token_assets = [i for i in assets if not isinstance(i, UniswapLPPosition)]
+    underlying_assets = [t for lp in lp_assets for t in (lp.token0, lp.token1)]
+
+    bulk_prices = {}
+    if bulk:
+        bulk_prices = bulk_defillama_price_feed(
+            token_assets + underlying_assets, numeraire, start_timestamp, end_timestamp, timestep
+        )
+
+    def price_series(asset: ERC20) -> List[float]:
+        series = []
+        for current_timestamp in timestamps:
+            price = bulk_prices.get(asset, {}).get(current_timestamp)
+            if price is None:
+                price = historical_get_price(
+                    asset,
+                    numeraire,
+                    target_timestamp=current_timestamp,
+                )
+            series.append(price)
+        return series
 
+    pydantic_assets = {i: erc20_to_pydantic(i) for i in assets}
+    context = {}
+    for i in assets:
+        context[pydantic_assets[i]] = {}
+    for i in token_assets:
+        context[pydantic_assets[i]] = dict(zip(timestamps, price_series(i)))
+    # LP positions are valued over the whole series at once from their token prices
+    for i in lp_assets:
+        values = get_value_of_lp_series(
+            int(i.liquidity),
+            float(i.tickLower),
+            float(i.tickUpper),
+            price_series(i.token0),
+            price_series(i.token1),
+        )
+        context[pydantic_assets[i]] = dict(zip(timestamps, values.tolist()))
+    return context
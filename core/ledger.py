@@ -0,0 +1,149 @@
+"""
+Ingestion ledger of the raw log parquet files (core.models.LogFile).
+
+Writers register every file they put under MEDIA_ROOT/logs__{label} with its
+block range, row count, size and checksum. Consumers find pending files with
+an indexed query and claim them (SELECT ... FOR UPDATE SKIP LOCKED), so
+concurrent workers never take the same file and no directory listing or diff
+against the history of ingested files is needed. Files written by cryo are
+picked up by sync_ledger after each cryo run and before every claim, which
+is also how files ingested before the ledger existed are backfilled.
+"""
+import hashlib
+import os
+import socket
+from datetime import timedelta
+from typing import List, Optional
+
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .block_ranges import ranges_from_filenames
+from .models import CryoLogsMetadata, LogFile
+
+# a claim older than this is considered abandoned (worker died) and taken over
+LEDGER_CLAIM_TIMEOUT = getattr(settings, "LEDGER_CLAIM_TIMEOUT", 60 * 60)
+# claims after which a failed or abandoned file is left alone until its attempts are reset
+LEDGER_MAX_ATTEMPTS = getattr(settings, "LEDGER_MAX_ATTEMPTS", 3)
+
+
+def label_directory(label: str) -> str:
+    return os.path.join(settings.MEDIA_ROOT, f"logs__{label}")
+
+
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_details(path: str) -> dict:
+    file_name = os.path.basename(path)
+    ranges = ranges_from_filenames([file_name])
+    try:
+        row_count = pq.read_metadata(path).num_rows
+    except Exception:
+        # still being written or not parquet, counted when processed
+        row_count = None
+    return {
+        "start_block": ranges[0][0] if ranges else None,
+        "end_block": ranges[0][1] if ranges else None,
+        "row_count": row_count,
+        "size": os.path.getsize(path),
+        "checksum": file_checksum(path),
+    }
+
+
+def register_file(metadata: CryoLogsMetadata, file_name: str, state: Optional[str] = None) -> LogFile:
+    """
+    Adds or refreshes the ledger entry of a file of the label. A file whose
+    content changed goes back to pending, empty files are done right away.
+    """
+    details = _file_details(os.path.join(label_directory(metadata.label), file_name))
+    if state is None:
+        state = LogFile.DONE if details["row_count"] == 0 else LogFile.PENDING
+    log_file, created = LogFile.objects.get_or_create(
+        metadata=metadata, file_name=file_name, defaults={**details, "state": state}
+    )
+    if not created and log_file.checksum != details["checksum"]:
+        for key, value in details.items():
+            setattr(log_file, key, value)
+        log_file.state = state
+        log_file.attempts = 0
+        log_file.checkpoint = {}
+        log_file.save()
+    return log_file
+
+
+def sync_ledger(metadata: CryoLogsMetadata) -> int:
+    """
+    Registers files of the label directory the ledger does not know yet or
+    whose size changed (cryo output). Files listed in the legacy
+    CryoLogsMetadata.ingested are registered as done. Returns the number of
+    files (re)registered.
+    """
+    directory = label_directory(metadata.label)
+    if not os.path.exists(directory):
+        return 0
+    known = dict(LogFile.objects.filter(metadata=metadata).values_list("file_name", "size"))
+    legacy_ingested = set(metadata.ingested or [])
+    registered = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file() or not entry.name.endswith(".parquet"):
+                continue
+            if known.get(entry.name) == entry.stat().st_size:
+                continue
+            state = LogFile.DONE if entry.name in legacy_ingested and entry.name not in known else None
+            register_file(metadata, entry.name, state=state)
+            registered += 1
+    if registered:
+        print(f"Registered {registered} files of {metadata.label} in the ledger")
+    return registered
+
+
+def claim_files(metadata: CryoLogsMetadata, limit: Optional[int] = None, worker: Optional[str] = None) -> List[LogFile]:
+    """
+    Syncs the label directory into the ledger, then claims pending (and
+    failed or abandoned) files of the label in block order, skipping files
+    other workers hold locks on. Failed and abandoned files are retried
+    until they were claimed LEDGER_MAX_ATTEMPTS times, then they keep their
+    error until someone resets attempts (or the file changes).
+    """
+    # cheap for known files (size compare), picks up files no writer registered
+    sync_ledger(metadata)
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    stale = timezone.now() - timedelta(seconds=LEDGER_CLAIM_TIMEOUT)
+    with transaction.atomic():
+        retryable = LogFile.objects.filter(metadata=metadata, attempts__lt=LEDGER_MAX_ATTEMPTS)
+        claimable = (
+            LogFile.objects.filter(metadata=metadata, state=LogFile.PENDING)
+            | retryable.filter(state=LogFile.FAILED)
+            | retryable.filter(state=LogFile.PROCESSING, claimed_at__lt=stale)
+        )
+        claimed = list(
+            claimable.select_for_update(skip_locked=True).order_by("start_block", "file_name")[:limit]
+        )
+        LogFile.objects.filter(pk__in=[f.pk for f in claimed]).update(
+            state=LogFile.PROCESSING, claimed_by=worker, claimed_at=timezone.now(), error=None,
+            attempts=F("attempts") + 1,
+        )
+    for log_file in claimed:
+        log_file.state = LogFile.PROCESSING
+        log_file.claimed_by = worker
+    return claimed
+
+
+def mark_done(log_files: List[LogFile]) -> None:
+    LogFile.objects.filter(pk__in=[f.pk for f in log_files]).update(
+        state=LogFile.DONE, checkpoint={}, error=None
+    )
+
+
+def mark_failed(log_files: List[LogFile], error) -> None:
+    LogFile.objects.filter(pk__in=[f.pk for f in log_files]).update(state=LogFile.FAILED, error=str(error))
@@ -0,0 +1,126 @@
+"""
+Adaptive, concurrent get_logs over block ranges.
+
+Windows grow while they come back sparse and shrink when they are dense or the
+provider refuses them ("too many results" / response size errors, which also
+split the failed window). A bounded number of windows run at once, failed
+windows are retried on their own with backoff, and results are handed to the
+caller strictly in block order so coverage can be recorded as it is written.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+LOGS_MAX_WORKERS = getattr(settings, "WEB3_LOGS_MAX_WORKERS", 4)
+LOGS_MAX_BLOCK_RANGE = getattr(settings, "WEB3_LOGS_MAX_BLOCK_RANGE", 100_000)
+# aim for windows returning about this many logs
+LOGS_TARGET_PER_WINDOW = getattr(settings, "WEB3_LOGS_TARGET_PER_WINDOW", 5_000)
+LOGS_MAX_RETRIES = 3
+LOGS_RETRY_BACKOFF = 1
+
+# error code / messages providers use when a get_logs response would be too big
+TOO_MANY_RESULTS_CODES = (-32005, -32602)
+TOO_MANY_RESULTS_MARKERS = (
+    "more than",
+    "too many",
+    "response size",
+    "limit exceeded",
+    "range is too large",
+    "block range",
+    "query timeout",
+)
+
+
+def is_too_many_results(exc: Exception) -> bool:
+    detail = exc.args[0] if exc.args else None
+    if isinstance(detail, dict):
+        if detail.get("code") in TOO_MANY_RESULTS_CODES:
+            return True
+        message = str(detail.get("message", "")).lower()
+    else:
+        message = str(exc).lower()
+    return any(marker in message for marker in TOO_MANY_RESULTS_MARKERS)
+
+
+def fetch_logs_adaptive(
+    fetch_window,
+    ranges,
+    on_window,
+    block_range: int = 1000,
+    min_block_range: int = 1,
+    max_block_range: int = None,
+    target_logs: int = None,
+    max_workers: int = None,
+    max_retries: int = LOGS_MAX_RETRIES,
+    retry_backoff: float = LOGS_RETRY_BACKOFF,
+):
+    """
+    Fetches every inclusive (start, end) block range in `ranges`.
+
+    fetch_window(start, end) returns the window's logs (anything with len()),
+    on_window(start, end, logs) is called from the calling thread, in block
+    order, once every window before it has been handed over.
+    Returns the window size reached, to seed the next run.
+    """
+    max_block_range = LOGS_MAX_BLOCK_RANGE if max_block_range is None else max_block_range
+    target_logs = LOGS_TARGET_PER_WINDOW if target_logs is None else target_logs
+    max_workers = LOGS_MAX_WORKERS if max_workers is None else max_workers
+    size = max(min_block_range, min(block_range, max_block_range))
+
+    def attempt_window(start, end, attempt):
+        if attempt:
+            time.sleep(retry_backoff * 2 ** (attempt - 1))
+        return fetch_window(start, end)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for gap_start, gap_end in ranges:
+            next_start = gap_start
+            write_from = gap_start
+            in_flight = {}
+            retry_queue = []
+            done = {}
+            while next_start <= gap_end or in_flight or retry_queue:
+                while len(in_flight) < max_workers and (retry_queue or next_start <= gap_end):
+                    if retry_queue:
+                        # lowest blocks first so the ordered writer is not held up
+                        retry_queue.sort()
+                        start, end, attempt = retry_queue.pop(0)
+                    else:
+                        start, end, attempt = next_start, min(next_start + size - 1, gap_end), 0
+                        next_start = end + 1
+                    future = executor.submit(attempt_window, start, end, attempt)
+                    in_flight[future] = (start, end, attempt)
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    start, end, attempt = in_flight.pop(future)
+                    try:
+                        logs = future.result()
+                    except Exception as e:
+                        if is_too_many_results(e) and end > start:
+                            mid = (start + end) // 2
+                            size = max(min_block_range, min(size, (end - start + 1) // 2))
+                            print(f"Too many results for blocks {start} to {end}, splitting (window {size})")
+                            retry_queue += [(start, mid, 0), (mid + 1, end, 0)]
+                        elif attempt < max_retries:
+                            print(f"Retrying blocks {start} to {end} after error: {e}")
+                            retry_queue.append((start, end, attempt + 1))
+                        else:
+                            raise
+                        continue
+
+                    if len(logs) > target_logs:
+                        size = max(min_block_range, size // 2)
+                    elif len(logs) < target_logs // 4:
+                        size = min(max_block_range, size * 2)
+                    done[start] = (end, logs)
+
+                while write_from in done:
+                    end, logs = done.pop(write_from)
+                    on_window(write_from, end, logs)
+                    write_from = end + 1
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return size
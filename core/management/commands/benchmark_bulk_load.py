@@ -0,0 +1,107 @@
+"""
+Times copy_bulk_create against bulk_create on the configured database:
+
+    python manage.py benchmark_bulk_load --rows 100000
+
+Every run happens in a transaction that is rolled back, nothing is kept.
+Cases:
+- append: arcadia Borrow rows into an empty table, plain COPY
+- ignore_conflicts: Borrow rows of which half already exist, staged COPY
+  merged with ON CONFLICT DO NOTHING
+- update_conflicts: DexQuoteRollup rows of which half already exist, staged
+  COPY merged with ON CONFLICT DO UPDATE
+"""
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.bulk_load import copy_bulk_create
+from core.dex_quotes.storage import ROLLUP_KEY, ROLLUP_VALUES
+from core.models import Chain, DexQuoteRollup
+
+
+def _borrows(chain, start, count):
+    Borrow = apps.get_model("arcadia", "Borrow")
+    return [
+        Borrow(
+            transaction_hash=f"0x{i:064x}", block_number=i, transaction_index=0, log_index=0, chain=chain,
+            pool_address="0x" + "1" * 40, account="0x" + "2" * 40, by="0x" + "3" * 40, to="0x" + "4" * 40,
+            amount=str(10**18 + i), fee=i, referrer="0x" + "0" * 40,
+        )
+        for i in range(start, start + count)
+    ]
+
+
+def _rollups(start, count):
+    return [
+        DexQuoteRollup(
+            network=1, dex_aggregator="bench", src_lower="0x" + "1" * 40, dst_lower="0x" + "2" * 40,
+            hour=i * 3600, size_bucket=i % 20, quotes=10, in_amount_usd=1000.0, price=1.0, market_price=1.0,
+            price_impact=0.01, price_impact_min=0.0, price_impact_max=0.02,
+        )
+        for i in range(start, start + count)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Times copy_bulk_create against bulk_create, in rolled back transactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--batch-size", type=int, default=None, help="defaults to COPY_BATCH_SIZE")
+
+    def _time(self, prepare, load):
+        with transaction.atomic():
+            args = prepare()
+            started = time.perf_counter()
+            load(*args)
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return elapsed
+
+    def handle(self, *args, rows, batch_size, **options):
+        Borrow = apps.get_model("arcadia", "Borrow")
+        half = rows // 2
+
+        def chain():
+            return Chain.objects.create(chain_id=-1, chain_name="benchmark", rpc="")
+
+        def chain_with_borrows():
+            bench_chain = chain()
+            copy_bulk_create(Borrow, _borrows(bench_chain, 0, half))
+            return (bench_chain,)
+
+        def with_rollups():
+            copy_bulk_create(DexQuoteRollup, _rollups(0, half))
+            return ()
+
+        update = {"update_conflicts": True, "unique_fields": ROLLUP_KEY, "update_fields": ROLLUP_VALUES}
+        cases = [
+            (
+                "append",
+                lambda: (chain(),),
+                lambda c: Borrow.objects.bulk_create(_borrows(c, 0, rows), batch_size=batch_size),
+                lambda c: copy_bulk_create(Borrow, _borrows(c, 0, rows), batch_size=batch_size),
+            ),
+            (
+                "ignore_conflicts",
+                chain_with_borrows,
+                lambda c: Borrow.objects.bulk_create(_borrows(c, 0, rows), batch_size=batch_size, ignore_conflicts=True),
+                lambda c: copy_bulk_create(Borrow, _borrows(c, 0, rows), batch_size=batch_size, ignore_conflicts=True),
+            ),
+            (
+                "update_conflicts",
+                with_rollups,
+                lambda: DexQuoteRollup.objects.bulk_create(_rollups(0, rows), batch_size=batch_size, **update),
+                lambda: copy_bulk_create(DexQuoteRollup, _rollups(0, rows), batch_size=batch_size, **update),
+            ),
+        ]
+        for label, prepare, bulk_create, copy in cases:
+            bulk_seconds = self._time(prepare, bulk_create)
+            copy_seconds = self._time(prepare, copy)
+            self.stdout.write(
+                f"{label}: {rows} rows, bulk_create {bulk_seconds:.2f}s, copy_bulk_create {copy_seconds:.2f}s "
+                f"({bulk_seconds / copy_seconds:.1f}x)"
+            )
@@ -0,0 +1,60 @@
+# Generated by Django 5.0.3 on 2026-10-17 10:12
+
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # concurrent index operations can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0016_erc20_is_denomination_asset_erc20_is_gov_asset_and_more'),
+    ]
+
+    # stored generated columns: adding them computes the value for every
+    # existing row, so no separate data backfill is needed. The src/dst
+    # indexes they supersede are dropped first so the rewrite of core_dexquote
+    # doesn't rebuild them, and the new indexes are built without blocking writes.
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='dexquote',
+            name='src_dst_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='dexquote',
+            name='src_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='dexquote',
+            name='dst_idx',
+        ),
+        migrations.AddField(
+            model_name='erc20',
+            name='contract_address_lower',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Lower('contract_address'), output_field=models.CharField(max_length=50)),
+        ),
+        migrations.AddField(
+            model_name='dexquote',
+            name='src_lower',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Lower('src'), output_field=models.CharField(max_length=42)),
+        ),
+        migrations.AddField(
+            model_name='dexquote',
+            name='dst_lower',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Lower('dst'), output_field=models.CharField(max_length=42)),
+        ),
+        AddIndexConcurrently(
+            model_name='erc20',
+            index=models.Index(fields=['contract_address_lower', 'chain'], name='erc20_address_lower_chain_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='dexquote',
+            index=models.Index(fields=['src_lower', 'dst_lower', 'timestamp'], name='src_dst_lower_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='dexquote',
+            index=models.Index(fields=['dst_lower', 'timestamp'], name='dst_lower_ts_idx'),
+        ),
+    ]
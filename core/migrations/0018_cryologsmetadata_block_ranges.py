@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-17 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_erc20_contract_address_lower_dexquote_src_lower_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cryologsmetadata',
+            name='block_ranges',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
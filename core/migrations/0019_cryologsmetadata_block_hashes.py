@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-17 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_cryologsmetadata_block_ranges'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cryologsmetadata',
+            name='block_hashes',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.3 on 2026-10-17 13:05
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_cryologsmetadata_block_hashes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlockTimestamp',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now_add=True)),
+                ('block_number', models.BigIntegerField()),
+                ('timestamp', models.BigIntegerField()),
+                ('block_hash', models.CharField(blank=True, max_length=66, null=True)),
+                ('chain', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.chain')),
+            ],
+            options={
+                'abstract': False,
+                'indexes': [models.Index(fields=['chain', 'timestamp'], name='block_ts_chain_ts_idx')],
+                'unique_together': {('chain', 'block_number')},
+            },
+        ),
+    ]
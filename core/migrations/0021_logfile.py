@@ -0,0 +1,41 @@
+# Generated by Django 5.0.3 on 2026-10-17 13:40
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_blocktimestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogFile',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now_add=True)),
+                ('file_name', models.CharField(max_length=255)),
+                ('start_block', models.BigIntegerField(null=True)),
+                ('end_block', models.BigIntegerField(null=True)),
+                ('row_count', models.BigIntegerField(null=True)),
+                ('size', models.BigIntegerField(null=True)),
+                ('checksum', models.CharField(blank=True, max_length=64, null=True)),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('claimed_by', models.CharField(blank=True, max_length=255, null=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('checkpoint', models.JSONField(blank=True, default=dict)),
+                ('metadata', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='files', to='core.cryologsmetadata')),
+            ],
+            options={
+                'abstract': False,
+                'indexes': [models.Index(fields=['metadata', 'state', 'start_block'], name='logfile_state_block_idx')],
+                'unique_together': {('metadata', 'file_name')},
+            },
+        ),
+    ]
@@ -0,0 +1,194 @@
+# Generated by Django 5.0.3 on 2026-10-17 18:28
+
+import time
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+
+import django.contrib.postgres.indexes
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+# months of partitions created past the current one, core.dex_quotes.storage keeps this up
+PARTITIONS_AHEAD = 3
+
+
+def _month_start(ts):
+    day = datetime.fromtimestamp(ts, tz=timezone.utc)
+    return datetime(day.year, day.month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def _columns(apps):
+    DexQuote = apps.get_model("core", "DexQuote")
+    return ", ".join(f'"{f.column}"' for f in DexQuote._meta.concrete_fields if not f.generated)
+
+
+def _create_indexes(execute, primary_key):
+    execute(f'ALTER TABLE "core_dexquote" ADD PRIMARY KEY ({primary_key})')
+    execute(
+        'ALTER TABLE "core_dexquote" ADD CONSTRAINT "core_dexquote_pair_id_fk" FOREIGN KEY ("pair_id") '
+        'REFERENCES "core_dexquotepair" ("id") DEFERRABLE INITIALLY DEFERRED'
+    )
+    execute('CREATE INDEX "core_dexquote_pair_id_idx" ON "core_dexquote" ("pair_id")')
+    execute('CREATE INDEX "src_dst_lower_ts_idx" ON "core_dexquote" ("src_lower", "dst_lower", "timestamp")')
+    execute('CREATE INDEX "dst_lower_ts_idx" ON "core_dexquote" ("dst_lower", "timestamp")')
+
+
+def _integer_amount(value):
+    """Amount text as an integer string, None if it is not a finite number that fits numeric(78, 0)."""
+    try:
+        amount = Decimal(value.strip())
+    except (AttributeError, InvalidOperation):
+        return None
+    if not amount.is_finite() or abs(amount) >= 10 ** 78:
+        return None
+    return str(int(amount.to_integral_value()))
+
+
+def clean_amounts(apps, schema_editor):
+    """
+    Rewrites in_amount / out_amount texts the numeric cast would reject or
+    truncate ("1.5e+18", "123.0") as integers, and deletes the quotes whose
+    amounts are not numbers at all, the columns are NOT NULL.
+    """
+    DexQuote = apps.get_model("core", "DexQuote")
+    integer = r"^-?[0-9]+$"
+    dirty = DexQuote.objects.exclude(in_amount__regex=integer) | DexQuote.objects.exclude(out_amount__regex=integer)
+    updates, invalid = [], []
+    for quote in dirty.only("id", "in_amount", "out_amount").iterator():
+        quote.in_amount = _integer_amount(quote.in_amount)
+        quote.out_amount = _integer_amount(quote.out_amount)
+        if quote.in_amount is None or quote.out_amount is None:
+            invalid.append(quote.id)
+        else:
+            updates.append(quote)
+    DexQuote.objects.bulk_update(updates, ["in_amount", "out_amount"], batch_size=1_000)
+    for start in range(0, len(invalid), 1_000):
+        DexQuote.objects.filter(id__in=invalid[start:start + 1_000]).delete()
+    if updates or invalid:
+        print(f"Rewrote the amounts of {len(updates)} quotes, deleted {len(invalid)} quotes without numeric amounts")
+
+
+def partition_dexquote(apps, schema_editor):
+    """
+    Rebuilds core_dexquote as a table range partitioned by month of timestamp,
+    with a default partition for rows outside the monthly ones.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    execute = schema_editor.execute
+    columns = _columns(apps)
+
+    execute('ALTER TABLE "core_dexquote" RENAME TO "core_dexquote_unpartitioned"')
+    execute(
+        'CREATE TABLE "core_dexquote" (LIKE "core_dexquote_unpartitioned" INCLUDING DEFAULTS INCLUDING GENERATED) '
+        'PARTITION BY RANGE ("timestamp")'
+    )
+    execute('CREATE TABLE "core_dexquote_default" PARTITION OF "core_dexquote" DEFAULT')
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT min("timestamp") FROM "core_dexquote_unpartitioned"')
+        (low,) = cursor.fetchone()
+    now = int(time.time())
+    month = _month_start(now if low is None else min(low, now))
+    # later rows go to the default partition until their month is created
+    last = _month_start(now)
+    for _ in range(PARTITIONS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        upper = _next_month(month)
+        execute(
+            f'CREATE TABLE "core_dexquote_p{month:%Y_%m}" PARTITION OF "core_dexquote" '
+            f'FOR VALUES FROM ({int(month.timestamp())}) TO ({int(upper.timestamp())})'
+        )
+        month = upper
+
+    execute(f'INSERT INTO "core_dexquote" ({columns}) SELECT {columns} FROM "core_dexquote_unpartitioned"')
+    execute('DROP TABLE "core_dexquote_unpartitioned"')
+    # unique constraints of a partitioned table have to include the partition key
+    _create_indexes(execute, '"id", "timestamp"')
+    execute('CREATE INDEX "dexquote_ts_brin" ON "core_dexquote" USING brin ("timestamp")')
+
+
+def unpartition_dexquote(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    execute = schema_editor.execute
+    columns = _columns(apps)
+
+    execute('ALTER TABLE "core_dexquote" RENAME TO "core_dexquote_partitioned"')
+    execute(
+        'CREATE TABLE "core_dexquote" (LIKE "core_dexquote_partitioned" INCLUDING DEFAULTS INCLUDING GENERATED)'
+    )
+    execute(f'INSERT INTO "core_dexquote" ({columns}) SELECT {columns} FROM "core_dexquote_partitioned"')
+    execute('DROP TABLE "core_dexquote_partitioned"')
+    _create_indexes(execute, '"id"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_logfile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DexQuoteRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now_add=True)),
+                ('network', models.IntegerField()),
+                ('dex_aggregator', models.CharField(max_length=50)),
+                ('src_lower', models.CharField(max_length=42)),
+                ('dst_lower', models.CharField(max_length=42)),
+                ('hour', models.IntegerField()),
+                ('size_bucket', models.IntegerField()),
+                ('quotes', models.IntegerField()),
+                ('in_amount_usd', models.FloatField()),
+                ('price', models.FloatField()),
+                ('market_price', models.FloatField()),
+                ('price_impact', models.FloatField()),
+                ('price_impact_min', models.FloatField()),
+                ('price_impact_max', models.FloatField()),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(clean_amounts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='dexquote',
+            name='in_amount',
+            field=models.DecimalField(decimal_places=0, max_digits=78),
+        ),
+        migrations.AlterField(
+            model_name='dexquote',
+            name='out_amount',
+            field=models.DecimalField(decimal_places=0, max_digits=78),
+        ),
+        migrations.SeparateDatabaseAndState(
+            # the BRIN index is created with the partitioned table
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='dexquote',
+                    index=django.contrib.postgres.indexes.BrinIndex(fields=['timestamp'], name='dexquote_ts_brin'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(partition_dexquote, unpartition_dexquote),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='dexquoterollup',
+            index=models.Index(fields=['src_lower', 'dst_lower', 'hour'], name='dexquote_rollup_pair_hour_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dexquoterollup',
+            constraint=models.UniqueConstraint(fields=('network', 'dex_aggregator', 'src_lower', 'dst_lower', 'hour', 'size_bucket'), name='dexquote_rollup_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-17 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_dexquote_partitioning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logfile',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -1,4 +1,6 @@
+from django.contrib.postgres.indexes import BrinIndex
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 import uuid 
 
@@ -23,7 +25,59 @@ class Chain(BaseModel):
 class CryoLogsMetadata(BaseModel):
     label = models.CharField(max_length=255, unique=True, db_index=True)
     chain = models.ForeignKey(Chain, on_delete=models.CASCADE)
+    # legacy list of ingested file names, superseded by LogFile (only read to backfill the ledger)
     ingested = models.JSONField(null=True, blank=True, default=list())
+    # merged inclusive [start, end] block intervals already ingested (core.block_ranges)
+    block_ranges = models.JSONField(blank=True, default=list)
+    # {block number: hash} checkpoints of the tail ingestion, for reorg detection (core.tail)
+    block_hashes = models.JSONField(blank=True, default=dict)
+
+class LogFile(BaseModel):
+    """ Ingestion ledger entry of one raw log parquet file of a label (core.ledger). """
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+    STATES = [(PENDING, "Pending"), (PROCESSING, "Processing"), (DONE, "Done"), (FAILED, "Failed")]
+
+    metadata = models.ForeignKey(CryoLogsMetadata, on_delete=models.CASCADE, related_name="files")
+    # relative to MEDIA_ROOT/logs__{label}
+    file_name = models.CharField(max_length=255)
+    start_block = models.BigIntegerField(null=True)
+    end_block = models.BigIntegerField(null=True)
+    row_count = models.BigIntegerField(null=True)
+    size = models.BigIntegerField(null=True)
+    checksum = models.CharField(max_length=64, null=True, blank=True)
+    state = models.CharField(max_length=16, choices=STATES, default=PENDING)
+    claimed_by = models.CharField(max_length=255, null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    # claims since the content last changed, failed files stop being claimed at LEDGER_MAX_ATTEMPTS
+    attempts = models.IntegerField(default=0)
+    # {"row_group", "batch", "batch_size"} position of a streaming ingestion (core.event_loader)
+    checkpoint = models.JSONField(blank=True, default=dict)
+
+    class Meta(BaseModel.Meta):
+        unique_together = ('metadata', 'file_name')
+        indexes = [
+            models.Index(fields=['metadata', 'state', 'start_block'], name='logfile_state_block_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.file_name} [{self.state}]"
+
+class BlockTimestamp(BaseModel):
+    """ Block header data per chain, filled in batches by core.blocks. """
+    chain = models.ForeignKey(Chain, on_delete=models.CASCADE)
+    block_number = models.BigIntegerField()
+    timestamp = models.BigIntegerField()
+    block_hash = models.CharField(max_length=66, null=True, blank=True)
+
+    class Meta(BaseModel.Meta):
+        unique_together = ('chain', 'block_number')
+        indexes = [
+            models.Index(fields=['chain', 'timestamp'], name='block_ts_chain_ts_idx'),
+        ]
 
 class Transaction(BaseModel):
     transaction_hash = models.CharField(max_length=255, db_index=True, unique=True)
@@ -48,6 +102,17 @@ class ERC20(BaseModel):
     is_staked_asset = models.BooleanField(default=False)
     is_lp_asset = models.BooleanField(default=False)
     is_gov_asset = models.BooleanField(default=False)
+    # lowercased copy maintained by the database, lookups go through it so they can use the index
+    contract_address_lower = models.GeneratedField(
+        expression=Lower("contract_address"),
+        output_field=models.CharField(max_length=50),
+        db_persist=True,
+    )
+
+    class Meta(BaseModel.Meta):
+        indexes = [
+            models.Index(fields=['contract_address_lower', 'chain'], name='erc20_address_lower_chain_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name}-{self.chain}"
@@ -76,6 +141,10 @@ class DexQuotePair(BaseModel):
         return f"Pair: {self.src_asset.symbol} -> {self.dst_asset.symbol} @ {self.src_asset.chain.chain_name} {status}"
 
 class DexQuote(BaseModel):
+    """
+    Aggregator quotes. In PostgreSQL the table is range partitioned by month
+    of timestamp with (id, timestamp) as primary key, see core.dex_quotes.storage.
+    """
     network = models.IntegerField()
     dex_aggregator = models.CharField(max_length=50)
     src = models.CharField(max_length=42)  # Ethereum addresses
@@ -83,20 +152,63 @@ class DexQuote(BaseModel):
     dst = models.CharField(max_length=42)  # Ethereum addresses
     dest_decimals = models.IntegerField()
     in_amount_usd = models.FloatField()
-    in_amount = models.TextField()  # Storing large fixed-point number as text
-    out_amount = models.TextField()  # Storing large fixed-point number as text
+    in_amount = models.DecimalField(max_digits=78, decimal_places=0)  # raw token amounts, up to uint256
+    out_amount = models.DecimalField(max_digits=78, decimal_places=0)
     market_price = models.FloatField()
     price = models.FloatField()
     price_impact = models.FloatField()
     timestamp = models.IntegerField()
     pair = models.ForeignKey(DexQuotePair, on_delete=models.CASCADE, null=True, blank=True)
+    src_lower = models.GeneratedField(
+        expression=Lower("src"),
+        output_field=models.CharField(max_length=42),
+        db_persist=True,
+    )
+    dst_lower = models.GeneratedField(
+        expression=Lower("dst"),
+        output_field=models.CharField(max_length=42),
+        db_persist=True,
+    )
 
     class Meta(BaseModel.Meta):
         indexes = [
-            models.Index(fields=['src', 'dst'], name='src_dst_idx'),
-            models.Index(fields=['src'], name='src_idx'),
-            models.Index(fields=['dst'], name='dst_idx'),
+            models.Index(fields=['src_lower', 'dst_lower', 'timestamp'], name='src_dst_lower_ts_idx'),
+            models.Index(fields=['dst_lower', 'timestamp'], name='dst_lower_ts_idx'),
+            BrinIndex(fields=['timestamp'], name='dexquote_ts_brin'),
         ]
 
     def __str__(self):
         return f"{self.dex_aggregator} quote on network {self.network}"
+
+class DexQuoteRollup(BaseModel):
+    """
+    Hourly DexQuote aggregates per pair, venue and trade size bucket, kept
+    after raw quotes expire (core.dex_quotes.storage).
+    """
+    network = models.IntegerField()
+    dex_aggregator = models.CharField(max_length=50)
+    src_lower = models.CharField(max_length=42)
+    dst_lower = models.CharField(max_length=42)
+    hour = models.IntegerField()  # unix timestamp, like DexQuote.timestamp
+    size_bucket = models.IntegerField()  # floor(log10(in_amount_usd) * SIZE_BUCKETS_PER_DECADE)
+    quotes = models.IntegerField()
+    in_amount_usd = models.FloatField()
+    price = models.FloatField()
+    market_price = models.FloatField()
+    price_impact = models.FloatField()
+    price_impact_min = models.FloatField()
+    price_impact_max = models.FloatField()
+
+    class Meta(BaseModel.Meta):
+        constraints = [
+            models.UniqueConstraint(
+                fields=['network', 'dex_aggregator', 'src_lower', 'dst_lower', 'hour', 'size_bucket'],
+                name='dexquote_rollup_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['src_lower', 'dst_lower', 'hour'], name='dexquote_rollup_pair_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.dex_aggregator} {self.src_lower}->{self.dst_lower} @ {self.hour}"
@@ -0,0 +1,121 @@
+"""
+Batched view calls through the Multicall3 aggregate contract.
+
+Many tasks read several getters in a row, one RPC round trip per .call().
+batch_call packs (contract, function, args) tuples into Multicall3
+aggregate3 calls (one eth_call per chunk) and decodes every result with the
+contract's own ABI, the same way Contract.functions.x().call() would.
+"""
+
+from django.conf import settings
+from web3 import Web3
+from web3._utils.abi import get_abi_output_types, map_abi_data
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+
+# deployed at the same address on every chain we use
+MULTICALL3_ADDRESS = Web3.to_checksum_address("0xcA11bde05977b3631167028862bE2a173976CA11")
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Call3[]",
+                "name": "calls",
+                "type": "tuple[]",
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function",
+    }
+]
+
+MULTICALL_CHUNK_SIZE = getattr(settings, "MULTICALL_CHUNK_SIZE", 200)
+
+
+class MulticallError(Exception):
+    pass
+
+
+def _decode(w3, fn_abi, return_data):
+    output_types = get_abi_output_types(fn_abi)
+    output_data = w3.codec.decode(output_types, return_data)
+    normalized_data = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, output_data)
+    if len(normalized_data) == 1:
+        return normalized_data[0]
+    return normalized_data
+
+
+def batch_call(
+    w3,
+    calls,
+    block_identifier=None,
+    allow_failure=False,
+    chunk_size=None,
+    multicall_address=MULTICALL3_ADDRESS,
+):
+    """
+    Runs view calls in Multicall3 batches and returns their decoded results
+    in order.
+
+    calls is a list of (contract, fn_name, args) or
+    (contract, fn_name, args, allow_failure) tuples, contract being a web3
+    contract instance. A call allowed to fail (per call, or all of them through
+    allow_failure) yields None on revert or undecodable output, any other
+    failing call raises MulticallError.
+    """
+    chunk_size = MULTICALL_CHUNK_SIZE if chunk_size is None else chunk_size
+    multicall = w3.eth.contract(address=multicall_address, abi=MULTICALL3_ABI)
+    call_kwargs = {} if block_identifier is None else {"block_identifier": block_identifier}
+
+    prepared = []
+    for call in calls:
+        contract, fn_name, args = call[:3]
+        call_allow_failure = call[3] if len(call) > 3 else allow_failure
+        fn_abi = contract.get_function_by_name(fn_name).abi
+        call_data = contract.encodeABI(fn_name=fn_name, args=list(args or []))
+        prepared.append((contract.address, fn_name, fn_abi, call_allow_failure, call_data))
+
+    results = []
+    for start in range(0, len(prepared), chunk_size):
+        chunk = prepared[start:start + chunk_size]
+        # let the contract tolerate every failure and decide per call here,
+        # so one revert does not hide the other results of the chunk
+        aggregate_input = [(address, True, call_data) for address, _, _, _, call_data in chunk]
+        responses = multicall.functions.aggregate3(aggregate_input).call(**call_kwargs)
+        for (address, fn_name, fn_abi, call_allow_failure, _), (success, return_data) in zip(chunk, responses):
+            value = None
+            if success and return_data:
+                try:
+                    value = _decode(w3, fn_abi, return_data)
+                except Exception:
+                    success = False
+            else:
+                success = False
+            if not success and not call_allow_failure:
+                raise MulticallError(f"Call to {fn_name} on {address} failed")
+            results.append(value)
+    return results
+
+
+def batch_call_dict(w3, calls, **kwargs):
+    """
+    batch_call for {key: (contract, fn_name, args)}, returns {key: result}.
+    """
+    keys = list(calls)
+    return dict(zip(keys, batch_call(w3, [calls[k] for k in keys], **kwargs)))
@@ -0,0 +1,176 @@
+"""
+Bulk historical pricing from the DefiLlama coins API.
+
+Instead of one /prices/historical request per (asset, timestamp) these helpers
+pull whole ranges with /chart (many coins, many points per request) and fill
+the remaining holes with /batchHistorical, then split the result into the
+{coin: {timestamp: price}} shape used by the market price feeds.
+"""
+import json
+import time
+import urllib.parse
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from core.caching import cache
+
+DEFILLAMA_COINS_URL = "https://coins.llama.fi"
+DEFILLAMA_CHAIN_NAMES = {8453: "base", 1: "ethereum"}
+# keep urls well under server limits
+CHART_COINS_PER_REQUEST = 10
+CHART_POINTS_PER_REQUEST = 500
+BATCH_TIMESTAMPS_PER_REQUEST = 100
+# responses for ranges touching the last hours may still change
+RECENT_DATA_TTL = 3600
+
+
+def defillama_coin_key(chain_id: int, contract_address: str) -> str:
+    return f"{DEFILLAMA_CHAIN_NAMES[chain_id]}:{contract_address}"
+
+
+def _period_str(timestep: int) -> str:
+    if timestep % 86400 == 0:
+        return f"{timestep // 86400}d"
+    if timestep % 3600 == 0:
+        return f"{timestep // 3600}h"
+    return f"{max(timestep // 60, 1)}m"
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _ttl_for(end_timestamp: int) -> Optional[int]:
+    return RECENT_DATA_TTL if end_timestamp > time.time() - RECENT_DATA_TTL else None
+
+
+def _merge_points(points: Dict[str, Dict[int, float]], data: Optional[dict]) -> None:
+    if not data:
+        return
+    for coin, coin_data in data.get("coins", {}).items():
+        series = points.setdefault(coin.lower(), {})
+        for point in coin_data.get("prices", []):
+            series[int(point["timestamp"])] = point["price"]
+
+
+def fetch_defillama_chart(
+    coins: List[str],
+    start_timestamp: int,
+    end_timestamp: int,
+    timestep: int = 3600,
+    sleep_between_requests: float = 1,
+) -> Dict[str, Dict[int, float]]:
+    """
+    Returns the raw price points of every coin between start and end, keyed by
+    the lowercased "chain:address" coin key.
+    """
+    points = {}
+    period = _period_str(timestep)
+    n_points = (end_timestamp - start_timestamp) // timestep + 1
+    for coin_chunk in _chunks(coins, CHART_COINS_PER_REQUEST):
+        for offset in range(0, n_points, CHART_POINTS_PER_REQUEST):
+            chunk_start = start_timestamp + offset * timestep
+            span = min(CHART_POINTS_PER_REQUEST, n_points - offset)
+            chunk_end = chunk_start + (span - 1) * timestep
+            url = (
+                f"{DEFILLAMA_COINS_URL}/chart/{','.join(coin_chunk)}"
+                f"?start={chunk_start}&span={span}&period={period}&searchWidth={period}"
+            )
+            data = cache.cached_request_get(url, ttl=_ttl_for(chunk_end))
+            _merge_points(points, data)
+            if data is not None and not data["is_internally_cached"]:
+                time.sleep(sleep_between_requests)
+    return points
+
+
+def fetch_defillama_batch_historical(
+    coin_timestamps: Dict[str, List[int]],
+    search_width: str = "6h",
+    sleep_between_requests: float = 1,
+) -> Dict[str, Dict[int, float]]:
+    """
+    Prices arbitrary (coin, timestamp) combinations with /batchHistorical, a
+    bounded number of timestamps per request.
+    """
+    points = {}
+    requests_payload = [
+        {coin: timestamps_chunk}
+        for coin, timestamps in coin_timestamps.items()
+        for timestamps_chunk in _chunks(sorted(timestamps), BATCH_TIMESTAMPS_PER_REQUEST)
+    ]
+    for payload in requests_payload:
+        url = (
+            f"{DEFILLAMA_COINS_URL}/batchHistorical"
+            f"?coins={urllib.parse.quote(json.dumps(payload, separators=(',', ':')))}&searchWidth={search_width}"
+        )
+        end_timestamp = max(max(v) for v in payload.values())
+        data = cache.cached_request_get(url, ttl=_ttl_for(end_timestamp))
+        _merge_points(points, data)
+        if data is not None and not data["is_internally_cached"]:
+            time.sleep(sleep_between_requests)
+    return points
+
+
+def align_to_timesteps(
+    series: Dict[int, float], timestamps: List[int], tolerance: int
+) -> Dict[int, float]:
+    """
+    Picks, for every requested timestamp, the closest price point within
+    `tolerance` seconds. Timestamps without a close enough point are left out.
+    """
+    if not series:
+        return {}
+    point_ts = np.fromiter(sorted(series), dtype=np.int64)
+    point_prices = np.array([series[t] for t in point_ts.tolist()], dtype=np.float64)
+    targets = np.asarray(timestamps, dtype=np.int64)
+    if len(point_ts) == 1:
+        idx = np.zeros(len(targets), dtype=np.int64)
+    else:
+        idx = np.clip(np.searchsorted(point_ts, targets), 1, len(point_ts) - 1)
+        left = idx - 1
+        use_left = np.abs(point_ts[left] - targets) <= np.abs(point_ts[idx] - targets)
+        idx = np.where(use_left, left, idx)
+    distance = np.abs(point_ts[idx] - targets)
+    mask = distance <= tolerance
+    return dict(zip(targets[mask].tolist(), point_prices[idx[mask]].tolist()))
+
+
+def defillama_price_feed(
+    coins: List[str],
+    start_timestamp: int,
+    end_timestamp: int,
+    timestep: int = 3600,
+    tolerance: Optional[int] = None,
+) -> Tuple[Dict[str, Dict[int, float]], Dict[str, List[int]]]:
+    """
+    Builds {coin: {timestamp: usd price}} for every timestep in [start, end].
+
+    Returns the feed and, per coin, the timestamps that could not be priced
+    even after the /batchHistorical pass so callers can fall back to the
+    per-timestamp strategies.
+    """
+    timestamps = list(range(start_timestamp, end_timestamp + 1, timestep))
+    tolerance = timestep if tolerance is None else tolerance
+    points = fetch_defillama_chart(coins, start_timestamp, end_timestamp, timestep)
+
+    feed = {}
+    missing = {}
+    for coin in coins:
+        feed[coin] = align_to_timesteps(points.get(coin.lower(), {}), timestamps, tolerance)
+        holes = [t for t in timestamps if t not in feed[coin]]
+        if holes:
+            missing[coin] = holes
+
+    if missing:
+        batch_points = fetch_defillama_batch_historical(missing)
+        still_missing = {}
+        for coin, holes in missing.items():
+            filled = align_to_timesteps(batch_points.get(coin.lower(), {}), holes, tolerance)
+            feed[coin].update(filled)
+            holes = [t for t in holes if t not in filled]
+            if holes:
+                still_missing[coin] = holes
+        missing = still_missing
+    return feed, missing
@@ -1,4 +1,5 @@
 import math
+import numpy as np
 from web3 import Web3
 import web3
 
@@ -28,6 +29,24 @@ def sqrt_price_x96_to_tick(sqrtPriceX96):
     return round(tick)
 
 
+def price_to_ticks(prices):
+    """
+    Vectorized sqrt_price_x96_to_tick(sqrt_price_from_price(price)). The Q96
+    round trip keeps the float square root, so the ticks are the rounded log
+    of the squared root. numpy's sqrt and log may differ from python's in the
+    last bit, which only matters next to a tie, those go through the scalar
+    function.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    flat = prices.reshape(-1)
+    ticks = np.log(np.sqrt(flat) ** 2) / math.log(1.0001)
+    rounded = np.round(ticks)
+    near_tie = np.abs(np.abs(ticks - np.trunc(ticks)) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        rounded[i] = sqrt_price_x96_to_tick(sqrt_price_from_price(float(flat[i])))
+    return rounded.reshape(prices.shape)
+
+
 def get_sqrt_ratio_at_tick(tick):
     MAX_TICK = 887272
 
@@ -186,6 +205,68 @@ def get_amounts_from_liquidity(currentPrice, lowerPrice, upperPrice, liquidity):
     return amount0, amount1
 
 
+def _value_per_liquidity(
+    sqrt_x,
+    sqrt_a,
+    sqrt_b,
+    token0_price,
+    token0_decimals_,
+    token1_price,
+    token1_decimals_,
+):
+    """
+    Usd value of one unit of liquidity, the position value is linear in the
+    liquidity so this is all that is needed to invert it. Sqrt prices are plain
+    (not Q96) floats, arrays broadcast.
+    """
+    # clamping to the range gives the below/in/above range cases of get_amounts_from_liquidity
+    sqrt_x = np.clip(sqrt_x, sqrt_a, sqrt_b)
+    _amount_0 = (sqrt_b - sqrt_x) / (sqrt_x * sqrt_b)
+    _amount_1 = sqrt_x - sqrt_a
+    return _amount_0 / (10**token0_decimals_) * token0_price + _amount_1 / (
+        10**token1_decimals_
+    ) * token1_price
+
+
+def solve_liquidity_for_value(
+    total_value,
+    upper_price,
+    current_price,
+    lower_price,
+    token0_price,
+    token0_decimals_,
+    token1_price,
+    token1_decimals_,
+):
+    """
+    Closed form liquidity for a target usd value, L = total_value / value(L=1).
+
+    total_value, current_price and the token prices may be numpy arrays (they
+    broadcast against each other), the range boundaries are scalars and go
+    through the exact tick math once. Returns float liquidity, 0 where a unit
+    of liquidity has no value.
+    """
+    sqrt_a = get_sqrt_ratio_at_tick(sqrt_price_x96_to_tick(sqrt_price_from_price(lower_price))) / 2**96
+    sqrt_b = get_sqrt_ratio_at_tick(sqrt_price_x96_to_tick(sqrt_price_from_price(upper_price))) / 2**96
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+
+    ticks = price_to_ticks(current_price)
+    value_per_liquidity = _value_per_liquidity(
+        np.power(1.0001, ticks / 2),
+        sqrt_a,
+        sqrt_b,
+        np.asarray(token0_price, dtype=np.float64),
+        token0_decimals_,
+        np.asarray(token1_price, dtype=np.float64),
+        token1_decimals_,
+    )
+    total_values = np.asarray(total_value, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        liquidity = np.where(value_per_liquidity > 0, total_values / value_per_liquidity, 0.0)
+    return liquidity
+
+
 def find_matching_liquidity(
     total_value,
     upper_price,
@@ -198,6 +279,88 @@ def find_matching_liquidity(
     tolerance=0.00001,
     max_iterations=10000,
 ):
+    """
+    Largest liquidity whose position value does not exceed total_value, within
+    tolerance. The value is linear in the liquidity so it is solved in closed
+    form and only nudged down to absorb the integer rounding of
+    get_amounts_from_liquidity, the returned iteration count is the number of
+    nudges (usually 0).
+    """
+    tickCurrent = sqrt_price_x96_to_tick(sqrt_price_from_price(current_price))
+    tickLower = sqrt_price_x96_to_tick(sqrt_price_from_price(lower_price))
+    tickUpper = sqrt_price_x96_to_tick(sqrt_price_from_price(upper_price))
+
+    sqrt_x = get_sqrt_ratio_at_tick(tickCurrent) / 2**96
+    sqrt_a = get_sqrt_ratio_at_tick(tickLower) / 2**96
+    sqrt_b = get_sqrt_ratio_at_tick(tickUpper) / 2**96
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+
+    value_per_liquidity = float(
+        _value_per_liquidity(
+            sqrt_x,
+            sqrt_a,
+            sqrt_b,
+            token0_price,
+            token0_decimals_,
+            token1_price,
+            token1_decimals_,
+        )
+    )
+    if not value_per_liquidity > 0:
+        raise Exception("Position has no value per unit of liquidity")
+
+    liquidity_guess = max(int(total_value / value_per_liquidity), 1)
+
+    for i in range(max_iterations):
+        _amount_0, _amount_1 = get_amounts_from_liquidity(
+            currentPrice=current_price,
+            lowerPrice=lower_price,
+            upperPrice=upper_price,
+            liquidity=liquidity_guess,
+        )
+
+        _current_value_0 = _amount_0 / (10**token0_decimals_) * token0_price
+        _current_value_1 = _amount_1 / (10**token1_decimals_) * token1_price
+        diff = total_value - (_current_value_0 + _current_value_1)
+        diff_fraction = diff / total_value
+
+        if 0 <= diff_fraction <= tolerance:
+            return (
+                liquidity_guess,
+                _amount_0,
+                _amount_1,
+                _current_value_0,
+                _current_value_1,
+                i,
+            )
+
+        # float error of the closed form, move by the missing value in units of liquidity
+        step = max(int(abs(diff) / value_per_liquidity), 1)
+        if diff < 0:
+            liquidity_guess = max(liquidity_guess - step, 1)
+        else:
+            liquidity_guess += step
+
+    raise Exception("Failed to converge within the maximum number of iterations")
+
+
+def find_matching_liquidity_iterative(
+    total_value,
+    upper_price,
+    current_price,
+    lower_price,
+    token0_price,
+    token0_decimals_,
+    token1_price,
+    token1_decimals_,
+    tolerance=0.00001,
+    max_iterations=10000,
+):
+    """
+    Original fixed point search for the liquidity matching total_value, kept
+    to cross check find_matching_liquidity.
+    """
     token0_amount = 100000000 * 10**token0_decimals_
     token1_amount = 100000000 * 10**token1_decimals_
 
@@ -314,6 +477,49 @@ def get_value_of_lp(
     _total_value = _current_value_0 + _current_value_1
     return _total_value
 
+def get_value_of_lp_series(
+    _liquidity,
+    _lower_price,
+    _upper_price,
+    token0_prices_in_usd,
+    token1_prices_in_usd,
+):
+    """
+    Vectorized get_value_of_lp over aligned token0/token1 price arrays.
+
+    The tick boundary sqrt prices are computed once for the position with the
+    exact tick math, the per point current price tick and token amounts are
+    evaluated in a single numpy pass (float instead of Q96 integer math, the
+    difference is far below a wei of value).
+    """
+    _token0_decimals = 18
+    _token1_decimals = 18
+
+    token0_prices = np.asarray(token0_prices_in_usd, dtype=np.float64)
+    token1_prices = np.asarray(token1_prices_in_usd, dtype=np.float64)
+    if token0_prices.shape != token1_prices.shape:
+        raise ValueError("token0 and token1 price arrays must be aligned")
+
+    sqrt_a = get_sqrt_ratio_at_tick(sqrt_price_x96_to_tick(sqrt_price_from_price(_lower_price))) / 2**96
+    sqrt_b = get_sqrt_ratio_at_tick(sqrt_price_x96_to_tick(sqrt_price_from_price(_upper_price))) / 2**96
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+
+    _current_prices = (token0_prices / token1_prices) * 10 ** (
+        _token1_decimals - _token0_decimals
+    )
+    ticks = price_to_ticks(_current_prices)
+    # clamping to the range gives the below/in/above range cases of get_amounts_from_liquidity
+    sqrt_x = np.clip(np.power(1.0001, ticks / 2), sqrt_a, sqrt_b)
+
+    liquidity = float(_liquidity)
+    _amount_0 = liquidity * (sqrt_b - sqrt_x) / (sqrt_x * sqrt_b)
+    _amount_1 = liquidity * (sqrt_x - sqrt_a)
+
+    _current_value_0 = _amount_0 / (10**_token0_decimals) * token0_prices
+    _current_value_1 = _amount_1 / (10**_token1_decimals) * token1_prices
+    return _current_value_0 + _current_value_1
+
 # Define the dummy ABI for the positions function
 dummy_abi = [
     {
@@ -0,0 +1,194 @@
+"""
+Process wide Web3 providers, one per chain.
+
+Building Web3(HTTPProvider(rpc)) per call means a new requests session, a new
+TLS handshake and a new middleware stack every time. The registry here keeps a
+single Web3 instance per chain whose provider posts through a pooled
+keep-alive session with timeouts and retry/backoff, and counts requests per
+chain so slow or failing nodes show up in provider_stats().
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3 import Retry
+from web3 import HTTPProvider, Web3
+
+WEB3_POOL_MAXSIZE = getattr(settings, "WEB3_POOL_MAXSIZE", 20)
+WEB3_REQUEST_TIMEOUT = getattr(settings, "WEB3_REQUEST_TIMEOUT", 30)
+WEB3_MAX_RETRIES = getattr(settings, "WEB3_MAX_RETRIES", 3)
+WEB3_RETRY_BACKOFF = getattr(settings, "WEB3_RETRY_BACKOFF", 0.5)
+
+
+class ProviderMetrics:
+    """
+    Request counters of one chain's provider.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.methods = defaultdict(int)
+
+    def record(self, method, seconds, failed):
+        with self.lock:
+            self.requests += 1
+            self.errors += int(failed)
+            self.total_seconds += seconds
+            self.methods[method] += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "avg_ms": round(self.total_seconds / self.requests * 1000, 2) if self.requests else 0.0,
+                "methods": dict(self.methods),
+            }
+
+
+class PooledHTTPProvider(HTTPProvider):
+    """
+    HTTPProvider posting through a shared, pooled session.
+
+    web3 only reuses a session passed to HTTPProvider on the thread that
+    created it, so requests are made here directly on our session instead.
+    """
+
+    def __init__(self, endpoint_uri, session, metrics, request_kwargs=None):
+        super().__init__(endpoint_uri, request_kwargs=request_kwargs)
+        self.pooled_session = session
+        self.metrics = metrics
+
+    def make_request(self, method, params):
+        request_data = self.encode_rpc_request(method, params)
+        started = time.monotonic()
+        failed = True
+        try:
+            response = self.pooled_session.post(
+                self.endpoint_uri, data=request_data, **dict(self.get_request_kwargs())
+            )
+            response.raise_for_status()
+            failed = False
+        finally:
+            self.metrics.record(method, time.monotonic() - started, failed)
+        return self.decode_rpc_response(response.content)
+
+    def make_batch_request(self, calls):
+        """
+        Sends [(method, params), ...] as one JSON-RPC batch, returns the raw
+        responses (dicts with "result" or "error") in call order.
+        """
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+            for i, (method, params) in enumerate(calls)
+        ]
+        started = time.monotonic()
+        failed = True
+        try:
+            response = self.pooled_session.post(
+                self.endpoint_uri, json=payload, **dict(self.get_request_kwargs())
+            )
+            response.raise_for_status()
+            responses = response.json()
+            failed = False
+        finally:
+            self.metrics.record("batch", time.monotonic() - started, failed)
+        if isinstance(responses, dict):
+            # some nodes answer a whole batch with a single error object
+            raise ValueError(responses.get("error", responses))
+        return sorted(responses, key=lambda r: r["id"])
+
+
+def build_session(pool_maxsize=None, max_retries=None, backoff_factor=None):
+    """
+    Keep-alive session retrying connection errors, 429 and 5xx gateway errors
+    with exponential backoff (JSON-RPC reads are idempotent, so POST is retried).
+    """
+    pool_maxsize = WEB3_POOL_MAXSIZE if pool_maxsize is None else pool_maxsize
+    retry = Retry(
+        total=WEB3_MAX_RETRIES if max_retries is None else max_retries,
+        backoff_factor=WEB3_RETRY_BACKOFF if backoff_factor is None else backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class ProviderRegistry:
+    """
+    One Web3 instance per (chain id, rpc url), rebuilt if the chain's rpc is
+    changed and per process (celery workers fork after import).
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = WEB3_REQUEST_TIMEOUT if timeout is None else timeout
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.providers = {}
+        self.metrics = defaultdict(ProviderMetrics)
+
+    def _check_pid(self):
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.providers = {}
+            self.metrics = defaultdict(ProviderMetrics)
+
+    def get(self, chain):
+        if not chain.rpc:
+            raise ValueError(f"RPC URL is not set for {chain.chain_name}")
+        key = (chain.chain_id, chain.rpc)
+        w3 = self.providers.get(key)
+        if w3 is not None and self.pid == os.getpid():
+            return w3
+        with self.lock:
+            self._check_pid()
+            w3 = self.providers.get(key)
+            if w3 is None:
+                for stale in [k for k in self.providers if k[0] == chain.chain_id]:
+                    self.providers.pop(stale).provider.pooled_session.close()
+                provider = PooledHTTPProvider(
+                    chain.rpc,
+                    build_session(),
+                    self.metrics[chain.chain_name],
+                    request_kwargs={"timeout": self.timeout},
+                )
+                w3 = Web3(provider)
+                self.providers[key] = w3
+            return w3
+
+    def stats(self):
+        with self.lock:
+            return {name: metrics.stats() for name, metrics in self.metrics.items()}
+
+    def close(self):
+        with self.lock:
+            for w3 in self.providers.values():
+                w3.provider.pooled_session.close()
+            self.providers = {}
+
+
+registry = ProviderRegistry()
+
+
+def get_web3(chain):
+    """
+    Shared Web3 for a core.models.Chain.
+    """
+    return registry.get(chain)
+
+
+def provider_stats():
+    return registry.stats()
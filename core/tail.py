@@ -0,0 +1,117 @@
+"""
+Reorg handling for head-following log ingestion.
+
+The tail task only ingests up to head - confirmations and remembers the hash
+of the last block of every run in CryoLogsMetadata.block_hashes. Before the
+next run those hashes are compared with the chain: if the newest no longer
+matches, the newest one that still does is the fork point and everything the
+label ingested after it is rolled back (coverage, parquet files, ledger
+entries and the rows of the given protocol models).
+"""
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+
+from .block_ranges import merge_ranges
+from .ledger import label_directory
+from .models import CryoLogsMetadata, LogFile
+
+WEB3_LOGS_CONFIRMATIONS = getattr(settings, "WEB3_LOGS_CONFIRMATIONS", 12)
+# checkpoints kept per label, bounds how deep a reorg can be traced back
+MAX_BLOCK_HASHES = 128
+
+
+def _block_hash(w3, block_number):
+    return w3.eth.get_block(int(block_number))["hash"].hex()
+
+
+def record_block_hash(w3, metadata: CryoLogsMetadata, block_number: int) -> None:
+    block_hash = _block_hash(w3, block_number)
+    with transaction.atomic():
+        locked = CryoLogsMetadata.objects.select_for_update().get(pk=metadata.pk)
+        hashes = dict(locked.block_hashes or {})
+        hashes[str(block_number)] = block_hash
+        newest = sorted(hashes, key=int)[-MAX_BLOCK_HASHES:]
+        locked.block_hashes = {k: hashes[k] for k in newest}
+        locked.save(update_fields=["block_hashes"])
+    metadata.block_hashes = locked.block_hashes
+
+
+def find_fork_block(w3, metadata: CryoLogsMetadata):
+    """
+    None when the newest checkpoint is still canonical, otherwise the last
+    block known to be canonical (the oldest checkpoint - 1 if none matches).
+    """
+    checkpoints = sorted((int(k), v) for k, v in (metadata.block_hashes or {}).items())
+    if not checkpoints:
+        return None
+    for i, (block_number, block_hash) in enumerate(reversed(checkpoints)):
+        if _block_hash(w3, block_number) == block_hash:
+            return None if i == 0 else block_number
+    print(f"Reorg deeper than the {len(checkpoints)} tracked checkpoints of {metadata.label}")
+    return checkpoints[0][0] - 1
+
+
+def tail_window(w3, metadata: CryoLogsMetadata, start_block: int, confirmations: int = None):
+    """
+    (from_block, safe_head) of the next tail run: the blocks after the last
+    covered one (start_block before there is coverage) up to
+    head - confirmations. from_block > safe_head when the label is up to date.
+    """
+    confirmations = WEB3_LOGS_CONFIRMATIONS if confirmations is None else confirmations
+    safe_head = w3.eth.block_number - confirmations
+    covered = metadata.block_ranges or []
+    from_block = max(int(start_block), covered[-1][1] + 1) if covered else int(start_block)
+    return from_block, safe_head
+
+
+def rollback_label(metadata: CryoLogsMetadata, to_block: int, rollback_models=()) -> int:
+    """
+    Forgets everything the label ingested after to_block. Files straddling
+    to_block are dropped whole, so the rollback point moves back to their
+    start. rollback_models lists "app_label.Model" paths of Transaction models
+    fed by the label, or maps them to extra filters (e.g. the pool address)
+    when several labels feed the same table. Returns the block the label is
+    rolled back to.
+    """
+    directory = label_directory(metadata.label)
+    file_ranges = {
+        file_name: (start, end)
+        for file_name, start, end in LogFile.objects.filter(metadata=metadata, start_block__isnull=False)
+        .values_list("file_name", "start_block", "end_block")
+    }
+    straddling = True
+    while straddling:
+        straddling = [start for start, end in file_ranges.values() if start <= to_block < end]
+        if straddling:
+            to_block = min(straddling) - 1
+    stale_files = [f for f, (_, end) in file_ranges.items() if end > to_block]
+
+    def remove_files():
+        for file_name in stale_files:
+            path = os.path.join(directory, file_name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    with transaction.atomic():
+        locked = CryoLogsMetadata.objects.select_for_update().get(pk=metadata.pk)
+        locked.block_ranges = merge_ranges(
+            [start, min(end, to_block)] for start, end in (locked.block_ranges or []) if start <= to_block
+        )
+        locked.block_hashes = {k: v for k, v in (locked.block_hashes or {}).items() if int(k) <= to_block}
+        locked.save(update_fields=["block_ranges", "block_hashes"])
+        LogFile.objects.filter(metadata=metadata, file_name__in=stale_files).delete()
+        if not isinstance(rollback_models, dict):
+            rollback_models = {model_path: {} for model_path in rollback_models}
+        for model_path, filters in rollback_models.items():
+            model = apps.get_model(model_path)
+            deleted, _ = model.objects.filter(chain=locked.chain, block_number__gt=to_block, **filters).delete()
+            print(f"Rolled back {deleted} {model_path} rows after block {to_block}")
+        transaction.on_commit(remove_files)
+
+    metadata.block_ranges = locked.block_ranges
+    metadata.block_hashes = locked.block_hashes
+    print(f"Rolled back {metadata.label} to block {to_block}, removed {len(stale_files)} files")
+    return to_block
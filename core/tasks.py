@@ -4,9 +4,18 @@ import subprocess
 from django.conf import settings
 from celery import shared_task
 from .models import Chain, CryoLogsMetadata
-from web3 import Web3
+from .providers import get_web3
+from .abi_decode import decode_raw_logs, fetch_raw_logs, is_static_event
+from .block_ranges import get_block_ranges, missing_ranges, record_ingested_range
+from .log_fetcher import fetch_logs_adaptive
+from .compaction import compact_logs
+from .ledger import register_file, sync_ledger
+from .tail import find_fork_block, record_block_hash, rollback_label, tail_window
 import pandas as pd
-from .dex_quotes.fetch_quotes import paraswap_job, kyperswap_job, cowswap_job, okx_job
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .dex_quotes.fetch_quotes import paraswap_job, kyperswap_job, cowswap_job, okx_job, quote_job
+from .dex_quotes.storage import maintain_dex_quotes
 
 
 def cryo_ingest_logs(
@@ -20,7 +29,6 @@ def cryo_ingest_logs(
     subdirs: str = "datatype"
 ):
     if os.path.exists(settings.MEDIA_ROOT):
-        os.chdir(settings.MEDIA_ROOT)
         start_block_str = f"{int(start_block)/1e6}M"
         if end_block is None:
             end_block_str = ""
@@ -38,7 +46,8 @@ def cryo_ingest_logs(
             '--contract', str(contract_address),
             '--event-signature', event_signature
         ]
-        subprocess.run(command)
+        # cryo writes relative to its working directory
+        subprocess.run(command, cwd=settings.MEDIA_ROOT)
     else:
         raise Exception("Media directory doesn't exist")
 
@@ -79,8 +88,7 @@ def task_cryo_logs(
         )
         metadata.save()
 
-    os.chdir(os.path.join(settings.MEDIA_ROOT, f"logs__{label}"))
-    metadata.save()
+    sync_ledger(metadata)
 
 @shared_task(name="task_web3py_logs", time_limit=None, soft_time_limit=None)
 def task_web3py_logs(
@@ -99,10 +107,9 @@ def task_web3py_logs(
     except:
         raise Exception(f"Chain id {chain_id} not found")
     CHAIN_NAME = chain.chain_name.lower()
-    RPC_URL = chain.rpc
-    def connect_to_blockchain(rpc_url):
-        """ Connect to the Ethereum blockchain using a given RPC URL. """
-        return Web3(Web3.HTTPProvider(rpc_url))
+    def connect_to_blockchain(chain):
+        """ Connect to the chain through the shared, pooled provider. """
+        return get_web3(chain)
 
     def get_latest_block(w3):
         """ Get the latest block number from the blockchain. """
@@ -138,26 +145,13 @@ def task_web3py_logs(
         adjusted_data["block_number"] = event["blockNumber"]
         return adjusted_data
 
-    def get_existing_blocks(label):
-        """ Retrieve existing block numbers from stored .parquet files. """
-        directory = os.path.join(MEDIA_ROOT, f"logs__{label}")
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-        existing_files = os.listdir(directory)
-        existing_blocks = set()
-        for file_name in existing_files:
-            # parts = file_name.replace('.parquet', '').split('-')
-            # if len(parts) == 3:
-                # existing_blocks.update(range(int(parts[1]), int(parts[2]) + 1))
-            parts = file_name.replace('.parquet', "").split("__")[-1].split("_to_")
-            if len(parts) == 2:
-                existing_blocks.update(range(int(parts[0]), int(parts[1]) + 1))
-                
-        return existing_blocks
-
     def fetch_block_data(w3, contract_address, start_block, end_block, event_signature):
         """ Fetch blockchain data based on contract address, block range, and event signature. """
         abi = parse_event_signature(event_signature)
+        if is_static_event(abi[0]):
+            # fixed layout, decoded column-wise straight from the raw logs
+            raw_logs = fetch_raw_logs(w3, contract_address, abi[0], start_block, end_block)
+            return decode_raw_logs(abi[0], raw_logs)
         contract = w3.eth.contract(address=contract_address, abi=abi)
         event_name = abi[0]['name']
         events = getattr(contract.events, event_name)().get_logs(fromBlock=start_block, toBlock=end_block)
@@ -170,31 +164,18 @@ def task_web3py_logs(
         directory = os.path.join(MEDIA_ROOT, f"logs__{label}")
         # file_path = os.path.join(directory, f"{CHAIN_NAME}__logs__{label}-{start_block}-{end_block}.parquet")
         file_path = os.path.join(directory, f"{CHAIN_NAME}__logs__{label}__{start_block}_to_{end_block}.parquet")
-        data.to_parquet(file_path)
+        if isinstance(data, pa.Table):
+            pq.write_table(data, file_path)
+        else:
+            data.to_parquet(file_path)
         print(f"Data for blocks {start_block} to {end_block} saved to {file_path}")
+        return os.path.basename(file_path)
 
     """ Main function to handle fetching and storing blockchain data. """
-    w3 = connect_to_blockchain(RPC_URL)
+    w3 = connect_to_blockchain(chain)
     if end_block is None:
         end_block = get_latest_block(w3)
-    
-    existing_blocks = get_existing_blocks(label)
-    needed_blocks = set(range(start_block, end_block + 1)) - existing_blocks
-
-    current_block = start_block
-    while current_block <= end_block:
-        next_block = min(current_block + block_range - 1, end_block)
-        if set(range(current_block, next_block + 1)).intersection(existing_blocks):
-            print(f"Skipping blocks {current_block} to {next_block} as they already exist.")
-            current_block = next_block + 1
-            continue
-        
-        data = fetch_block_data(w3, contract_address, current_block, next_block, event_signature)
-        # if not data.empty:
-        write_data_to_parquet(data, label, current_block, next_block)
-        
-        current_block = next_block + 1
-    
+
     try:
         metadata = CryoLogsMetadata.objects.get(label=label)
     except CryoLogsMetadata.DoesNotExist:
@@ -204,11 +185,85 @@ def task_web3py_logs(
         )
         metadata.save()
 
-    os.chdir(os.path.join(settings.MEDIA_ROOT, f"logs__{label}"))
-    metadata.save()
+    directory = os.path.join(MEDIA_ROOT, f"logs__{label}")
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    def write_window(current_block, next_block, data):
+        # if not data.empty:
+        file_name = write_data_to_parquet(data, label, current_block, next_block)
+        register_file(metadata, file_name)
+        record_ingested_range(metadata, current_block, next_block)
+
+    # only the gaps of the stored coverage are fetched, block_range is the
+    # starting window size which then adapts to the density of the logs
+    covered = get_block_ranges(metadata, directory)
+    gaps = missing_ranges(covered, start_block, end_block)
+    print(f"Fetching missing blocks {gaps}")
+    fetch_logs_adaptive(
+        lambda current_block, next_block: fetch_block_data(w3, contract_address, current_block, next_block, event_signature),
+        gaps,
+        write_window,
+        block_range=block_range,
+    )
 
 from celery import shared_task
 
+@shared_task(name="task_web3py_logs_tail", time_limit=None, soft_time_limit=None)
+def task_web3py_logs_tail(
+        contract_address,
+        event_signature,
+        label,
+        start_block,
+        chain_id: int,
+        confirmations: Optional[int] = None,
+        block_range=1000,
+        rollback_models=(),
+        **kwargs
+    ):
+    """
+    Head following mode of task_web3py_logs: rolls back after a reorg, then
+    ingests only the blocks after the last ingested one up to
+    head - confirmations. start_block is used until the label has coverage.
+    rollback_models are the protocol models fed by the label, see
+    rollback_label; the protocol apps wrap this task with theirs
+    (task__arcadia__events_tail, task__uniswap__pair_created_tail).
+    """
+    try:
+        chain = Chain.objects.get(chain_id=chain_id)
+    except Chain.DoesNotExist:
+        raise Exception(f"Chain id {chain_id} not found")
+    w3 = get_web3(chain)
+
+    metadata, _ = CryoLogsMetadata.objects.get_or_create(label=label, defaults={"chain": chain})
+    fork_block = find_fork_block(w3, metadata)
+    if fork_block is not None:
+        print(f"Reorg detected for {label}, last canonical checkpoint {fork_block}")
+        rollback_label(metadata, fork_block, rollback_models)
+
+    from_block, safe_head = tail_window(w3, metadata, start_block, confirmations)
+    if from_block > safe_head:
+        print(f"{label} is up to date at block {from_block - 1} (safe head {safe_head})")
+        return
+
+    task_web3py_logs(
+        contract_address,
+        event_signature,
+        label,
+        from_block,
+        chain_id,
+        end_block=safe_head,
+        block_range=block_range,
+    )
+    record_block_hash(w3, metadata, safe_head)
+
+@shared_task(name="task_compact_logs", time_limit=None, soft_time_limit=None)
+def task_compact_logs(label: Optional[str] = None):
+    """ Merge the small log parquet files of one label, or of every label. """
+    labels = [label] if label else list(CryoLogsMetadata.objects.values_list("label", flat=True))
+    for i in labels:
+        compact_logs(i)
+
 @shared_task(name="task_paraswap_job", time_limit=None, soft_time_limit=None)
 def task_paraswap_job(*args, **kwargs):
     paraswap_job(*args, **kwargs)
@@ -225,6 +280,14 @@ def task_cowswap_job(*args, **kwargs):
 def task_okx_job(*args, **kwargs):
     okx_job(*args, **kwargs)
 
+@shared_task(name="task_quote_job", time_limit=None, soft_time_limit=None)
+def task_quote_job(*args, **kwargs):
+    quote_job(*args, **kwargs)
+
+@shared_task(name="task_maintain_dex_quotes", time_limit=None, soft_time_limit=None)
+def task_maintain_dex_quotes():
+    maintain_dex_quotes()
+
 @shared_task(name="test_error")
 def task__test_error():
     raise Exception("test")
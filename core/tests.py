@@ -1,3 +1,770 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+from django.test import SimpleTestCase, TestCase, override_settings
+from eth_abi import decode, encode
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.providers.base import BaseProvider
+
+from .abi_decode import decode_raw_logs, is_static_event
+from .block_ranges import get_block_ranges, merge_ranges, missing_ranges
+from .caching import MemoryTier
+from .dex_quotes.collector import Sweep, TokenBucket, request_quote, run_sweeps
+from .dex_quotes.price_fetcher import RateLimitExceededException, raise_for_rate_limit
+from .dex_quotes.sampling import FixedSampler
+from .ledger import label_directory, register_file
+from .log_fetcher import fetch_logs_adaptive
+from .models import Chain, CryoLogsMetadata, LogFile
+from .multicall import MULTICALL3_ADDRESS, MulticallError, batch_call, batch_call_dict
+from .pricing.univ3 import (
+    find_matching_liquidity,
+    find_matching_liquidity_iterative,
+    price_to_ticks,
+    solve_liquidity_for_value,
+    sqrt_price_from_price,
+    sqrt_price_x96_to_tick,
+)
+from .tail import find_fork_block, record_block_hash, rollback_label, tail_window
+from arcadia import tasks as arcadia_tasks
+from arcadia.models import Borrow
+from uniswap.models import PairCreated
+
+
+class MemoryTierTests(SimpleTestCase):
+    def test_hit_returns_the_stored_object(self):
+        tier = MemoryTier()
+        value = {"prices": [1, 2, 3]}
+        tier.set("a", value)
+        self.assertIs(tier.get("a"), value)
+        self.assertIsNone(tier.get("b"))
+        self.assertEqual((tier.hits, tier.misses), (1, 1))
+
+    def test_bounded_by_encoded_size(self):
+        value = {"data": "x" * 90}
+        size = len(json.dumps(value))
+        tier = MemoryTier(max_bytes=2 * size)
+        for key in "abc":
+            tier.set(key, value)
+        self.assertIsNone(tier.get("a"))
+        self.assertEqual(tier.stats()["bytes"], 2 * size)
+        tier.set("big", {"data": "x" * 1_000})
+        self.assertIsNone(tier.get("big"))
+        self.assertEqual(tier.stats()["entries"], 2)
+
+
+class LiquiditySolverParityTests(SimpleTestCase):
+    """Closed form liquidity solvers against the original iterative search."""
+
+    TOTAL_VALUE = 10_000.0
+    TOLERANCE = 0.00001
+    # (token0 usd price, token0 decimals, token1 usd price, token1 decimals)
+    TOKENS = [(1.0, 18, 1.0, 18), (2000.0, 18, 1.0, 6)]
+    # current price relative to a 0.9 - 1.1 range
+    POSITIONS = {"below range": 0.8, "in range": 1.03, "above range": 1.2}
+
+    def position_args(self, relative_price, tokens):
+        token0_price, token0_decimals, token1_price, token1_decimals = tokens
+        scale = 10 ** (token1_decimals - token0_decimals)
+        return (
+            self.TOTAL_VALUE,
+            1.1 * scale,
+            relative_price * scale,
+            0.9 * scale,
+            token0_price,
+            token0_decimals,
+            token1_price,
+            token1_decimals,
+        )
+
+    def assert_matches_value(self, result):
+        value = result[3] + result[4]
+        diff_fraction = (self.TOTAL_VALUE - value) / self.TOTAL_VALUE
+        self.assertGreaterEqual(diff_fraction, 0)
+        self.assertLessEqual(diff_fraction, self.TOLERANCE)
+
+    def test_scalar_positions(self):
+        for tokens in self.TOKENS:
+            for name, relative_price in self.POSITIONS.items():
+                with self.subTest(position=name, tokens=tokens):
+                    args = self.position_args(relative_price, tokens)
+                    closed_form = find_matching_liquidity(*args)
+                    iterative = find_matching_liquidity_iterative(*args)
+                    self.assert_matches_value(closed_form)
+                    self.assert_matches_value(iterative)
+                    self.assertAlmostEqual(closed_form[0] / iterative[0], 1, delta=2 * self.TOLERANCE)
+                    solved = float(solve_liquidity_for_value(*args))
+                    self.assertAlmostEqual(solved / closed_form[0], 1, delta=1e-9)
+
+    def test_array_targets(self):
+        for tokens in self.TOKENS:
+            with self.subTest(tokens=tokens):
+                relative_prices = [0.8, 0.9, 0.95, 1.0, 1.03, 1.1, 1.2]
+                total_values = np.linspace(1_000.0, 50_000.0, len(relative_prices))
+                _, upper, _, lower, token0_price, token0_decimals, token1_price, token1_decimals = (
+                    self.position_args(1.0, tokens)
+                )
+                current_prices = np.array(relative_prices) * 10 ** (token1_decimals - token0_decimals)
+                solved = solve_liquidity_for_value(
+                    total_values,
+                    upper,
+                    current_prices,
+                    lower,
+                    token0_price,
+                    token0_decimals,
+                    token1_price,
+                    token1_decimals,
+                )
+                self.assertEqual(solved.shape, total_values.shape)
+                for i, (total_value, current_price) in enumerate(zip(total_values, current_prices)):
+                    args = (
+                        total_value, upper, current_price, lower,
+                        token0_price, token0_decimals, token1_price, token1_decimals,
+                    )
+                    self.assertAlmostEqual(solved[i] / find_matching_liquidity(*args)[0], 1, delta=1e-9)
+                    self.assertAlmostEqual(
+                        solved[i] / find_matching_liquidity_iterative(*args)[0], 1, delta=2 * self.TOLERANCE
+                    )
+
+    def test_vectorized_ticks_match_scalar_ticks(self):
+        prices = np.exp(np.random.default_rng(0).uniform(-30, 30, 10_000))
+        # prices right at the rounding boundary between two ticks
+        prices = np.concatenate([prices, 1.0001 ** (np.arange(-500, 500) + 0.5)])
+        expected = [sqrt_price_x96_to_tick(sqrt_price_from_price(price)) for price in prices]
+        np.testing.assert_array_equal(price_to_ticks(prices), expected)
+
+
+TOKEN_ABI = [
+    {
+        "inputs": [{"name": "owner", "type": "address"}],
+        "name": "balanceOf",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [],
+        "name": "symbol",
+        "outputs": [{"name": "", "type": "string"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [],
+        "name": "reverts",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+
+
+class FakeMulticallProvider(BaseProvider):
+    """
+    Answers eth_call to Multicall3.aggregate3 by decoding the batch and
+    running every call against python handlers, {function name: fn(*args)}.
+    A handler raising counts as a revert. Keeps the decoded batches.
+    """
+
+    def __init__(self, handlers):
+        super().__init__()
+        self.handlers = handlers
+        self.batches = []
+        self.block_identifiers = []
+        self.token = Web3().eth.contract(abi=TOKEN_ABI)
+        self.aggregate3_selector = Web3.keccak(text="aggregate3((address,bool,bytes)[])")[:4]
+
+    def make_request(self, method, params):
+        if method == "eth_chainId":
+            return {"jsonrpc": "2.0", "id": 1, "result": "0x1"}
+        assert method == "eth_call", method
+        transaction, block_identifier = params
+        assert Web3.to_checksum_address(transaction["to"]) == MULTICALL3_ADDRESS
+        data = bytes.fromhex(transaction["data"][2:])
+        assert data[:4] == self.aggregate3_selector
+        (calls,) = decode(["(address,bool,bytes)[]"], data[4:])
+        self.batches.append(calls)
+        self.block_identifiers.append(block_identifier)
+        results = []
+        for _, _, call_data in calls:
+            function, args = self.token.decode_function_input(call_data)
+            try:
+                value = self.handlers[function.fn_name](*args.values())
+            except Exception:
+                results.append((False, b""))
+                continue
+            output_types = [output["type"] for output in function.abi["outputs"]]
+            results.append((True, encode(output_types, [value])))
+        encoded = encode(["(bool,bytes)[]"], [results])
+        return {"jsonrpc": "2.0", "id": 1, "result": "0x" + encoded.hex()}
+
+
+class BatchCallTests(SimpleTestCase):
+    def setUp(self):
+        def reverts():
+            raise ValueError("execution reverted")
+
+        self.provider = FakeMulticallProvider({
+            "balanceOf": lambda owner: int(owner[-4:], 16),
+            "symbol": lambda: "TKN",
+            "reverts": reverts,
+        })
+        self.w3 = Web3(self.provider)
+        self.token = self.w3.eth.contract(address="0x" + "11" * 20, abi=TOKEN_ABI)
+        self.owners = [Web3.to_checksum_address(f"0x{i:040x}") for i in range(1, 6)]
+
+    def test_results_in_order_across_chunks(self):
+        calls = [(self.token, "balanceOf", [owner]) for owner in self.owners] + [(self.token, "symbol", [])]
+        results = batch_call(self.w3, calls, chunk_size=2, block_identifier=123)
+        self.assertEqual(results, [1, 2, 3, 4, 5, "TKN"])
+        # one eth_call per chunk, at the requested block
+        self.assertEqual([len(batch) for batch in self.provider.batches], [2, 2, 2])
+        self.assertEqual(self.provider.block_identifiers, [hex(123)] * 3)
+
+    def test_aggregate3_encoding(self):
+        batch_call(self.w3, [(self.token, "balanceOf", [self.owners[2]]), (self.token, "reverts", [], True)])
+        (first, second), = self.provider.batches
+        self.assertEqual(Web3.to_checksum_address(first[0]), self.token.address)
+        self.assertEqual(first[2], bytes.fromhex(self.token.encodeABI(fn_name="balanceOf", args=[self.owners[2]])[2:]))
+        # every call is sent with allowFailure, failures are judged per call after decoding
+        self.assertEqual([first[1], second[1]], [True, True])
+
+    def test_per_call_allow_failure(self):
+        calls = [
+            (self.token, "balanceOf", [self.owners[0]]),
+            (self.token, "reverts", [], True),
+            (self.token, "symbol", []),
+        ]
+        self.assertEqual(batch_call(self.w3, calls), [1, None, "TKN"])
+
+    def test_failure_raises_unless_allowed(self):
+        calls = [(self.token, "balanceOf", [self.owners[0]]), (self.token, "reverts", [])]
+        with self.assertRaises(MulticallError):
+            batch_call(self.w3, calls)
+        self.assertEqual(batch_call(self.w3, calls, allow_failure=True), [1, None])
+        # a per call flag overrides the default
+        with self.assertRaises(MulticallError):
+            batch_call(self.w3, [(self.token, "reverts", [], False)], allow_failure=True)
+
+    def test_batch_call_dict(self):
+        results = batch_call_dict(self.w3, {
+            "symbol": (self.token, "symbol", []),
+            "balance": (self.token, "balanceOf", [self.owners[3]]),
+        })
+        self.assertEqual(results, {"symbol": "TKN", "balance": 4})
+
+
+class FakeGetLogs:
+    """
+    get_logs stand-in over a set of blocks holding one log each. Windows with
+    more than max_results logs fail like providers do, failures[(start, end)]
+    errors are raised once each, in order.
+    """
+
+    def __init__(self, blocks, max_results=None, failures=None, delay=0.0):
+        self.blocks = sorted(blocks)
+        self.max_results = max_results
+        self.failures = {window: list(errors) for window, errors in (failures or {}).items()}
+        self.delay = delay
+        self.windows = []
+        self.lock = threading.Lock()
+
+    def __call__(self, start, end):
+        with self.lock:
+            self.windows.append((start, end))
+            errors = self.failures.get((start, end))
+            if errors:
+                raise errors.pop(0)
+        if self.delay:
+            time.sleep(self.delay * np.random.random())
+        logs = [block for block in self.blocks if start <= block <= end]
+        if self.max_results is not None and len(logs) > self.max_results:
+            raise ValueError({"code": -32005, "message": f"query returned more than {self.max_results} results"})
+        return logs
+
+
+class FetchLogsAdaptiveTests(SimpleTestCase):
+    def fetch(self, get_logs, ranges, **kwargs):
+        kwargs.setdefault("max_workers", 1)
+        kwargs.setdefault("retry_backoff", 0)
+        written = []
+        size = fetch_logs_adaptive(get_logs, ranges, lambda start, end, logs: written.append((start, end, logs)), **kwargs)
+        return written, size
+
+    def assert_covers(self, written, ranges, blocks):
+        """Windows are handed over in block order, cover the ranges exactly and hold their logs."""
+        expected_starts = []
+        for gap_start, gap_end in ranges:
+            covered = [(start, end) for start, end, _ in written if gap_start <= start <= gap_end]
+            self.assertEqual(covered[0][0], gap_start)
+            self.assertEqual(covered[-1][1], gap_end)
+            for (_, end), (start, _) in zip(covered, covered[1:]):
+                self.assertEqual(start, end + 1)
+            expected_starts += [start for start, _ in covered]
+        self.assertEqual([start for start, _, _ in written], expected_starts)
+        logs = [log for _, _, window_logs in written for log in window_logs]
+        self.assertEqual(logs, [block for block in sorted(blocks) if any(s <= block <= e for s, e in ranges)])
+
+    def test_sparse_windows_grow(self):
+        get_logs = FakeGetLogs(blocks=range(0, 100_000, 5_000))
+        written, size = self.fetch(get_logs, [(0, 99_999)], block_range=100, max_block_range=20_000, target_logs=100)
+        sizes = [end - start + 1 for start, end, _ in written]
+        self.assertEqual(sizes[:4], [100, 200, 400, 800])
+        self.assertEqual(size, 20_000)
+        self.assert_covers(written, [(0, 99_999)], get_logs.blocks)
+
+    def test_dense_windows_shrink(self):
+        get_logs = FakeGetLogs(blocks=range(10_000))
+        written, size = self.fetch(get_logs, [(0, 9_999)], block_range=1_000, target_logs=100)
+        sizes = [end - start + 1 for start, end, _ in written]
+        self.assertEqual(sizes[:3], [1_000, 500, 250])
+        self.assertLess(size, 250)
+        self.assert_covers(written, [(0, 9_999)], get_logs.blocks)
+
+    def test_too_many_results_splits_window(self):
+        get_logs = FakeGetLogs(blocks=range(0, 2_000), max_results=300)
+        written, size = self.fetch(get_logs, [(0, 1_999)], block_range=2_000, target_logs=1_000)
+        self.assertIn((0, 1_999), get_logs.windows)
+        self.assertTrue(all(len(logs) <= 300 for _, _, logs in written))
+        self.assertLessEqual(size, 500)
+        self.assert_covers(written, [(0, 1_999)], get_logs.blocks)
+
+    def test_failed_window_is_retried(self):
+        get_logs = FakeGetLogs(
+            blocks=range(0, 1_000, 10),
+            failures={(100, 199): [ConnectionError("reset"), TimeoutError("timeout")]},
+        )
+        written, _ = self.fetch(get_logs, [(0, 999)], block_range=100, max_block_range=100, max_retries=2)
+        self.assertEqual(get_logs.windows.count((100, 199)), 3)
+        self.assert_covers(written, [(0, 999)], get_logs.blocks)
+
+    def test_retries_exhausted_raise(self):
+        get_logs = FakeGetLogs(blocks=[], failures={(0, 99): [ConnectionError("reset")] * 3})
+        with self.assertRaises(ConnectionError):
+            self.fetch(get_logs, [(0, 999)], block_range=100, max_block_range=100, max_retries=2)
+
+    def test_concurrent_windows_written_in_order(self):
+        ranges = [(0, 4_999), (8_000, 12_999)]
+        get_logs = FakeGetLogs(blocks=range(0, 13_000, 7), max_results=400, delay=0.005)
+        written, _ = self.fetch(get_logs, ranges, block_range=500, target_logs=200, max_workers=4)
+        self.assert_covers(written, ranges, get_logs.blocks)
+
+
+def event_abi(signature):
+    """ABI entry of an event signature, parsed like task_web3py_logs does."""
+    name, types = signature[:-1].split("(")
+    inputs = [{"type": t.split()[0], "name": t.split()[-1], "indexed": "indexed" in t} for t in types.split(",")]
+    return {"anonymous": False, "inputs": inputs, "name": name, "type": "event"}
+
+
+def raw_log(event_abi, values, block_number, log_index):
+    """eth_getLogs JSON result of one log, encoded with eth_abi."""
+    indexed = [(i["type"], value) for i, value in zip(event_abi["inputs"], values) if i["indexed"]]
+    data = [(i["type"], value) for i, value in zip(event_abi["inputs"], values) if not i["indexed"]]
+    return {
+        "address": "0x" + "ab" * 20,
+        "topics": ["0x" + event_abi_to_log_topic(event_abi).hex()] + ["0x" + encode([t], [v]).hex() for t, v in indexed],
+        "data": "0x" + encode([t for t, _ in data], [v for _, v in data]).hex(),
+        "blockHash": "0x" + "00" * 32,
+        "blockNumber": hex(block_number),
+        "transactionHash": f"0x{block_number:064x}",
+        "transactionIndex": hex(log_index // 2),
+        "logIndex": hex(log_index),
+        "removed": False,
+    }
+
+
+class AbiDecodeTests(SimpleTestCase):
+    SIGNATURE = "Mixed(address indexed owner, int256 indexed delta, uint256 amount, bool flag, bytes4 selector, int24 tick)"
+    VALUES = [
+        ("0x" + "11" * 20, -2 ** 255, 2 ** 256 - 1, True, b"\x12\x34\x56\x78", -887272),
+        ("0x" + "fe" * 20, 2 ** 255 - 1, 0, False, b"\x00" * 4, 887272),
+        ("0x" + "00" * 19 + "01", -1, 1, True, b"\xff" * 4, 0),
+    ]
+
+    # the Arcadia lending pool events the arcadia ingest tasks read
+    ARCADIA_SIGNATURES = {
+        "BORROW_FIELDS": "Borrow(address indexed account, address indexed by, address to, uint256 amount, uint256 fee, bytes3 indexed referrer)",
+        "AUCTION_STARTED_FIELDS": "AuctionStarted(address indexed account, address indexed creditor, uint128 openDebt)",
+        "AUCTION_FINISHED_FIELDS": "AuctionFinished(address indexed account, address indexed creditor, uint256 startDebt, uint256 initiationReward, uint256 terminationReward, uint256 penalty, uint256 badDebt, uint256 surplus)",
+        "REPAY_FIELDS": "Repay(address indexed account, address indexed from, uint256 amount)",
+    }
+
+    def web3_row(self, event_abi, log):
+        """The row task_web3py_logs writes for a log decoded by web3."""
+        contract = Web3().eth.contract(abi=[event_abi])
+        formatted = {
+            **log,
+            "address": Web3.to_checksum_address(log["address"]),
+            "topics": [HexBytes(topic) for topic in log["topics"]],
+            "data": HexBytes(log["data"]),
+            "blockHash": HexBytes(log["blockHash"]),
+            "transactionHash": HexBytes(log["transactionHash"]),
+            "blockNumber": int(log["blockNumber"], 16),
+            "transactionIndex": int(log["transactionIndex"], 16),
+            "logIndex": int(log["logIndex"], 16),
+        }
+        event = getattr(contract.events, event_abi["name"])().process_log(formatted)
+        row = {}
+        for key, value in event["args"].items():
+            if isinstance(value, int):
+                row[f"event__{key}_string"] = str(value)
+            else:
+                row[f"event__{key}"] = value
+        row["transaction_hash"] = event["transactionHash"]
+        row["log_index"] = event["logIndex"]
+        row["transaction_index"] = event["transactionIndex"]
+        row["block_number"] = event["blockNumber"]
+        return row
+
+    def test_matches_web3_decoding(self):
+        abi = event_abi(self.SIGNATURE)
+        self.assertTrue(is_static_event(abi))
+        logs = [raw_log(abi, values, 100 + i, i) for i, values in enumerate(self.VALUES)]
+        table = decode_raw_logs(abi, logs)
+        self.assertEqual(table.to_pylist(), [self.web3_row(abi, log) for log in logs])
+        self.assertEqual(table.column("event__delta_string").to_pylist(), [str(-2 ** 255), str(2 ** 255 - 1), "-1"])
+        self.assertEqual(table.column("event__amount_string")[0].as_py(), str(2 ** 256 - 1))
+        self.assertEqual(table.column("event__selector").type, pa.binary())
+
+    def test_mismatched_layout_dropped(self):
+        abi = event_abi(self.SIGNATURE)
+        good, short_topics, short_data = [raw_log(abi, self.VALUES[0], 100 + i, i) for i in range(3)]
+        short_topics["topics"] = short_topics["topics"][:2]
+        short_data["data"] = short_data["data"][:-64]
+        table = decode_raw_logs(abi, [short_topics, good, short_data])
+        self.assertEqual(table.num_rows, 1)
+        self.assertEqual(table.column("block_number").to_pylist(), [100])
+
+    def test_arcadia_fields_match_columns(self):
+        for fields_name, signature in self.ARCADIA_SIGNATURES.items():
+            with self.subTest(signature):
+                abi = event_abi(signature)
+                self.assertTrue(is_static_event(abi))
+                values = [
+                    "0x" + "22" * 20 if i["type"] == "address" else b"abc" if i["type"] == "bytes3" else 10 ** 30
+                    for i in abi["inputs"]
+                ]
+                log = raw_log(abi, values, 100, 0)
+                table = decode_raw_logs(abi, [log])
+                self.assertEqual(table.to_pylist(), [self.web3_row(abi, log)])
+                for column, _ in getattr(arcadia_tasks, fields_name).values():
+                    self.assertIn(column, table.column_names)
+
+
+class FakeQuoteServer:
+    """
+    Local HTTP server standing in for an aggregator API. GET /<venue>?amount=x
+    answers {"amount": x, "price_impact": 0} unless a scripted response of the
+    venue is queued, e.g. (429, {"Retry-After": "1"}). Request times and
+    (status, time) of the responses sent are recorded per venue.
+    """
+
+    def __init__(self):
+        self.scripts = {}
+        self.requests = {}
+        self.responses = {}
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                venue = url.path.strip("/")
+                with server.lock:
+                    server.requests.setdefault(venue, []).append(time.monotonic())
+                    script = server.scripts.get(venue)
+                    status, headers = script.pop(0) if script else (200, {})
+                body = b""
+                if status == 200:
+                    amount = float(parse_qs(url.query)["amount"][0])
+                    body = json.dumps({"amount": amount, "price_impact": 0}).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with server.lock:
+                    server.responses.setdefault(venue, []).append((status, time.monotonic()))
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def quote(self, venue):
+        """quote(amount) of the venue, the way the quote_requests modules call their API."""
+
+        def quote(amount):
+            response = requests.get(f"{self.url}/{venue}", params={"amount": amount})
+            raise_for_rate_limit(response)
+            response.raise_for_status()
+            return response.json()
+
+        return quote
+
+    def gaps(self, venue):
+        times = self.requests.get(venue, [])
+        return [b - a for a, b in zip(times, times[1:])]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class CollectorTests(SimpleTestCase):
+    # scheduling slack of the timing assertions, in seconds
+    SLACK = 0.02
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeQuoteServer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.scripts.clear()
+        self.server.requests.clear()
+        self.server.responses.clear()
+
+    def test_token_bucket_paces_requests(self):
+        bucket = TokenBucket(rate=20, capacity=2)
+        quote = self.server.quote("paced")
+        rows = [request_quote(bucket, quote, amount) for amount in range(6)]
+        self.assertEqual([row["amount"] for row in rows], list(range(6)))
+        times = self.server.requests["paced"]
+        # the burst goes out at once, the rest at the refill rate
+        self.assertLess(times[1] - times[0], 1 / 20)
+        self.assertGreaterEqual(times[-1] - times[0], 4 / 20 - self.SLACK)
+
+    def test_retry_after_pauses_venue(self):
+        self.server.scripts["limited"] = [(429, {"Retry-After": "0.3"})]
+        row = request_quote(TokenBucket(rate=100, capacity=10), self.server.quote("limited"), 5, retry_backoff=10)
+        self.assertEqual(row["amount"], 5)
+        self.assertEqual(len(self.server.requests["limited"]), 2)
+        self.assertGreaterEqual(self.server.gaps("limited")[0], 0.3 - self.SLACK)
+
+    def test_exponential_backoff_without_retry_after(self):
+        self.server.scripts["backoff"] = [(429, {}), (429, {})]
+        row = request_quote(TokenBucket(rate=100, capacity=10), self.server.quote("backoff"), 5, retry_backoff=0.1)
+        self.assertEqual(row["amount"], 5)
+        first, second = self.server.gaps("backoff")
+        self.assertGreaterEqual(first, 0.1 - self.SLACK)
+        self.assertGreaterEqual(second, 0.2 - self.SLACK)
+
+    def test_gives_up_after_max_retries(self):
+        self.server.scripts["down"] = [(429, {"Retry-After": "0"})] * 10
+        with self.assertRaises(RateLimitExceededException):
+            request_quote(TokenBucket(rate=100, capacity=10), self.server.quote("down"), 5, max_retries=2)
+        self.assertEqual(len(self.server.requests["down"]), 3)
+
+    def test_pause_holds_every_sweep_of_the_venue(self):
+        self.server.scripts["shared"] = [(429, {"Retry-After": "0.5"})]
+        sweeps = [Sweep("shared", pair, FixedSampler([1, 2]), self.server.quote("shared")) for pair in range(3)]
+        collected = {}
+        # one token every 0.2s, so the 429 is handled before the next request may go out
+        count = run_sweeps(
+            sweeps, lambda sweep, rows: collected.update({sweep.pair: rows}),
+            max_workers=3, rate_limits={"shared": (5, 1)},
+        )
+        self.assertEqual(count, 6)
+        amounts = {pair: [row["amount"] for row in rows] for pair, rows in collected.items()}
+        self.assertEqual(amounts, {pair: [1, 2] for pair in range(3)})
+        (status, limited_at), *_ = self.server.responses["shared"]
+        self.assertEqual(status, 429)
+        later = self.server.requests["shared"][1:]
+        self.assertEqual(len(later), 6)
+        self.assertGreaterEqual(min(later) - limited_at, 0.5 - self.SLACK)
+
+    def test_rate_limited_venue_does_not_stop_others(self):
+        self.server.scripts["blocked"] = [(429, {"Retry-After": "0"})] * 10
+        sweeps = [
+            Sweep("blocked", "a", FixedSampler([1, 2]), self.server.quote("blocked")),
+            Sweep("open", "a", FixedSampler([1, 2]), self.server.quote("open")),
+        ]
+        collected = {}
+        count = run_sweeps(
+            sweeps, lambda sweep, rows: collected.update({sweep.venue: rows}),
+            rate_limits={"blocked": (100, 10), "open": (100, 10)}, max_retries=1,
+        )
+        self.assertEqual(count, 2)
+        self.assertEqual(collected["blocked"], [])
+        self.assertEqual(len(collected["open"]), 2)
+
+
+class StubEth:
+    """w3.eth stand-in: a head block number and the hashes of some blocks."""
+
+    def __init__(self, block_number, hashes):
+        self.block_number = block_number
+        self.hashes = hashes
+
+    def get_block(self, block_number):
+        return {"hash": self.hashes.get(block_number, bytes(32))}
+
+
+class StubWeb3:
+    def __init__(self, block_number, hashes):
+        self.eth = StubEth(block_number, hashes)
+
+
+class TailTests(TestCase):
+    LABEL = "pairs_tail"
+    FILES = [(100, 199), (200, 299), (300, 399)]
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.chain = Chain.objects.create(chain_id=31337, chain_name="dev", rpc="http://127.0.0.1:8545")
+        self.metadata = CryoLogsMetadata.objects.create(label=self.LABEL, chain=self.chain, block_ranges=[[100, 399]])
+        os.makedirs(label_directory(self.LABEL))
+        for start, end in self.FILES:
+            pq.write_table(pa.table({"block_number": [start, end]}), self.path(start, end))
+            register_file(self.metadata, os.path.basename(self.path(start, end)))
+        self.w3 = StubWeb3(412, {end: bytes([end % 256]) * 32 for _, end in self.FILES})
+        for _, end in self.FILES:
+            record_block_hash(self.w3, self.metadata, end)
+        for block_number in (150, 250, 350):
+            PairCreated.objects.create(
+                transaction_hash=f"0x{block_number:064x}", block_number=block_number, chain=self.chain,
+                token0="0x0", token1="0x1", pair="0x2",
+            )
+
+    def path(self, start, end):
+        return os.path.join(label_directory(self.LABEL), f"{self.chain.chain_id}__logs__{self.LABEL}__{start}_to_{end}.parquet")
+
+    def reorg(self, *blocks):
+        for block_number in blocks:
+            self.w3.eth.hashes[block_number] = b"\xff" * 32
+
+    def rollback(self, to_block):
+        with self.captureOnCommitCallbacks(execute=True):
+            return rollback_label(self.metadata, to_block, ("uniswap.PairCreated",))
+
+    def assert_rolled_back_to(self, to_block):
+        self.metadata.refresh_from_db()
+        self.assertEqual(self.metadata.block_ranges, [[100, to_block]])
+        self.assertEqual([int(k) for k in self.metadata.block_hashes], [end for _, end in self.FILES if end <= to_block])
+        kept = [(start, end) for start, end in self.FILES if end <= to_block]
+        self.assertEqual(
+            sorted(LogFile.objects.filter(metadata=self.metadata).values_list("start_block", "end_block")), kept
+        )
+        for start, end in self.FILES:
+            self.assertEqual(os.path.exists(self.path(start, end)), (start, end) in kept)
+        self.assertEqual(
+            sorted(PairCreated.objects.filter(chain=self.chain).values_list("block_number", flat=True)),
+            [b for b in (150, 250, 350) if b <= to_block],
+        )
+
+    def test_no_fork_while_newest_checkpoint_matches(self):
+        self.assertIsNone(find_fork_block(self.w3, self.metadata))
+
+    def test_fork_is_newest_matching_checkpoint(self):
+        self.reorg(299, 399)
+        self.assertEqual(find_fork_block(self.w3, self.metadata), 199)
+
+    def test_fork_deeper_than_checkpoints(self):
+        self.reorg(199, 299, 399)
+        self.assertEqual(find_fork_block(self.w3, self.metadata), 198)
+
+    def test_rollback_to_fork(self):
+        self.reorg(399)
+        fork_block = find_fork_block(self.w3, self.metadata)
+        self.assertEqual(self.rollback(fork_block), 299)
+        self.assert_rolled_back_to(299)
+
+    def test_straddling_file_is_dropped_whole(self):
+        self.assertEqual(self.rollback(250), 199)
+        self.assert_rolled_back_to(199)
+
+    def test_filtered_model_keeps_rows_of_other_pools(self):
+        for pool_address in ("0xPool", "0xOther"):
+            Borrow.objects.create(
+                transaction_hash=f"0x{pool_address}", block_number=350, chain=self.chain, pool_address=pool_address,
+                account="0xa", by="0xb", to="0xc", amount="1", fee=0, referrer="0x0",
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            rollback_label(self.metadata, 299, {"arcadia.Borrow": {"pool_address__iexact": "0xpool"}})
+        self.assertEqual(list(Borrow.objects.values_list("pool_address", flat=True)), ["0xOther"])
+
+    def test_tail_window_after_coverage(self):
+        self.assertEqual(tail_window(self.w3, self.metadata, 0, confirmations=12), (400, 400))
+        self.w3.eth.block_number = 405
+        from_block, safe_head = tail_window(self.w3, self.metadata, 0, confirmations=12)
+        self.assertGreater(from_block, safe_head)
+
+    def test_tail_window_starts_at_start_block_without_coverage(self):
+        self.metadata.block_ranges = []
+        self.assertEqual(tail_window(self.w3, self.metadata, 50, confirmations=2), (50, 410))
+
+
+class BlockRangesTests(SimpleTestCase):
+    def test_merge_adjacent_and_overlapping(self):
+        self.assertEqual(merge_ranges([[10, 19], [0, 9], [30, 40], [35, 50], [52, 60]]), [[0, 19], [30, 50], [52, 60]])
+        self.assertEqual(merge_ranges([[0, 100], [10, 20]]), [[0, 100]])
+        self.assertEqual(merge_ranges([]), [])
+
+    def test_missing_gaps_at_both_ends(self):
+        ranges = [[100, 199], [300, 399]]
+        self.assertEqual(missing_ranges(ranges, 0, 499), [(0, 99), (200, 299), (400, 499)])
+        self.assertEqual(missing_ranges(ranges, 150, 350), [(200, 299)])
+
+    def test_missing_fully_covered(self):
+        self.assertEqual(missing_ranges([[0, 999]], 100, 200), [])
+        self.assertEqual(missing_ranges([[0, 99], [100, 199]], 0, 199), [])
+
+    def test_missing_past_last_range(self):
+        self.assertEqual(missing_ranges([[0, 99]], 200, 299), [(200, 299)])
+        self.assertEqual(missing_ranges([], 5, 10), [(5, 10)])
+
+
+class BlockRangesSeedTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        chain = Chain.objects.create(chain_id=31337, chain_name="dev", rpc="http://127.0.0.1:8545")
+        self.metadata = CryoLogsMetadata.objects.create(label="legacy", chain=chain)
+
+    def test_seeded_from_legacy_filenames(self):
+        for file_name in (
+            "dev__logs__legacy__0_to_99.parquet",
+            "dev__logs__legacy__100_to_199.parquet",
+            "dev__logs__legacy__500_to_599.parquet",
+            "dev__logs__legacy-0-99.parquet",
+            "notes.txt",
+        ):
+            open(os.path.join(self.directory, file_name), "w").close()
+        self.assertEqual(get_block_ranges(self.metadata, self.directory), [[0, 199], [500, 599]])
+        self.metadata.refresh_from_db()
+        self.assertEqual(self.metadata.block_ranges, [[0, 199], [500, 599]])
+
+    def test_stored_ranges_win_over_files(self):
+        self.metadata.block_ranges = [[0, 9]]
+        self.metadata.save()
+        open(os.path.join(self.directory, "dev__logs__legacy__100_to_199.parquet"), "w").close()
+        self.assertEqual(get_block_ranges(self.metadata, self.directory), [[0, 9]])
+
+    def test_missing_directory(self):
+        self.assertEqual(get_block_ranges(self.metadata, os.path.join(self.directory, "absent")), [])
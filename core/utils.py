@@ -1,7 +1,9 @@
-import logging
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 from web3 import Web3
+from core.multicall import batch_call
+from core.providers import get_web3
 from core.models import ERC20, Chain, UniswapLPPosition
 from core.pricing.univ3 import get_positions_details
 from datetime import datetime
@@ -44,10 +46,11 @@ def get_erc20_details(contract_address, w3):
     contract_address = Web3.to_checksum_address(contract_address)
     contract = w3.eth.contract(address=contract_address, abi=erc20_abi)
     
-    # Fetch the details
-    name = contract.functions.name().call()
-    symbol = contract.functions.symbol().call()
-    decimals = contract.functions.decimals().call()
+    # Fetch the details in one round trip
+    name, symbol, decimals = batch_call(
+        w3,
+        [(contract, "name", []), (contract, "symbol", []), (contract, "decimals", [])],
+    )
     
     return {
         "name": name,
@@ -58,9 +61,9 @@ def get_erc20_details(contract_address, w3):
 
 def get_or_create_erc20(contract_address: str, chain: Chain):
     try:
-        asset = ERC20.objects.get(contract_address__iexact=contract_address, chain=chain)
+        asset = ERC20.objects.get(contract_address_lower=contract_address.lower(), chain=chain)
     except ERC20.DoesNotExist:
-        response = get_erc20_details(contract_address, Web3(Web3.HTTPProvider(chain.rpc)))
+        response = get_erc20_details(contract_address, get_web3(chain))
         asset = ERC20(
             chain=chain,
             contract_address=contract_address,
@@ -73,9 +76,9 @@ def get_or_create_erc20(contract_address: str, chain: Chain):
 
 def get_or_create_uniswap_lp(contract_address: str, chain: Chain, token_id: str | int):
     try:
-        asset = UniswapLPPosition.objects.get(contract_address__iexact=contract_address, chain=chain, token_id=str(token_id))
+        asset = UniswapLPPosition.objects.get(contract_address_lower=contract_address.lower(), chain=chain, token_id=str(token_id))
     except UniswapLPPosition.DoesNotExist:
-        w3 = Web3(Web3.HTTPProvider(chain.rpc))
+        w3 = get_web3(chain)
         position_details = get_positions_details(
             contract_address,
             w3,
@@ -90,8 +93,8 @@ def get_or_create_uniswap_lp(contract_address: str, chain: Chain, token_id: str
             liquidity = str(position_details["liquidity"]),
             tickLower = str(position_details["tickLower"]),
             tickUpper = str(position_details["tickUpper"]),
-            token1 = ERC20.objects.get(contract_address__iexact=position_details["token1"], chain=chain),
-            token0 = ERC20.objects.get(contract_address__iexact=position_details["token0"], chain=chain),
+            token1 = ERC20.objects.get(contract_address_lower=position_details["token1"].lower(), chain=chain),
+            token0 = ERC20.objects.get(contract_address_lower=position_details["token0"].lower(), chain=chain),
             name = f"{Web3.to_checksum_address(contract_address)}-{str(token_id)}",
             symbol = f"{Web3.to_checksum_address(contract_address)}-{str(token_id)}",
         )
@@ -100,7 +103,7 @@ def get_or_create_uniswap_lp(contract_address: str, chain: Chain, token_id: str
 
 def update_uniswap_lp(asset: UniswapLPPosition):
     # asset = UniswapLPPosition.objects.get(contract_address__iexact=contract_address, chain=chain, token_id=str(token_id))
-    w3 = Web3(Web3.HTTPProvider(asset.chain.rpc))
+    w3 = get_web3(asset.chain)
     position_details = get_positions_details(
         asset.contract_address,
         w3,
@@ -109,8 +112,8 @@ def update_uniswap_lp(asset: UniswapLPPosition):
     asset.liquidity = str(position_details["liquidity"]),
     asset.tickLower = str(position_details["tickLower"]),
     asset.tickUpper = str(position_details["tickUpper"]),
-    asset.token1 = ERC20.objects.get(contract_address__iexact=position_details["token1"]),
-    asset.token0 = ERC20.objects.get(contract_address__iexact=position_details["token0"]),
+    asset.token1 = ERC20.objects.get(contract_address_lower=position_details["token1"].lower()),
+    asset.token0 = ERC20.objects.get(contract_address_lower=position_details["token0"].lower()),
     asset.save()
     return asset
 
@@ -157,8 +160,9 @@ def _price_defillama_api(coins_url: str, timestamp: int | None):
         url = f"{base_url}/current/{coins_url}"
     else:
         url = f"{base_url}/historical/{timestamp}/{coins_url}"
-    data = requests.get(url).json()
-    return data
+    response = requests.get(url)
+    response.raise_for_status()
+    return response.json()
 
 def price_defillama(chain_name: str, contract_address: str | list[str], timestamp: int = None):
     coins_url = f"{chain_name}:{contract_address}"
@@ -177,24 +181,54 @@ def price_defillama(chain_name: str, contract_address: str | list[str], timestam
         raise Exception(f"{data=} {chain_name=} {contract_address=}")
     return price
 
-def price_defillama_multi(chain_name: str, contract_addresses: list[str], timestamp: int = None):
-    coins_url = ",".join(f"{chain_name}:{address}" for address in contract_addresses)
-    data = _price_defillama_api(coins_url, timestamp)
+# coins per /prices request, keeps the url well under the server limits
+DEFILLAMA_COINS_PER_REQUEST = 50
+DEFILLAMA_MAX_WORKERS = 4
+
+
+def price_defillama_batch(coins: list[str], timestamp: int = None,
+                          chunk_size: int = DEFILLAMA_COINS_PER_REQUEST,
+                          max_workers: int = DEFILLAMA_MAX_WORKERS):
+    """
+    Prices "chain:address" coin keys with bounded, concurrently fetched
+    /prices requests. Coins are matched case-insensitively through one index
+    of all returned keys. Failed requests raise.
+
+    Returns ({coin: price}, missing coins), both in the caller's spelling.
+    """
+    unique_coins = list({coin.lower(): coin for coin in coins}.values())
+    chunks = [unique_coins[i:i + chunk_size] for i in range(0, len(unique_coins), chunk_size)]
+
+    def fetch(chunk):
+        return _price_defillama_api(",".join(chunk), timestamp)
+
+    # map re-raises the first failed request here
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        responses = list(executor.map(fetch, chunks))
+
+    index = {}
+    for data in responses:
+        for key, coin_data in data.get("coins", {}).items():
+            if "price" in coin_data:
+                index[key.lower()] = coin_data["price"]
+
     prices = {}
-    for address in contract_addresses:
-        try:
-            # price = data["coins"][f"{chain_name}:{address}"]["price"]
-            price = None
-            for d in list(data["coins"].keys()):
-                if d.lower() == f"{chain_name}:{address}".lower():
-                    price = data["coins"][d]["price"]
-            if price is None:
-                raise KeyError
-            prices[address] = price
-        except KeyError:
-            logging.exception(f"Missing data for coin: {data=} {chain_name=} {contract_addresses=}", exc_info=True)
-            prices[address] = 1
-    return prices
+    missing = []
+    for coin in coins:
+        price = index.get(coin.lower())
+        if price is None:
+            missing.append(coin)
+        else:
+            prices[coin] = price
+    return prices, missing
+
+
+def price_defillama_multi(chain_name: str, contract_addresses: list[str], timestamp: int = None):
+    coins = {address: f"{chain_name}:{address}" for address in contract_addresses}
+    found, missing = price_defillama_batch(list(coins.values()), timestamp)
+    if missing:
+        raise Exception(f"Missing data for coins: {missing=} {chain_name=} {timestamp=}")
+    return {address: found[coin] for address, coin in coins.items()}
 
 def send_telegram_message(message: str):
     if settings.TELEGRAM_BOT_TOKEN:
@@ -32,19 +32,17 @@ class DexQuoteListView(ListView):
                 return queryset.none()
 
         if src:
-            queryset = queryset.filter(src__iexact=src)
+            queryset = queryset.filter(src_lower=src.lower())
 
         if dst:
-            queryset = queryset.filter(dst__iexact=dst)
+            queryset = queryset.filter(dst_lower=dst.lower())
 
         if dex_aggregator:
             queryset = queryset.filter(dex_aggregator__iexact=dex_aggregator)
 
         if tokens:
-            token_list = [token.strip() for token in tokens.split(",")]
-            src_queryset = queryset.filter(src__iregex=r'^(' + '|'.join(token_list) + ')$')
-            dst_queryset = queryset.filter(dst__iregex=r'^(' + '|'.join(token_list) + ')$')
-            queryset = src_queryset & dst_queryset
+            token_list = [token.strip().lower() for token in tokens.split(",")]
+            queryset = queryset.filter(src_lower__in=token_list, dst_lower__in=token_list)
 
         queryset = queryset.order_by('-timestamp')
 
@@ -11,6 +11,7 @@ import logging
 from dune_client.client import DuneClient
 from dune_client.query import QueryBase
 
+from core.providers import get_web3
 from curve.simuliq.models.protocol import ProtocolDTO
 from curve.simuliq.models.token import RateLimitExceededException
 
@@ -215,7 +216,7 @@ class AaveProtocolDTO(ProtocolDTO):
             raise ValueError(f"Aave data provider address is not set for {self.chain.chain_name}")
         
         try:
-            W3 = Web3(HTTPProvider(self.chain.rpc))
+            W3 = get_web3(self.chain)
             contract = W3.eth.contract(address=Web3.to_checksum_address(self.aave_data_provider_address), abi=AAVE_DATA_PROVIDER_ABI)
             contract_function = getattr(contract.functions, "getAllReservesTokens")
             
@@ -235,7 +236,7 @@ class AaveProtocolDTO(ProtocolDTO):
             raise ValueError(f"Aave pool address is not set for {self.chain.chain_name}")
         
         try:
-            W3 = Web3(HTTPProvider(self.chain.rpc))
+            W3 = get_web3(self.chain)
             asset = Web3.to_checksum_address(asset)
             contract = W3.eth.contract(address=Web3.to_checksum_address(self.aave_pool_address), abi=ABI_AAVE_POOL)
             contract_function = getattr(contract.functions, "getReserveData")
@@ -257,7 +258,7 @@ class AaveProtocolDTO(ProtocolDTO):
             raise ValueError(f"Aave pool address is not set for {self.chain.chain_name}")
         
         try:
-            W3 = Web3(HTTPProvider(self.chain.rpc))
+            W3 = get_web3(self.chain)
             contract = W3.eth.contract(address=Web3.to_checksum_address(self.aave_pool_address), abi=ABI_AAVE_POOL)
             contract_function = getattr(contract.functions, "getEModeCategoryCollateralConfig")
             
@@ -280,7 +281,7 @@ class AaveProtocolDTO(ProtocolDTO):
         user_address_list = [Web3.to_checksum_address(user) for user in user_address_list]
     
         try:
-            W3 = Web3(HTTPProvider(self.chain.rpc))
+            W3 = get_web3(self.chain)
             contract = W3.eth.contract(address=Web3.to_checksum_address(self.batch_data_provider_address), abi=BATCH_DATA_PROVIDER_ABI)
             contract_function = getattr(contract.functions, "checkBalances")
             
@@ -299,7 +300,7 @@ class AaveProtocolDTO(ProtocolDTO):
             raise ValueError(f"RPC URL is not set for {self.chain.chain_name}")
     
         try:
-            W3 = Web3(HTTPProvider(self.chain.rpc))
+            W3 = get_web3(self.chain)
             contract = W3.eth.contract(address=Web3.to_checksum_address(asset), abi=SUPPLY_ABI)
             contract_function = getattr(contract.functions, "totalSupply")
             
@@ -322,7 +323,7 @@ class AaveProtocolDTO(ProtocolDTO):
         user_list = [Web3.to_checksum_address(user) for user in user_list]
     
         try:
-            W3 = Web3(HTTPProvider(self.chain.rpc))
+            W3 = get_web3(self.chain)
             contract = W3.eth.contract(address=Web3.to_checksum_address(self.batch_data_provider_address), abi=BATCH_DATA_PROVIDER_ABI)
             contract_function = getattr(contract.functions, "batchUserEMode")
             
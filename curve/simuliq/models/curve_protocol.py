@@ -1,10 +1,11 @@
 from dataclasses import dataclass, field
 
-from web3 import Web3, HTTPProvider
+from web3 import Web3
 import pandas as pd
 from requests import get
 
 from core.models import Chain
+from core.providers import get_web3
 from curve.simuliq.models.protocol import ProtocolDTO
 
 # chain: ChainDTO
@@ -90,7 +91,7 @@ class CurveMintMarketDTO(ProtocolDTO):
             raise ValueError(f"RPC URL is not set for {self.chain.chain_name}")
     
         try:
-            W3 = Web3(HTTPProvider(self.chain.rpc))
+            W3 = get_web3(self.chain)
             contract = W3.eth.contract(address=Web3.to_checksum_address(self.address), abi=LD_ABI)
             contract_function = getattr(contract.functions, "liquidation_discount")
             
@@ -108,7 +109,7 @@ class CurveMintMarketDTO(ProtocolDTO):
             raise ValueError(f"RPC URL is not set for {self.chain.chain_name}")
     
         try:
-            W3 = Web3(HTTPProvider(self.chain.rpc))
+            W3 = get_web3(self.chain)
             contract = W3.eth.contract(address=Web3.to_checksum_address(self.llamma), abi=AMM_ABI)
             contract_function = getattr(contract.functions, "get_base_price")
             
@@ -122,7 +123,7 @@ class CurveMintMarketDTO(ProtocolDTO):
             raise Exception(f'Error querying smart contract: {e}')
     
         try:
-            W3 = Web3(HTTPProvider(self.chain.rpc))
+            W3 = get_web3(self.chain)
             contract = W3.eth.contract(address=Web3.to_checksum_address(self.llamma), abi=AMM_ABI)
             contract_function = getattr(contract.functions, "A")
             
@@ -3,9 +3,10 @@ from dataclasses import dataclass
 from typing import Optional
 
 from requests import get
-from web3 import Web3, HTTPProvider
+from web3 import Web3
 
 from core.models import Chain
+from core.providers import get_web3
 
 SUPPLY_ABI = [{"inputs":[],"name":"totalSupply","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"}]
 
@@ -50,7 +51,7 @@ class TokenDTO:
             raise ValueError(f"RPC URL is not set for {self.chain}")
     
         try:
-            W3 = Web3(HTTPProvider(self.chain.rpc))
+            W3 = get_web3(self.chain)
             contract = W3.eth.contract(address=Web3.to_checksum_address(self.address), abi=SUPPLY_ABI)
             contract_function = getattr(contract.functions, "totalSupply")
             
@@ -12,12 +12,14 @@ import requests
 from celery import shared_task
 from requests.adapters import HTTPAdapter
 from urllib3 import Retry
-from web3 import HTTPProvider, Web3
+from web3 import Web3
 from scipy import stats
 from scipy.stats import gaussian_kde
 
 from arcadia.utils import weth_address
 from core.models import Chain
+from core.multicall import batch_call
+from core.providers import get_web3
 from curve.models import Top5Debt, ControllerMetadata, CurveMetrics, CurveMarketSnapshot, CurveLlammaTrades, \
     CurveLlammaEvents, CurveCr, CurveMarkets, CurveMarketSoftLiquidations, CurveMarketLosses, CurveScores, \
     CurveScoresDetail, AaveUserData, CurveUserData
@@ -193,21 +195,34 @@ def task_curve__update_controller_metadata():
     chain = Chain.objects.get(chain_name__iexact="ethereum")
     chain_name = chain.chain_name.lower()
 
-    web3 = Web3(HTTPProvider(chain.rpc))
+    web3 = get_web3(chain)
     block_number = web3.eth.get_block("latest")["number"]
 
     markets = curve_batch_api_call(f"/v1/crvusd/markets/{chain_name}")
-    for market in markets:
-        controller = market["address"]
-        controller_contract = web3.eth.contract(address=controller, abi=CONTROLLER_ABI)
-        amm = controller_contract.functions.amm().call(block_identifier=block_number)
-        monetary_policy = controller_contract.functions.monetary_policy().call(block_identifier=block_number)
+    controllers = [market["address"] for market in markets]
 
-        amm_address = Web3.to_checksum_address(amm)
-        amm_contract = web3.eth.contract(address=amm_address, abi=AMM_ABI)
-        A = amm_contract.functions.A().call(block_identifier=block_number)
-        amm_price = amm_contract.functions.get_p().call(block_identifier=block_number)
-        oracle_price = amm_contract.functions.price_oracle().call(block_identifier=block_number)
+    # two multicalls for all markets: controller getters, then the amm getters
+    controller_calls = []
+    for controller in controllers:
+        controller_contract = web3.eth.contract(address=controller, abi=CONTROLLER_ABI)
+        controller_calls.append((controller_contract, "amm", []))
+        controller_calls.append((controller_contract, "monetary_policy", []))
+    controller_results = batch_call(web3, controller_calls, block_identifier=block_number)
+    amms = controller_results[0::2]
+    monetary_policies = controller_results[1::2]
+
+    amm_calls = []
+    for amm in amms:
+        amm_contract = web3.eth.contract(address=Web3.to_checksum_address(amm), abi=AMM_ABI)
+        amm_calls.append((amm_contract, "A", []))
+        amm_calls.append((amm_contract, "get_p", []))
+        amm_calls.append((amm_contract, "price_oracle", []))
+    amm_results = batch_call(web3, amm_calls, block_identifier=block_number)
+
+    for i, controller in enumerate(controllers):
+        amm = amms[i]
+        monetary_policy = monetary_policies[i]
+        A, amm_price, oracle_price = amm_results[3 * i:3 * i + 3]
 
         ControllerMetadata(
             chain=chain,
@@ -224,7 +239,7 @@ def task_curve__update_controller_metadata():
 @shared_task
 def task_curve__update_curve_usd_metrics():
     chain = Chain.objects.get(chain_name__iexact="ethereum")
-    web3 = Web3(HTTPProvider(chain.rpc))
+    web3 = get_web3(chain)
     block_number = web3.eth.get_block("latest")["number"]
 
     stablecoin_lens_contract = web3.eth.contract(address=STABLECOIN_LENS_ADDRESS, abi=[
@@ -255,16 +270,22 @@ def task_curve__update_curve_usd_metrics():
 def get_llamma_url(chain, url_part, model):
     chain_name = chain.chain_name.lower()
 
-    web3 = Web3(HTTPProvider(chain.rpc))
+    web3 = get_web3(chain)
     block_number = web3.eth.get_block("latest")["number"]
 
     results = []
 
     markets = curve_batch_api_call(f"/v1/crvusd/markets/{chain_name}")
-    for market in markets:
+    amms = batch_call(
+        web3,
+        [
+            (web3.eth.contract(address=market["address"], abi=CONTROLLER_ABI), "amm", [])
+            for market in markets
+        ],
+        block_identifier=block_number,
+    )
+    for market, amm in zip(markets, amms):
         controller = market["address"]
-        controller_contract = web3.eth.contract(address=controller, abi=CONTROLLER_ABI)
-        amm = controller_contract.functions.amm().call(block_identifier=block_number)
 
         try:
             latest_date = model.objects.filter(controller=controller).latest("day").day
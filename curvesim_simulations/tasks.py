@@ -6,6 +6,7 @@ import logging
 import curvesim
 from curvesim.metrics.results.sim_results import SimResults
 from .models import SimulationParameters, SimulationRun, TimeseriesData, SummaryMetrics, PriceErrorDistribution, Pool
+from core.bulk_load import copy_bulk_create
 from django.utils.timezone import make_aware
 from pandas import DataFrame
 from django.utils import timezone
@@ -70,18 +71,24 @@ def _get_or_create_simulation_parameters(summary_row: DataFrame) -> tuple[Simula
 
 
 def _save_timeseries_data(sim_run: SimulationRun, data_per_trade: DataFrame) -> None:
-    for _, row in data_per_trade.iterrows():
-        TimeseriesData.objects.create(
-            simulation_run=sim_run,
-            timestamp=row["timestamp"].to_pydatetime(),
-            pool_value_virtual=row["pool_value_virtual"],
-            pool_value=row["pool_value"],
-            pool_balance=row["pool_balance"],
-            liquidity_density=row["liquidity_density"],
-            pool_volume=row["pool_volume"],
-            arb_profit=row["arb_profit"],
-            pool_fees=row["pool_fees"],
-        )
+    columns = [
+        "pool_value_virtual",
+        "pool_value",
+        "pool_balance",
+        "liquidity_density",
+        "pool_volume",
+        "arb_profit",
+        "pool_fees",
+    ]
+    timestamps = data_per_trade["timestamp"].dt.to_pydatetime()
+    values = data_per_trade[columns].to_numpy(dtype=float).tolist()
+    copy_bulk_create(
+        TimeseriesData,
+        (
+            TimeseriesData(simulation_run=sim_run, timestamp=timestamp, **dict(zip(columns, row)))
+            for timestamp, row in zip(timestamps, values)
+        ),
+    )
 
 
 def _save_price_error_distribution(sim_run: SimulationRun, price_error_distribution: DataFrame) -> None:
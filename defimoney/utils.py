@@ -19,9 +19,9 @@ import os
 import numpy as np
 from core.utils import price_defillama
 from core.models import Chain
+from core.providers import get_web3
 from typing import List
 from django.db.models import Q, F, Min, Max
-from django.db.models.functions import Lower
 from core.models import DexQuote
 from django.db.models.query import QuerySet
 import pandas as pd
@@ -198,22 +198,31 @@ class ExternalMarket:
 
 
 
-def get_stable_quotes(target: TokenDTO, stables: List[str]) -> pd.DataFrame:
+def get_stable_quotes(target: TokenDTO, stables: List[str], since: int = None) -> pd.DataFrame:
+    """
+    Quotes between target and the stables, with a timestamp of at least
+    since if given (only the partitions of that window are scanned).
+    """
     # Convert all input addresses to lowercase
     target_address = target.address.lower()
     stables_lower = [stable.address.lower() for stable in stables]
 
     # Create the query
-    quotes = DexQuote.objects.annotate(
-        src_lower=Lower('src'),
-        dst_lower=Lower('dst')
-    ).filter(
+    quotes = DexQuote.objects.filter(
         (Q(src_lower__in=stables_lower) & Q(dst_lower=target_address)) |
-        (Q(dst_lower__in=stables_lower) & Q(src_lower=target_address))
+        (Q(dst_lower__in=stables_lower) & Q(src_lower=target_address)),
+        in_amount__gt=0,
+        out_amount__gt=0,
     )
+    if since is not None:
+        quotes = quotes.filter(timestamp__gte=since)
 
     # return pd.DataFrame(quotes.values())
     result_df = pd.DataFrame(quotes.values())
+    for column in ("in_amount", "out_amount"):
+        # numeric columns come back as Decimal
+        if column in result_df:
+            result_df[column] = result_df[column].astype(float)
 
     # df_black_swan = pd.read_csv("raw_data.csv")
     # df_black_swan["src_lower"] = df_black_swan["src"].str.lower()
@@ -255,7 +264,7 @@ def find_debt_ceiling(market: ExternalMarket, df):
     return debt_ceiling_amount
 
 def get_llamma_debt(dto: TokenDTO, contract_address: str):
-    w3 = Web3(Web3.HTTPProvider(Chain.objects.get(chain_name__iexact=dto.network.network).rpc))
+    w3 = get_web3(Chain.objects.get(chain_name__iexact=dto.network.network))
     contract_address = Web3.to_checksum_address(contract_address)
     contract_abi = [
         {
@@ -11,9 +11,11 @@ from django.db.models import F
 from django.db.models.functions import Abs, Extract
 from dune_client.client import DuneClient
 from moralis import evm_api
-from web3 import Web3, HTTPProvider
+from web3 import Web3
 
+from core.bulk_load import copy_bulk_create
 from core.models import Chain
+from core.providers import get_web3
 from core.utils import price_defillama, price_defillama_multi
 from ethena.models import ChainMetrics, CollateralMetrics, ReserveFundMetrics, ReserveFundBreakdown, \
     UniswapPoolSnapshots, CurvePoolInfo, CurvePoolSnapshots, StakingMetrics, ExitQueueMetrics, ApyMetrics, \
@@ -22,6 +24,8 @@ from sim_core.settings import MORALIS_KEY, SUBGRAPH_KEY, DUNE_KEY, COINANALYZE_K
 
 RAY = 10 ** 27
 SECONDS_IN_YEAR = 365 * 24 * 60 * 60
+# blocks of ChainMetrics held in memory before they are written
+CHAIN_METRICS_FLUSH_SIZE = 100
 
 supply_function = {
     "inputs": [],
@@ -285,7 +289,7 @@ logger = logging.getLogger(__name__)
 
 def update_chain_metrics():
     eth_chain = Chain.objects.get(chain_name__iexact="ethereum")
-    web3 = Web3(HTTPProvider(eth_chain.rpc))
+    web3 = get_web3(eth_chain)
     usde_contract = web3.eth.contract(address=USDE_ADDRESS, abi=USDE_ABI)
     susde_contract = web3.eth.contract(address=SUSDE_ADDRESS, abi=SUSDE_ABI)
     dai_contract = web3.eth.contract(address=DAI_ADDRESS, abi=DAI_ABI)
@@ -304,6 +308,7 @@ def update_chain_metrics():
     except ObjectDoesNotExist:
         last_block_number = latest_block_number - 2
 
+    new_metrics = []
     for block_number in range(last_block_number + 1, latest_block_number + 1):
         try:
             block = web3.eth.get_block(block_number)
@@ -375,10 +380,15 @@ def update_chain_metrics():
                 total_superstate_ustb_balance=str(superstate_ustb_balance),
                 buidl_wallet_count=str(buidl_wallet_count)
             )
-            chain_metrics.save()
+            new_metrics.append(chain_metrics)
         except ValueError:
             print(f"block not found, skipping {block_number}")
             continue
+        if len(new_metrics) >= CHAIN_METRICS_FLUSH_SIZE:
+            copy_bulk_create(ChainMetrics, new_metrics)
+            new_metrics = []
+    if new_metrics:
+        copy_bulk_create(ChainMetrics, new_metrics)
 
 
 def update_collateral_metrics():
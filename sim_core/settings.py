@@ -244,6 +244,67 @@ CACHES = {
     }
 }
 
+# on-disk response cache (core.caching), size in bytes and default ttl in seconds
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 5 * 1024**3))
+RESPONSE_CACHE_TTL = int(os.environ["RESPONSE_CACHE_TTL"]) if os.environ.get("RESPONSE_CACHE_TTL") else None
+# responses kept in process memory in front of the disk cache, number and encoded size in bytes
+RESPONSE_CACHE_MEMORY_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MEMORY_ENTRIES", 100_000))
+RESPONSE_CACHE_MEMORY_BYTES = int(os.environ.get("RESPONSE_CACHE_MEMORY_BYTES", 256 * 1024**2))
+
+# shared per chain web3 providers (core.providers), timeout in seconds
+WEB3_POOL_MAXSIZE = int(os.environ.get("WEB3_POOL_MAXSIZE", 20))
+WEB3_REQUEST_TIMEOUT = float(os.environ.get("WEB3_REQUEST_TIMEOUT", 30))
+WEB3_MAX_RETRIES = int(os.environ.get("WEB3_MAX_RETRIES", 3))
+WEB3_RETRY_BACKOFF = float(os.environ.get("WEB3_RETRY_BACKOFF", 0.5))
+# requests per JSON-RPC batch (core.blocks header fetches)
+WEB3_BATCH_SIZE = int(os.environ.get("WEB3_BATCH_SIZE", 100))
+# calls packed into one Multicall3 aggregate3 eth_call (core.multicall)
+MULTICALL_CHUNK_SIZE = int(os.environ.get("MULTICALL_CHUNK_SIZE", 200))
+# adaptive get_logs windows of task_web3py_logs (core.log_fetcher)
+WEB3_LOGS_MAX_WORKERS = int(os.environ.get("WEB3_LOGS_MAX_WORKERS", 4))
+WEB3_LOGS_MAX_BLOCK_RANGE = int(os.environ.get("WEB3_LOGS_MAX_BLOCK_RANGE", 100_000))
+WEB3_LOGS_TARGET_PER_WINDOW = int(os.environ.get("WEB3_LOGS_TARGET_PER_WINDOW", 5_000))
+# blocks behind head the tail ingestion stays (core.tail)
+WEB3_LOGS_CONFIRMATIONS = int(os.environ.get("WEB3_LOGS_CONFIRMATIONS", 12))
+# raw log parquet compaction (core.compaction), sizes in bytes / blocks / rows
+LOGS_COMPACTION_SMALL_FILE_BYTES = int(os.environ.get("LOGS_COMPACTION_SMALL_FILE_BYTES", 16 * 1024**2))
+LOGS_COMPACTION_PARTITION_BLOCKS = int(os.environ.get("LOGS_COMPACTION_PARTITION_BLOCKS", 1_000_000))
+LOGS_COMPACTION_ROW_GROUP_SIZE = int(os.environ.get("LOGS_COMPACTION_ROW_GROUP_SIZE", 128 * 1024))
+# rows per transaction of the streaming event ingestion (core.event_loader)
+LOGS_INGEST_BATCH_SIZE = int(os.environ.get("LOGS_INGEST_BATCH_SIZE", 10_000))
+# rejected rows after which a streamed log file is marked failed instead of done
+LOGS_INGEST_MAX_SKIPPED_ROWS = int(os.environ.get("LOGS_INGEST_MAX_SKIPPED_ROWS", 0))
+# seconds after which a claimed log file is considered abandoned (core.ledger)
+LEDGER_CLAIM_TIMEOUT = int(os.environ.get("LEDGER_CLAIM_TIMEOUT", 60 * 60))
+# claims after which a failed log file is no longer retried (core.ledger)
+LEDGER_MAX_ATTEMPTS = int(os.environ.get("LEDGER_MAX_ATTEMPTS", 3))
+# rows per COPY of core.bulk_load.copy_bulk_create
+COPY_BATCH_SIZE = int(os.environ.get("COPY_BATCH_SIZE", 50_000))
+# aggregator quote collection (core.dex_quotes.collector), rate limits as
+# "venue=requests per second:burst,..." and retry backoff in seconds
+DEX_QUOTE_RATE_LIMITS = {
+    venue: tuple(float(x) for x in limit.split(":"))
+    for venue, limit in (
+        item.split("=") for item in os.environ.get(
+            "DEX_QUOTE_RATE_LIMITS", "kyperswap=2:2,paraswap=1:1,cowswap=2:2,okx=1:1"
+        ).split(",")
+    )
+}
+DEX_QUOTE_MAX_WORKERS = int(os.environ.get("DEX_QUOTE_MAX_WORKERS", 8))
+DEX_QUOTE_MAX_RETRIES = int(os.environ.get("DEX_QUOTE_MAX_RETRIES", 5))
+DEX_QUOTE_RETRY_BACKOFF = float(os.environ.get("DEX_QUOTE_RETRY_BACKOFF", 2.0))
+# seconds after which a quote run refetches its token prices and supplies, unset keeps one snapshot per run
+DEX_QUOTE_CONTEXT_TTL = float(os.environ["DEX_QUOTE_CONTEXT_TTL"]) if os.environ.get("DEX_QUOTE_CONTEXT_TTL") else None
+# buffered DexQuote writes of the quote pipeline (core.dex_quotes.pipeline), rows / seconds per flush
+DEX_QUOTE_FLUSH_ROWS = int(os.environ.get("DEX_QUOTE_FLUSH_ROWS", 500))
+DEX_QUOTE_FLUSH_SECONDS = float(os.environ.get("DEX_QUOTE_FLUSH_SECONDS", 60))
+# adaptive trade sizes of quote sweeps (core.dex_quotes.sampling), price impact tolerance and initial grid size
+DEX_QUOTE_SAMPLING_TOLERANCE = float(os.environ.get("DEX_QUOTE_SAMPLING_TOLERANCE", 0.01))
+DEX_QUOTE_SAMPLING_COARSE = int(os.environ.get("DEX_QUOTE_SAMPLING_COARSE", 6))
+# DexQuote partitions (core.dex_quotes.storage), months created ahead and days of raw quotes kept, unset keeps all
+DEX_QUOTE_PARTITIONS_AHEAD = int(os.environ.get("DEX_QUOTE_PARTITIONS_AHEAD", 3))
+DEX_QUOTE_RETENTION_DAYS = int(os.environ["DEX_QUOTE_RETENTION_DAYS"]) if os.environ.get("DEX_QUOTE_RETENTION_DAYS") else None
+
 # external API keys
 MORALIS_KEY = os.environ.get("MORALIS_KEY")
 SUBGRAPH_KEY = os.environ.get("SUBGRAPH_KEY")
@@ -1,38 +1,23 @@
-from sim_core.utils import parquet_files_to_process
+from core.event_loader import HEX, ingest_event_files
+from core.tasks import task_web3py_logs_tail
 from .models import PairCreated
-from core.models import CryoLogsMetadata, Transaction
 from celery import shared_task
-import json
-import os
-from django.conf import settings
-from django.db import transaction
-import pandas as pd
 
-@shared_task(name="task__uniswap__pair_created")
-def task__uniswap__pair_created():
-    label = "uniswap_v2_pools"
-    metadata = CryoLogsMetadata.objects.get(label=label)
-    files, after_ingestion = parquet_files_to_process(metadata.ingested, label)
+PAIR_CREATED_LABEL = "uniswap_v2_pools"
+PAIR_CREATED_FIELDS = {
+    "token0": ("event__token0", HEX),
+    "token1": ("event__token1", HEX),
+}
 
-    with transaction.atomic():
-        pairs_created = []
-        
-        for i in files:
-            file_path = os.path.join(settings.MEDIA_ROOT, f"logs__{label}", i)
-            df = pd.read_parquet(file_path)
-            for index, row in df.iterrows():
+@shared_task(name="task__uniswap__pair_created")
+def task__uniswap__pair_created(stream: bool = False):
+    ingest_event_files(PAIR_CREATED_LABEL, PairCreated, PAIR_CREATED_FIELDS, stream=stream)
 
-                pair_created = PairCreated(
-                    token0 = "0x" + str(row["event__token0"].hex()).lower(),
-                    token1 = "0x" + str(row["event__token1"].hex()).lower(),
-                    transaction_hash = "0x" + str(row["transaction_hash"].hex()).lower(),
-                    transaction_index = row["transaction_index"],
-                    log_index = row["log_index"],
-                    chain = metadata.chain,
-                    block_number = row["block_number"]
-                )
-                pairs_created.append(pair_created)
-        
-        PairCreated.objects.bulk_create(pairs_created, ignore_conflicts=True)
-        metadata.ingested = after_ingestion
-        metadata.save()
\ No newline at end of file
+@shared_task(name="task__uniswap__pair_created_tail")
+def task__uniswap__pair_created_tail(factory_address: str, event_signature: str, start_block: int, chain_id: int, stream: bool = False, **kwargs):
+    """ Follows the head for PairCreated, rolling PairCreated rows back after a reorg, then ingests the new files. """
+    task_web3py_logs_tail(
+        factory_address, event_signature, PAIR_CREATED_LABEL, start_block, chain_id,
+        rollback_models=("uniswap.PairCreated",), **kwargs
+    )
+    task__uniswap__pair_created(stream=stream)